@@ -1,18 +1,60 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
 import os
+import hmac
 import uuid
+import shutil
+import zipfile
 import tempfile
-from typing import List, Optional
+import logging
+from typing import Dict, List, Optional
 import asyncio
 from datetime import datetime
-from dwg_processor import DWGProcessor
+from dwg_processor import DWGProcessor, DWG_CONVERTERS
+from conversion_cache import ConversionCache
+from converter_registry import converter_registry
 from debug_translation_service import DebugTranslationService
+from translation_service import TranslationService
 from text_cleaner import TextCleaner
+from upload_handler import (
+    save_upload_stream, extract_cad_archive, UploadValidationError,
+    MAX_UPLOAD_SIZE, MAX_BATCH_FILES, MAX_BATCH_SIZE
+)
+from worker_pool import WorkerPool, MAX_SESSIONS_PER_WORKER
+from job_store import JobStore, TranslationJob, FINISHED_STATUSES
+from job_events import JobEventBroker, sse_message, SSE_KEEPALIVE_SECONDS
+from job_scheduler import StageScheduler
+from text_dedup import DedupResult, dedup_entities, combine_dedup
+from block_usage import block_stats
+from revision_diff import TextTable, build_text_table, diff_revision, table_from_translations
+from job_profiler import JobProfiler, NO_PROFILER, PROFILE_FILENAME
+from metrics import (
+    registry, CONTENT_TYPE, STAGE_SECONDS, EXTRACTED_ENTITIES, FILTERED_STRINGS,
+    TRANSLATED_STRINGS, REPLACED_ENTITIES, JOBS_FINISHED
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="AutoCAD DWG Translator API", version="1.0.0")
 
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def limit_upload_size(request, call_next):
+    """Reject oversized uploads from Content-Length before the body is read"""
+    limit = {"/upload": MAX_UPLOAD_SIZE, "/batches": MAX_BATCH_SIZE}.get(request.url.path)
+    if request.method == "POST" and limit is not None:
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit + MULTIPART_OVERHEAD:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Upload exceeds maximum size of {limit} bytes"}
+            )
+    return await call_next(request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -33,143 +75,763 @@ PROCESSED_DIR = "processed"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
-dwg_processor = DWGProcessor()
-translation_service = DebugTranslationService()
-
-class TranslationJob:
-    def __init__(self, job_id: str, filename: str, file_path: str):
-        self.job_id = job_id
-        self.filename = filename
-        self.file_path = file_path
-        self.status = "uploaded"
-        self.progress = 0
-        self.error_message = None
-        self.created_at = datetime.now()
-        self.completed_at = None
-        self.translated_file_path = None
-        self.extracted_texts = []
-        self.translations = {}
-
-jobs = {}
+worker_pool = WorkerPool(DWGProcessor)
+
+def create_translation_service():
+    """Real providers when an API key is configured, otherwise the offline debug service
+
+    Only TranslationService uses the translation cache; the debug service
+    answers from its built-in dictionary, which costs nothing to repeat.
+    """
+    if os.getenv('DEEPL_API_KEY') or os.getenv('GOOGLE_TRANSLATE_API_KEY'):
+        return TranslationService()
+    return DebugTranslationService()
+
+def translated_text(result) -> str:
+    # TranslationService returns TranslationResult objects, the debug service plain dicts
+    return result['translated_text'] if isinstance(result, dict) else result.translated_text
+
+translation_service = create_translation_service()
+
+job_store = JobStore()
+job_events = JobEventBroker()
+# Shared by single uploads and batch children
+scheduler = StageScheduler()
+# DWG conversions run here, as asyncio subprocesses, before a worker process gets the job
+conversion_cache = ConversionCache()
+# Background task of every running job, so it can be cancelled
+job_tasks: Dict[str, asyncio.Task] = {}
+
+JOB_PURGE_INTERVAL = int(os.getenv('JOB_PURGE_INTERVAL', 600))  # seconds
+# Required in the X-Admin-Token header for admin-only features; unset disables them
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+def require_admin(request: Request):
+    token = request.headers.get('x-admin-token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def cache_lookups() -> Dict[tuple, int]:
+    lookups = {('conversion', 'hit'): conversion_cache.hits, ('conversion', 'miss'): conversion_cache.misses}
+    translation_cache = getattr(translation_service, 'cache', None)
+    if translation_cache is not None:
+        lookups[('translation', 'hit')] = translation_cache.hits
+        lookups[('translation', 'miss')] = translation_cache.misses
+    return lookups
+
+def worker_states() -> Dict[tuple, int]:
+    stats = worker_pool.stats()
+    return {('busy',): stats['busy'], ('idle',): stats['workers'] - stats['busy']}
+
+# Read from the objects that already track them, only when /metrics is scraped
+registry.counter('dwg_translator_cache_lookups_total', "Conversion and translation cache lookups in this process",
+                 ('cache', 'result'), callback=cache_lookups)
+registry.gauge('dwg_translator_scheduler_jobs', "Jobs holding or waiting for a stage slot", ('stage', 'state'),
+               callback=lambda: {(stage, state): stats[state] for stage, stats in scheduler.stats().items()
+                                 for state in ('active', 'waiting')})
+registry.gauge('dwg_translator_scheduler_slots', "Jobs allowed in each stage at once", ('stage',),
+               callback=lambda: {(stage,): limit for stage, limit in scheduler.limits.items()})
+registry.gauge('dwg_translator_worker_pool_workers', "Worker processes running a call (busy) or not (idle)",
+               ('state',), callback=worker_states)
+registry.gauge('dwg_translator_worker_pool_calls', "Worker pool calls running or queued",
+               callback=lambda: {(): worker_pool.stats()['in_flight']})
+registry.gauge('dwg_translator_worker_pool_sessions', "Parsed documents held open in workers",
+               callback=lambda: {(): worker_pool.stats()['sessions']})
+registry.gauge('dwg_translator_jobs_running', "Jobs and batches being processed",
+               callback=lambda: {(): len(job_tasks)})
+
+async def purge_expired_jobs():
+    while True:
+        await asyncio.sleep(JOB_PURGE_INTERVAL)
+        try:
+            await run_blocking(job_store.purge_expired)
+        except Exception:
+            logger.exception("Job purge failed")
+
+@app.on_event("startup")
+async def start_worker_pool():
+    # Prefork workers with ezdxf loaded before the first upload arrives
+    await asyncio.get_running_loop().run_in_executor(None, worker_pool.start)
+
+@app.on_event("startup")
+async def discover_converters():
+    await asyncio.get_running_loop().run_in_executor(None, converter_registry.discover)
+
+@app.on_event("startup")
+async def start_job_store():
+    # Jobs still marked running belong to this store's previous owner, not to a sibling worker
+    await run_blocking(job_store.claim)
+    await run_blocking(job_store.fail_interrupted)
+    await run_blocking(job_store.purge_expired)
+    app.state.purge_task = asyncio.create_task(purge_expired_jobs())
+
+@app.on_event("startup")
+async def start_translation_service():
+    # Long-lived provider HTTP sessions shared by every job
+    await translation_service.start()
+
+@app.on_event("shutdown")
+async def stop_translation_service():
+    await translation_service.close()
+
+@app.on_event("shutdown")
+async def stop_worker_pool():
+    worker_pool.shutdown()
+
+@app.on_event("shutdown")
+async def cancel_running_jobs():
+    # Kills any converter subprocess still running
+    for task in list(job_tasks.values()):
+        task.cancel()
+    await asyncio.gather(*job_tasks.values(), return_exceptions=True)
+
+@app.on_event("shutdown")
+async def stop_job_store():
+    app.state.purge_task.cancel()
+    job_store.close()
 
 @app.get("/")
 async def root():
     return {"message": "AutoCAD DWG Translator API"}
 
-async def process_translation(job_id: str):
-    """Background task to process the translation"""
-    job = jobs.get(job_id)
-    if not job:
-        return
+# Progress range covered by the translation stage
+TRANSLATE_PROGRESS_START = 30
+TRANSLATE_PROGRESS_END = 70
 
-    try:
-        job.status = "extracting"
-        job.progress = 10
+def job_status(job: TranslationJob) -> Dict:
+    return {
+        "job_id": job.job_id,
+        "parent_id": job.parent_id,
+        "based_on_job_id": job.based_on_job_id,
+        "filename": job.filename,
+        "status": job.status,
+        "progress": job.progress,
+        "error_message": job.error_message,
+        "created_at": job.created_at,
+        "completed_at": job.completed_at,
+        "extracted_count": job.extracted_count,
+        "translations_count": job.translations_count,
+        "dedup_ratio": job.stats.get("dedup_ratio"),
+        "stats": dict(job.stats)
+    }
 
-        # Extract text entities
-        text_entities = dwg_processor.extract_text_entities(job.file_path)
-        job.extracted_texts = text_entities
+def update_job(job: TranslationJob, **fields):
+    """Persist a stage change and push it to event stream subscribers"""
+    job_store.update(job, **fields)
+    if fields.get('status') in FINISHED_STATUSES:
+        JOBS_FINISHED.inc(status=fields['status'])
+    job_events.publish(job.job_id, job_status(job), final=job.status in FINISHED_STATUSES)
+
+def translation_progress_reporter(job: TranslationJob):
+    """Progress callback for the translation service; per-batch updates are pushed, not persisted"""
+    def report(done: int, total: int):
+        span = TRANSLATE_PROGRESS_END - TRANSLATE_PROGRESS_START
+        progress = TRANSLATE_PROGRESS_START + (span * done // total if total else span)
+        if progress > job.progress:
+            job.progress = progress
+            job_events.publish(job.job_id, job_status(job))
+    return report
+
+def start_job(job_id: str, coro):
+    """Run a job's processing as a task that POST /jobs/{job_id}/cancel can abort"""
+    task = asyncio.create_task(coro)
+    job_tasks[job_id] = task
+    task.add_done_callback(lambda _: job_tasks.pop(job_id, None))
+    return task
+
+async def convert_drawing(job: TranslationJob):
+    """Convert a DWG upload ahead of extraction
+
+    The converter runs as an asyncio subprocess (killed if the job is
+    cancelled) and its DXF lands in the conversion cache, where the worker
+    finds it instead of blocking a worker process on the converter. Without
+    external converters the worker's in-process fallbacks handle it.
+    """
+    if not job.file_path.lower().endswith('.dwg') or not converter_registry.available(DWG_CONVERTERS):
+        return
 
-        # Filter Chinese texts
-        chinese_texts = translation_service.filter_chinese_texts([entity.text for entity in text_entities])
+    update_job(job, status="converting", progress=5)
+
+    async def convert(dwg_path: str) -> str:
+        dxf_path = dwg_path.rsplit('.', 1)[0] + '.dxf'
+        if not await converter_registry.convert(DWG_CONVERTERS, dwg_path, dxf_path):
+            raise Exception("DWG to DXF conversion failed with every installed converter")
+        return dxf_path
+
+    with STAGE_SECONDS.time(stage='convert'):
+        await conversion_cache.get_or_convert_async(
+            job.file_path, converter_registry.version(DWG_CONVERTERS), convert, source_hash=job.file_hash
+        )
+
+def cancel_job(job: TranslationJob):
+    update_job(job, status="failed", error_message="Cancelled", completed_at=datetime.now())
+
+async def run_blocking(func, *args):
+    """Run CPU- or disk-bound work on a thread so /health, SSE and other jobs keep being served"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+def load_text_table(job_id: str) -> Optional[TextTable]:
+    """handle -> (text hash, translation) written by an earlier job, or None if it's gone"""
+    table = job_store.load_payload(job_id, 'text_table')
+    if table is None:
+        # Jobs finished before text tables were kept still have what's needed to rebuild one
+        entities = job_store.load_payload(job_id, 'extracted_texts')
+        if entities is not None:
+            table = table_from_translations(entities, job_store.load_payload(job_id, 'translations', {}))
+    return table
+
+def diff_against_base(job: TranslationJob, text_entities) -> Optional[tuple]:
+    """(pending entities, reused handle -> translation, reused text -> translation), or None without a base table"""
+    base_table = load_text_table(job.based_on_job_id)
+    if base_table is None:
+        return None
+    revision = diff_revision(text_entities, base_table)
+    return revision.pending, revision.reused, revision.reused_texts(text_entities)
+
+def save_text_table(job_id: str, text_entities, handle_to_translation: Dict[str, str]):
+    job_store.save_payload(job_id, 'text_table', build_text_table(text_entities, handle_to_translation))
+
+async def process_translation(job_id: str, profile: bool = False):
+    """Background task to process the translation
+
+    With profile the job runs under cProfile with a tracemalloc snapshot
+    at the end of each stage, saved as the job's profile.zip.
+    """
+    job = job_store.get(job_id)
+    if not job:
+        return
 
-        if not chinese_texts:
-            job.status = "completed"
-            job.progress = 100
-            job.completed_at = datetime.now()
-            job.translated_file_path = job.file_path  # No translation needed
+    profiler = JobProfiler(job_id, job_store.artifact_path(job_id, PROFILE_FILENAME)) if profile else NO_PROFILER
+    profiler.start()
+    try:
+        with profiler.stage('convert'):
+            await convert_drawing(job)
+
+        update_job(job, status="extracting", progress=10)
+
+        # Extract text entities in a worker process; the parsed document stays
+        # open in that worker so the replace stage doesn't parse it again
+        async with scheduler.parse_slot():
+            with STAGE_SECONDS.time(stage='extract'), profiler.stage('extract'):
+                text_entities = await worker_pool.run(
+                    'extract_text_entities', job.file_path, session_id=job_id,
+                    on_profile=profiler.worker_callback('extract'), source_hash=job.file_hash
+                )
+        EXTRACTED_ENTITIES.inc(len(text_entities))
+        await run_blocking(job_store.save_payload, job_id, 'extracted_texts', text_entities)
+        job.extracted_count = len(text_entities)
+        # Block definition text is translated once for all of its inserts
+        job.stats.update(await run_blocking(block_stats, text_entities))
+
+        # A revised drawing keeps the translations of entities it didn't change
+        pending = text_entities
+        reused = {}
+        reused_texts = {}
+        if job.based_on_job_id:
+            with profiler.stage('diff'):
+                revision = await run_blocking(diff_against_base, job, text_entities)
+            if revision is None:
+                logger.warning(f"Job {job.based_on_job_id} has no saved texts, translating {job_id} in full")
+            else:
+                pending, reused, reused_texts = revision
+
+        # Group entities by text so each unique string is filtered and translated once
+        with profiler.stage('dedup'):
+            dedup = await run_blocking(dedup_entities, pending)
+
+        # Filter Chinese texts; cleaning and CJK detection run on a thread, not the event loop
+        with STAGE_SECONDS.time(stage='filter'), profiler.stage('filter'):
+            chinese_texts = await run_blocking(translation_service.filter_chinese_texts, dedup.unique_texts)
+        FILTERED_STRINGS.inc(dedup.unique_count)
+        dedup = dedup.select(chinese_texts)
+        job.stats.update(dedup.stats())
+        if job.based_on_job_id:
+            job.stats.update({'reused_entities': len(reused), 'retranslated_entities': dedup.total_count})
+
+        if not chinese_texts and not reused:
+            await run_blocking(save_text_table, job_id, text_entities, {})
+            update_job(
+                job,
+                status="completed",
+                progress=100,
+                completed_at=datetime.now(),
+                translated_file_path=job.file_path  # No translation needed
+            )
             return
 
-        job.status = "translating"
-        job.progress = 30
+        text_to_translation = {}
+        if chinese_texts:
+            update_job(job, status="translating", progress=TRANSLATE_PROGRESS_START)
 
-        # Get glossary
-        glossary = translation_service.create_technical_glossary()
+            # Get glossary
+            glossary = translation_service.create_technical_glossary()
 
-        # Translate texts
-        translation_results = await translation_service.translate(chinese_texts, glossary)
+            # Translate texts
+            async with scheduler.translate_slot():
+                with STAGE_SECONDS.time(stage='translate'), profiler.stage('translate'):
+                    translation_results = await translation_service.translate(
+                        chinese_texts, glossary, progress_callback=translation_progress_reporter(job)
+                    )
+            TRANSLATED_STRINGS.inc(len(chinese_texts))
 
-        # Create translation mapping
-        text_to_translation = {}
-        for i, result in enumerate(translation_results):
-            text_to_translation[chinese_texts[i]] = result['translated_text']
+            # Create translation mapping
+            for i, result in enumerate(translation_results):
+                text_to_translation[chinese_texts[i]] = translated_text(result)
 
-        job.status = "replacing"
-        job.progress = 70
+        update_job(job, status="replacing", progress=TRANSLATE_PROGRESS_END)
 
         # Replace text in DWG file
-        # Create handle-to-text mapping
-        handle_to_translation = {}
-        for entity in text_entities:
-            if entity.text in text_to_translation:
-                handle_to_translation[entity.handle] = text_to_translation[entity.text]
+        # Fan each unique translation back out to every handle that shares the text
+        handle_to_translation = dict(reused)
+        handle_to_translation.update(await run_blocking(dedup.fan_out, text_to_translation))
+
+        # Replace texts in a worker process
+        async with scheduler.parse_slot():
+            with STAGE_SECONDS.time(stage='replace'), profiler.stage('replace'):
+                translated_file_path = await worker_pool.run(
+                    'replace_text_entities', job.file_path, handle_to_translation, session_id=job_id,
+                    on_profile=profiler.worker_callback('replace'), source_hash=job.file_hash
+                )
+        REPLACED_ENTITIES.inc(len(handle_to_translation))
+
+        with profiler.stage('save'):
+            await run_blocking(job_store.save_payload, job_id, 'translations', {**reused_texts, **text_to_translation})
+            await run_blocking(save_text_table, job_id, text_entities, handle_to_translation)
+        update_job(
+            job,
+            status="completed",
+            progress=100,
+            completed_at=datetime.now(),
+            translated_file_path=translated_file_path,
+            translations_count=len(text_to_translation)
+        )
+
+    except asyncio.CancelledError:
+        cancel_job(job)
+        raise
+    except Exception as e:
+        fail_job(job, e)
+    finally:
+        profiler.stop()
+        await worker_pool.close_session(job_id)
+        if profiler.enabled:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, profiler.write)
+            except Exception:
+                logger.exception(f"Failed to write profile of job {job_id}")
+
+def fail_job(job: TranslationJob, error: Exception):
+    logger.error(f"Job {job.job_id} failed: {error}", exc_info=error)
+    update_job(job, status="failed", error_message=str(error), completed_at=datetime.now())
+
+async def extract_batch_child(child: TranslationJob, keep_session: bool) -> Optional[DedupResult]:
+    """Parse one drawing of a batch; a failure only fails that child"""
+    try:
+        await convert_drawing(child)
+        async with scheduler.parse_slot():
+            update_job(child, status="extracting", progress=10)
+            with STAGE_SECONDS.time(stage='extract'):
+                text_entities = await worker_pool.run(
+                    'extract_text_entities', child.file_path,
+                    session_id=child.job_id if keep_session else None, source_hash=child.file_hash
+                )
+        EXTRACTED_ENTITIES.inc(len(text_entities))
+        await run_blocking(job_store.save_payload, child.job_id, 'extracted_texts', text_entities)
+        child.stats.update(await run_blocking(block_stats, text_entities))
+        # Translation waits until every drawing in the set has been parsed
+        update_job(child, status="translating", progress=TRANSLATE_PROGRESS_START,
+                   extracted_count=len(text_entities))
+        return await run_blocking(dedup_entities, text_entities)
+    except Exception as e:
+        fail_job(child, e)
+        await worker_pool.close_session(child.job_id)
+        return None
 
-        # Replace texts
-        translated_file_path = dwg_processor.replace_text_entities(job.file_path, handle_to_translation)
+async def replace_batch_child(child: TranslationJob, dedup: DedupResult,
+                              text_to_translation: Dict[str, str], keep_session: bool):
+    try:
+        child.stats.update(dedup.stats())
+        if not dedup.unique_count:
+            update_job(
+                child,
+                status="completed",
+                progress=100,
+                completed_at=datetime.now(),
+                translated_file_path=child.file_path  # No translation needed
+            )
+            return
 
-        job.status = "completed"
-        job.progress = 100
-        job.completed_at = datetime.now()
-        job.translated_file_path = translated_file_path
-        job.translations = text_to_translation
+        handle_to_translation = await run_blocking(dedup.fan_out, text_to_translation)
+        async with scheduler.parse_slot():
+            update_job(child, status="replacing", progress=TRANSLATE_PROGRESS_END)
+            with STAGE_SECONDS.time(stage='replace'):
+                translated_file_path = await worker_pool.run(
+                    'replace_text_entities', child.file_path, handle_to_translation,
+                    session_id=child.job_id if keep_session else None, source_hash=child.file_hash
+                )
+        REPLACED_ENTITIES.inc(len(handle_to_translation))
+
+        translations = {text: text_to_translation[text] for text in dedup.handles_by_text if text in text_to_translation}
+        await run_blocking(job_store.save_payload, child.job_id, 'translations', translations)
+        update_job(
+            child,
+            status="completed",
+            progress=100,
+            completed_at=datetime.now(),
+            translated_file_path=translated_file_path,
+            translations_count=len(translations)
+        )
+    except Exception as e:
+        fail_job(child, e)
+    finally:
+        await worker_pool.close_session(child.job_id)
+
+def write_batch_archive(archive_path: str, children: List[TranslationJob]) -> int:
+    """Zip the translated drawings of a batch, keeping the names they were submitted under"""
+    written = 0
+    arcnames = set()
+    with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for child in children:
+            if child.status != "completed" or not child.translated_file_path:
+                continue
+            folder, name = os.path.split(child.filename)
+            extension = os.path.splitext(child.translated_file_path)[1]
+            arcname = os.path.join(folder, f"translated_{os.path.splitext(name)[0]}{extension}")
+            if arcname in arcnames:
+                arcname = os.path.join(folder, f"translated_{child.job_id[:8]}_{os.path.splitext(name)[0]}{extension}")
+            arcnames.add(arcname)
+            archive.write(child.translated_file_path, arcname)
+            written += 1
+    return written
+
+def progress_counter(job: TranslationJob, start: int, end: int, total: int):
+    """Advance a batch's progress from start to end as its children finish a stage"""
+    done = 0
+    def advance():
+        nonlocal done
+        done += 1
+        job.progress = start + (end - start) * done // max(total, 1)
+        job_events.publish(job.job_id, job_status(job))
+    return advance
+
+async def process_batch(batch_id: str):
+    """Background task for a batch: parse every drawing, translate the set once, then write each drawing"""
+    batch = job_store.get(batch_id)
+    if not batch:
+        return
+    children = job_store.list_children(batch_id)
+    # Documents only stay open between stages if the workers can hold the whole set
+    keep_session = len(children) <= worker_pool.max_workers * MAX_SESSIONS_PER_WORKER
 
+    try:
+        update_job(batch, status="extracting", progress=10)
+
+        extracted = progress_counter(batch, 10, TRANSLATE_PROGRESS_START, len(children))
+        async def extract(child: TranslationJob) -> Optional[DedupResult]:
+            result = await extract_batch_child(child, keep_session)
+            extracted()
+            return result
+
+        results = await asyncio.gather(*(extract(child) for child in children))
+        dedups = {child.job_id: dedup for child, dedup in zip(children, results) if dedup is not None}
+        if not dedups:
+            raise Exception("No drawing in the batch could be parsed")
+
+        # Strings repeated anywhere in the set are filtered and translated once
+        combined = await run_blocking(combine_dedup, dedups)
+        with STAGE_SECONDS.time(stage='filter'):
+            chinese_texts = await run_blocking(translation_service.filter_chinese_texts, combined.unique_texts)
+        FILTERED_STRINGS.inc(combined.unique_count)
+        combined = combined.select(chinese_texts)
+        batch.stats.update(combined.stats())
+        batch.extracted_count = sum(child.extracted_count for child in children)
+
+        text_to_translation = {}
+        if chinese_texts:
+            update_job(batch, status="translating", progress=TRANSLATE_PROGRESS_START)
+            glossary = translation_service.create_technical_glossary()
+            async with scheduler.translate_slot():
+                with STAGE_SECONDS.time(stage='translate'):
+                    translation_results = await translation_service.translate(
+                        chinese_texts, glossary, progress_callback=translation_progress_reporter(batch)
+                    )
+            TRANSLATED_STRINGS.inc(len(chinese_texts))
+            for i, result in enumerate(translation_results):
+                text_to_translation[chinese_texts[i]] = translated_text(result)
+            await run_blocking(job_store.save_payload, batch_id, 'translations', text_to_translation)
+
+        update_job(batch, status="replacing", progress=TRANSLATE_PROGRESS_END)
+
+        chinese_set = set(chinese_texts)
+        replaced = progress_counter(batch, TRANSLATE_PROGRESS_END, 100, len(dedups))
+        async def replace(child: TranslationJob):
+            dedup = dedups[child.job_id]
+            await replace_batch_child(
+                child, dedup.select(text for text in dedup.handles_by_text if text in chinese_set),
+                text_to_translation, keep_session
+            )
+            replaced()
+
+        await asyncio.gather(*(replace(child) for child in children if child.job_id in dedups))
+
+        archive_path = os.path.join(PROCESSED_DIR, f"{batch_id}_translated.zip")
+        written = await asyncio.get_running_loop().run_in_executor(
+            None, write_batch_archive, archive_path, children
+        )
+        batch.stats.update({
+            'completed_files': written,
+            'failed_files': sum(1 for child in children if child.status == "failed")
+        })
+        if not written:
+            raise Exception("Every drawing in the batch failed")
+
+        update_job(
+            batch,
+            status="completed",
+            progress=100,
+            completed_at=datetime.now(),
+            translated_file_path=archive_path,
+            translations_count=len(text_to_translation)
+        )
+
+    except asyncio.CancelledError:
+        # Cancelling the gather above has already cancelled the children's stages
+        cancel_job(batch)
+        for child in children:
+            if child.status not in FINISHED_STATUSES:
+                cancel_job(child)
+                await worker_pool.close_session(child.job_id)
+        raise
     except Exception as e:
-        job.status = "failed"
-        job.error_message = str(e)
-        job.completed_at = datetime.now()
+        fail_job(batch, e)
+        for child in children:
+            if child.status not in FINISHED_STATUSES:
+                fail_job(child, e)
+                await worker_pool.close_session(child.job_id)
+
+def check_base_job(based_on_job_id: str):
+    """A revision can build on any finished single-drawing job, including one drawing of a batch"""
+    base = job_store.get(based_on_job_id)
+    if not base:
+        raise HTTPException(status_code=404, detail=f"Job {based_on_job_id} not found")
+    if base.status != "completed":
+        raise HTTPException(status_code=400, detail=f"Job {based_on_job_id} has not completed")
+    if job_store.list_children(based_on_job_id):
+        raise HTTPException(status_code=400, detail="A revision must be based on a single drawing, not a batch")
 
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...), background_tasks: BackgroundTasks = None):
+async def upload_file(request: Request, file: UploadFile = File(...), based_on_job_id: Optional[str] = Form(None),
+                      profile: bool = Form(False)):
+    if profile:
+        require_admin(request)
     if not (file.filename.lower().endswith('.dwg') or file.filename.lower().endswith('.dxf')):
         raise HTTPException(status_code=400, detail="Only DWG and DXF files are supported")
+    if based_on_job_id:
+        check_base_job(based_on_job_id)
 
     job_id = str(uuid.uuid4())
     file_path = os.path.join(UPLOAD_DIR, f"{job_id}_{file.filename}")
 
     try:
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        upload = await save_upload_stream(file, file_path)
 
-        jobs[job_id] = TranslationJob(job_id, file.filename, file_path)
+        job = TranslationJob(job_id, file.filename, file_path)
+        job.file_size = upload.size
+        job.file_hash = upload.sha256
+        job.based_on_job_id = based_on_job_id or None
+        job_store.save(job)
 
         # Start background processing
-        if background_tasks:
-            background_tasks.add_task(process_translation, job_id)
+        start_job(job_id, process_translation(job_id, profile=profile))
 
         return {
             "job_id": job_id,
             "filename": file.filename,
+            "file_size": upload.size,
+            "sha256": upload.sha256,
+            "based_on_job_id": job.based_on_job_id,
+            "profile": profile,
             "message": "File uploaded successfully",
             "status": "processing_started"
         }
+    except UploadValidationError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.exception("Upload failed")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+BATCH_EXTENSIONS = ('.dwg', '.dxf', '.zip')
+
+async def save_batch_files(files: List[UploadFile], batch_dir: str) -> List[tuple]:
+    """Store the drawings of a batch, expanding ZIP archives; returns (display name, upload result) pairs"""
+    drawings = []
+    total_size = 0
+
+    for index, file in enumerate(files):
+        filename = os.path.basename(file.filename or "")
+        if not filename.lower().endswith(BATCH_EXTENSIONS):
+            raise UploadValidationError(f"{filename or 'File'}: only DWG, DXF and ZIP files are supported")
+
+        file_path = os.path.join(batch_dir, f"{index:04d}_{filename}")
+        remaining = MAX_BATCH_SIZE - total_size
+        if filename.lower().endswith('.zip'):
+            archive = await save_upload_stream(file, file_path, max_size=remaining, allowed_formats=('zip',))
+            members = await asyncio.get_running_loop().run_in_executor(
+                None, extract_cad_archive, archive.file_path,
+                os.path.join(batch_dir, f"{index:04d}"), MAX_BATCH_FILES - len(drawings),
+                MAX_UPLOAD_SIZE, remaining
+            )
+            # The members are on disk now, the archive itself is no longer needed
+            os.remove(archive.file_path)
+            drawings.extend(members)
+            total_size += sum(upload.size for _, upload in members)
+        else:
+            upload = await save_upload_stream(file, file_path, max_size=min(MAX_UPLOAD_SIZE, remaining))
+            drawings.append((filename, upload))
+            total_size += upload.size
+
+        if len(drawings) > MAX_BATCH_FILES:
+            raise UploadValidationError(f"Batch contains more than {MAX_BATCH_FILES} drawings")
+
+    if not drawings:
+        raise UploadValidationError("Batch contains no drawings")
+    return drawings
+
+@app.post("/batches")
+async def upload_batch(files: List[UploadFile] = File(...)):
+    """Submit a drawing set as several DWG/DXF files and/or ZIP archives"""
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Batch contains more than {MAX_BATCH_FILES} files")
+
+    batch_id = str(uuid.uuid4())
+    batch_dir = os.path.join(UPLOAD_DIR, batch_id)
+    os.makedirs(batch_dir, exist_ok=True)
+
+    try:
+        drawings = await save_batch_files(files, batch_dir)
+
+        if len(files) == 1 and files[0].filename.lower().endswith('.zip'):
+            batch_name = os.path.basename(files[0].filename)
+        else:
+            batch_name = f"batch_{batch_id[:8]}.zip"
+
+        batch = TranslationJob(batch_id, batch_name, batch_dir)
+        batch.file_size = sum(upload.size for _, upload in drawings)
+        batch.stats = {'file_count': len(drawings)}
+
+        children = []
+        for name, upload in drawings:
+            child = TranslationJob(str(uuid.uuid4()), name, upload.file_path)
+            child.parent_id = batch_id
+            child.file_size = upload.size
+            child.file_hash = upload.sha256
+            children.append(child)
+        job_store.save_many([batch] + children)
+
+        start_job(batch_id, process_batch(batch_id))
+
+        return {
+            "batch_id": batch_id,
+            "job_id": batch_id,
+            "filename": batch_name,
+            "file_count": len(children),
+            "file_size": batch.file_size,
+            "jobs": [
+                {"job_id": child.job_id, "filename": child.filename, "file_size": child.file_size}
+                for child in children
+            ],
+            "message": "Batch uploaded successfully",
+            "status": "processing_started"
+        }
+    except UploadValidationError as e:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
+        logger.exception(f"Batch upload {batch_id} failed")
+        shutil.rmtree(batch_dir, ignore_errors=True)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@app.get("/batches/{batch_id}")
+async def get_batch_status(batch_id: str):
+    batch = job_store.get(batch_id)
+    if not batch or batch.parent_id is not None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    status = job_events.latest(batch_id) or job_status(batch)
+    return {
+        **status,
+        "jobs": [job_events.latest(child.job_id) or job_status(child) for child in job_store.list_children(batch_id)],
+        "scheduler": scheduler.stats()
+    }
+
 @app.get("/jobs/{job_id}")
 async def get_job_status(job_id: str):
-    if job_id not in jobs:
+    # Active jobs: reuse the snapshot last pushed to event subscribers
+    snapshot = job_events.latest(job_id)
+    if snapshot is not None:
+        return snapshot
+
+    job = job_store.get(job_id)
+    if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    job = jobs[job_id]
-    return {
-        "job_id": job.job_id,
-        "filename": job.filename,
-        "status": job.status,
-        "progress": job.progress,
-        "error_message": job.error_message,
-        "created_at": job.created_at,
-        "completed_at": job.completed_at,
-        "extracted_count": len(job.extracted_texts),
-        "translations_count": len(job.translations)
-    }
+    return job_status(job)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """Server-Sent Events stream of job status, ending once the job finishes"""
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    # Subscribe before taking the snapshot so no update falls in between
+    queue = job_events.subscribe(job_id)
+
+    async def event_stream():
+        try:
+            event = job_events.latest(job_id) or job_status(job)
+            yield sse_message(event)
+
+            while event["status"] not in FINISHED_STATUSES:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_message(event)
+        finally:
+            job_events.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job_processing(job_id: str):
+    """Abort a running job or batch, killing any converter it is waiting on"""
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    task = job_tasks.get(job_id)
+    if task is None:
+        if job.parent_id in job_tasks:
+            raise HTTPException(status_code=400, detail="Jobs of a batch are cancelled with their batch")
+        raise HTTPException(status_code=400, detail="Job is not running")
+
+    task.cancel()
+    return {"job_id": job_id, "message": "Cancellation requested"}
 
 @app.get("/download/{job_id}")
 async def download_file(job_id: str):
-    if job_id not in jobs:
+    job = job_store.get(job_id)
+    if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    job = jobs[job_id]
     if job.status != "completed":
         raise HTTPException(status_code=400, detail="Job not completed")
 
@@ -182,6 +844,23 @@ async def download_file(job_id: str):
         media_type='application/octet-stream'
     )
 
+@app.get("/jobs/{job_id}/profile")
+async def download_profile(job_id: str, request: Request):
+    """Profile of a job uploaded with profile=true: summary.json, .prof files and text reports"""
+    require_admin(request)
+    if not job_store.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    profile_path = job_store.artifact_path(job_id, PROFILE_FILENAME)
+    if not os.path.exists(profile_path):
+        raise HTTPException(status_code=404, detail="No profile for this job; it wasn't profiled or is still running")
+
+    return FileResponse(
+        path=profile_path,
+        filename=f"profile_{job_id}.zip",
+        media_type='application/zip'
+    )
+
 @app.get("/jobs")
 async def list_jobs():
     return {
@@ -194,10 +873,15 @@ async def list_jobs():
                 "created_at": job.created_at,
                 "completed_at": job.completed_at
             }
-            for job in jobs.values()
+            for job in job_store.list_jobs(top_level_only=True)
         ]
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of this process's pipeline metrics"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now()}
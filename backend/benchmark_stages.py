@@ -0,0 +1,274 @@
+import gc
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import ezdxf
+
+from dwg_processor import DXF_SCANNER_MIN_SIZE, TEXT_BACKENDS, DWGProcessor
+from conversion_cache import ConversionCache
+from debug_translation_service import DebugTranslationService
+from mock_translation_service import MockTranslationService
+from text_cleaner import TextCleaner
+from text_dedup import dedup_entities
+from synthetic_dxf import (
+    CODEPAGES, DEFAULT_MIX, SyntheticDrawingSpec, generate_dxf, parse_mix
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+STAGES = (
+    'generate', 'convert', 'extract_text_entities', 'dedup', 'clean_text',
+    'filter_chinese_texts', 'translate', 'replace_text_entities'
+)
+
+def _max_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=10,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+class StageTimer:
+    """Runs a stage, timing it untraced, then again under tracemalloc for its peak allocation
+
+    Timing and tracing are separate passes because tracemalloc slows
+    allocation-heavy code several times over.
+    """
+
+    def __init__(self, repeat: int = 1, trace_memory: bool = True):
+        self.repeat = max(1, repeat)
+        self.trace_memory = trace_memory
+
+    def run(self, func: Callable, items: Optional[Callable] = None) -> tuple:
+        """(result of the first run, stage record); items(result) gives the unit count for throughput"""
+        result = None
+        seconds: List[float] = []
+        cpu_seconds: List[float] = []
+        for attempt in range(self.repeat):
+            gc.collect()
+            start, cpu_start = time.perf_counter(), time.process_time()
+            value = func()
+            seconds.append(time.perf_counter() - start)
+            cpu_seconds.append(time.process_time() - cpu_start)
+            if attempt == 0:
+                result = value
+            del value
+
+        record = {
+            'seconds': round(min(seconds), 6),
+            'cpu_seconds': round(min(cpu_seconds), 6)
+        }
+        if self.repeat > 1:
+            record['all_seconds'] = [round(value, 6) for value in seconds]
+        if items is not None:
+            count = items(result)
+            record['items'] = count
+            record['items_per_second'] = round(count / record['seconds'], 1) if record['seconds'] else None
+
+        if self.trace_memory:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                func()
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            record['peak_traced_bytes'] = peak
+        record['max_rss_bytes'] = _max_rss_bytes()
+        return result, record
+
+def _skipped(reason: str) -> Dict:
+    return {'skipped': reason}
+
+def benchmark_size(entities: int, spec: SyntheticDrawingSpec, workdir: str, timer: StageTimer,
+                   dwg_path: Optional[str] = None, text_backend: str = 'auto') -> Dict:
+    """Generate a drawing with the given number of text entities and time every stage on it"""
+    spec = SyntheticDrawingSpec(**{**spec.__dict__, 'entities': entities})
+    dxf_path = os.path.join(workdir, f"synthetic_{entities}.dxf")
+    stages: Dict[str, Dict] = {}
+
+    info, stages['generate'] = timer.run(lambda: generate_dxf(dxf_path, spec), lambda info: info['layout_entities'])
+    stages['generate']['bytes_per_second'] = round(info['bytes'] / stages['generate']['seconds'], 1)
+
+    if dwg_path:
+        def convert():
+            # A fresh cache every run, so each one pays for the conversion
+            cache_dir = tempfile.mkdtemp(prefix="conversion_cache_", dir=workdir)
+            try:
+                DWGProcessor(ConversionCache(cache_dir)).convert_dwg_to_dxf(dwg_path)
+            finally:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+        _, stages['convert'] = timer.run(convert)
+        stages['convert']['input'] = dwg_path
+        stages['convert']['bytes_per_second'] = round(os.path.getsize(dwg_path) / stages['convert']['seconds'], 1)
+    else:
+        stages['convert'] = _skipped("no DWG given (--dwg); synthetic drawings are written as DXF")
+
+    processor = DWGProcessor(text_backend=text_backend)
+    sessions = []
+
+    def extract():
+        session = processor.open_session(dxf_path)
+        sessions.append(session)
+        return processor.extract_text_entities(dxf_path, session=session)
+
+    text_entities, stages['extract_text_entities'] = timer.run(extract, len)
+    stages['extract_text_entities']['backend'] = processor.text_backend_for(dxf_path)
+    stages['extract_text_entities']['bytes_per_second'] = round(info['bytes'] / stages['extract_text_entities']['seconds'], 1)
+    # Replace runs on the session of the first extraction, like a job does
+    session = sessions[0]
+    del sessions[1:]
+
+    dedup, stages['dedup'] = timer.run(lambda: dedup_entities(text_entities), lambda dedup: dedup.total_count)
+    stages['dedup']['unique_texts'] = dedup.unique_count
+    unique_texts = dedup.unique_texts
+
+    text_cleaner = TextCleaner()
+    _, stages['clean_text'] = timer.run(lambda: [text_cleaner.clean_text(text) for text in unique_texts], len)
+    stages['clean_text']['chars'] = sum(map(len, unique_texts))
+
+    translation_service = DebugTranslationService()
+    chinese_texts, stages['filter_chinese_texts'] = timer.run(
+        lambda: translation_service.filter_chinese_texts(unique_texts), lambda texts: len(unique_texts)
+    )
+    stages['filter_chinese_texts']['chinese_texts'] = len(chinese_texts)
+
+    # No simulated latency: measures the per-text overhead of the service and its result handling
+    mock_service = MockTranslationService(delay=0)
+    results, stages['translate'] = timer.run(lambda: asyncio.run(mock_service.translate(chinese_texts)), len)
+    stages['translate']['service'] = 'mock (no delay)'
+
+    text_to_translation = {result['source_text']: result['translated_text'] for result in results}
+    handle_to_translation = dedup.select(chinese_texts).fan_out(text_to_translation)
+    output_path, stages['replace_text_entities'] = timer.run(
+        lambda: processor.replace_text_entities(dxf_path, handle_to_translation, session=session),
+        lambda output_path: len(handle_to_translation)
+    )
+    stages['replace_text_entities']['output_bytes'] = os.path.getsize(output_path)
+
+    return {'entities': entities, 'drawing': info, 'stages': stages}
+
+def _environment() -> Dict:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'ezdxf': ezdxf.__version__,
+        'git_commit': _git_commit()
+    }
+
+def _summary(results: Dict, baseline: Optional[Dict] = None) -> str:
+    """Seconds per stage and size; with a baseline, also its seconds and the speedup"""
+    base_runs = {run['entities']: run for run in (baseline or {}).get('runs', [])}
+    lines = [f"{'entities':>10} {'stage':<24} {'seconds':>10} {'items/s':>12}" + (f" {'baseline':>10} {'speedup':>8}" if baseline else '')]
+    for run in results['runs']:
+        for name in STAGES:
+            stage = run['stages'].get(name)
+            if stage is None or 'skipped' in stage:
+                continue
+            rate = stage.get('items_per_second')
+            line = f"{run['entities']:>10} {name:<24} {stage['seconds']:>10.3f} {rate if rate is not None else '-':>12}"
+            if baseline:
+                base_stage = base_runs.get(run['entities'], {}).get('stages', {}).get(name, {})
+                if 'seconds' in base_stage:
+                    speedup = base_stage['seconds'] / stage['seconds'] if stage['seconds'] else float('inf')
+                    line += f" {base_stage['seconds']:>10.3f} {speedup:>7.2f}x"
+            lines.append(line)
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and memory-profile each pipeline stage on synthetic drawings")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="text entities per drawing")
+    parser.add_argument('--output', default=None, help="JSON results file (default: benchmark-<timestamp>.json)")
+    parser.add_argument('--baseline', default=None, help="earlier results file to compare against")
+    parser.add_argument('--backend', choices=TEXT_BACKENDS, default='auto',
+                        help="extraction backend; auto follows DXF_SCANNER_MIN_SIZE")
+    parser.add_argument('--dwg', default=None, help="DWG file to time the convert stage on")
+    parser.add_argument('--repeat', type=int, default=1, help="timed runs per stage; the fastest is reported")
+    parser.add_argument('--no-trace-memory', action='store_true', help="skip the tracemalloc pass of each stage")
+    parser.add_argument('--workdir', default=None, help="where drawings are written (default: a temporary directory)")
+    parser.add_argument('--keep-files', action='store_true', help="keep the generated and translated drawings")
+    parser.add_argument('--verbose', action='store_true', help="keep the pipeline's INFO logging")
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.5)
+    parser.add_argument('--ascii-ratio', type=float, default=0.1)
+    parser.add_argument('--mtext-format-density', type=float, default=0.3)
+    parser.add_argument('--block-depth', type=int, default=2)
+    parser.add_argument('--codepage', choices=sorted(CODEPAGES), default='utf8')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    spec = SyntheticDrawingSpec(
+        mix=parse_mix(args.mix), duplicate_ratio=args.duplicate_ratio, ascii_ratio=args.ascii_ratio,
+        mtext_format_density=args.mtext_format_density, block_depth=args.block_depth,
+        codepage=args.codepage, seed=args.seed
+    )
+    timer = StageTimer(repeat=args.repeat, trace_memory=not args.no_trace_memory)
+    output = args.output or f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    results = {
+        'created_at': datetime.now().isoformat(),
+        'environment': _environment(),
+        'settings': {
+            'backend': args.backend,
+            'scanner_min_size': DXF_SCANNER_MIN_SIZE,
+            'repeat': timer.repeat,
+            'trace_memory': timer.trace_memory,
+            'spec': {key: value for key, value in spec.__dict__.items() if key != 'entities'}
+        },
+        'runs': []
+    }
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="dwg_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        for entities in args.sizes:
+            print(f"Benchmarking {entities} entities...", flush=True)
+            results['runs'].append(benchmark_size(entities, spec, workdir, timer, args.dwg, args.backend))
+            # Written after every size, so a long run that dies still leaves the finished sizes
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            if not args.keep_files:
+                for name in os.listdir(workdir):
+                    if name.startswith(f"synthetic_{entities}"):
+                        os.remove(os.path.join(workdir, name))
+    finally:
+        if not args.keep_files and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(_summary(results, baseline))
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
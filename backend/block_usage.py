@@ -0,0 +1,60 @@
+from typing import Dict, Iterable
+
+# Largest-first block definitions listed in a job's stats
+BLOCK_STATS_LIMIT = 50
+
+def is_layout_block(name: str) -> bool:
+    """Layout blocks (*Model_Space, *Paper_Space, *Paper_Space0...) hold drawing content, not definitions"""
+    return name.upper().startswith(('*MODEL_SPACE', '*PAPER_SPACE'))
+
+def instance_counts(inserts: Dict[str, Dict[str, int]]) -> Dict[str, int]:
+    """How many times each block definition is placed in the drawing, nested placements included
+
+    inserts maps every block record holding INSERTs (a layout or another
+    definition) to {inserted block name: placements}.
+    """
+    inserted_in: Dict[str, Dict[str, int]] = {}
+    for container, blocks in inserts.items():
+        for name, count in blocks.items():
+            inserted_in.setdefault(name, {})[container] = count
+
+    counts: Dict[str, int] = {}
+    visiting = set()
+
+    def count(name: str) -> int:
+        if is_layout_block(name):
+            return 1
+        if name in counts:
+            return counts[name]
+        if name in visiting:
+            # A block that (indirectly) inserts itself is invalid; don't recurse forever
+            return 0
+        visiting.add(name)
+        total = sum(placements * count(container) for container, placements in inserted_in.get(name, {}).items())
+        visiting.discard(name)
+        counts[name] = total
+        return total
+
+    for name in inserted_in:
+        count(name)
+    return counts
+
+def block_stats(entities: Iterable) -> Dict:
+    """Text found in block definitions and how many placements translating it once covers"""
+    blocks: Dict[str, Dict[str, int]] = {}
+    for entity in entities:
+        if is_layout_block(entity.block):
+            continue
+        usage = blocks.get(entity.block)
+        if usage is None:
+            blocks[entity.block] = {'texts': 1, 'instances': entity.instances}
+        else:
+            usage['texts'] += 1
+
+    largest = sorted(blocks.items(), key=lambda item: item[1]['instances'], reverse=True)[:BLOCK_STATS_LIMIT]
+    return {
+        'block_definitions': len(blocks),
+        'block_texts': sum(usage['texts'] for usage in blocks.values()),
+        'block_text_instances': sum(usage['texts'] * usage['instances'] for usage in blocks.values()),
+        'blocks': dict(largest)
+    }
@@ -0,0 +1,368 @@
+import os
+import time
+import shutil
+import asyncio
+import hashlib
+import logging
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONVERSION_CACHE_DIR = os.getenv('CONVERSION_CACHE_DIR', 'conversion_cache')
+CONVERSION_CACHE_MAX_BYTES = int(os.getenv('CONVERSION_CACHE_MAX_BYTES', 10737418240))  # 10GB
+# How long a worker waits for another worker converting the same file
+CONVERSION_LOCK_TIMEOUT = int(os.getenv('CONVERSION_LOCK_TIMEOUT', 900))  # seconds
+
+# Parent of per-conversion workspaces; defaults to the folder of the file being converted
+CONVERSION_WORKSPACE_DIR = os.getenv('CONVERSION_WORKSPACE_DIR') or None
+
+# Entries used this recently are never evicted, so a path just handed out stays readable
+EVICTION_GRACE_SECONDS = 60
+HASH_CHUNK_SIZE = 1048576
+
+def file_sha256(path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def tool_fingerprint(path: str) -> Optional[str]:
+    """Identify an installed converter binary by size and mtime, for tools without a version flag"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{path} {stat.st_size} {int(stat.st_mtime)}"
+
+def _create_workspace(source_path: str, root: Optional[str]) -> str:
+    # Hard links need the same filesystem, hence the source's own folder by default
+    workspace = tempfile.mkdtemp(prefix='.convert_', dir=root or os.path.dirname(os.path.abspath(source_path)))
+    try:
+        input_dir = os.path.join(workspace, 'in')
+        os.mkdir(input_dir)
+        os.mkdir(os.path.join(workspace, 'out'))
+        staged_path = os.path.join(input_dir, os.path.basename(source_path))
+        try:
+            os.link(source_path, staged_path)
+        except OSError:
+            # Different filesystem or no hard link support
+            shutil.copyfile(source_path, staged_path)
+    except BaseException:
+        shutil.rmtree(workspace, ignore_errors=True)
+        raise
+    return workspace
+
+@contextmanager
+def conversion_workspace(source_path: str, root: Optional[str] = CONVERSION_WORKSPACE_DIR) -> Iterator[Tuple[str, str]]:
+    """Private input/output folders for converters that process a whole folder (ODA, Teigha)
+
+    Yields (input_dir, output_dir). input_dir holds only a hard link to
+    source_path, so the converter never sees other uploads and concurrent
+    jobs never share an output folder. Removed on exit; move results out
+    before leaving the block.
+    """
+    workspace = _create_workspace(source_path, root)
+    try:
+        yield os.path.join(workspace, 'in'), os.path.join(workspace, 'out')
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+@asynccontextmanager
+async def conversion_workspace_async(source_path: str,
+                                     root: Optional[str] = CONVERSION_WORKSPACE_DIR) -> AsyncIterator[Tuple[str, str]]:
+    """conversion_workspace for the event loop: staging (possibly a full copy) and removal run on a thread"""
+    loop = asyncio.get_running_loop()
+    workspace = await loop.run_in_executor(None, _create_workspace, source_path, root)
+    try:
+        yield os.path.join(workspace, 'in'), os.path.join(workspace, 'out')
+    finally:
+        await loop.run_in_executor(None, shutil.rmtree, workspace, True)
+
+def converted_path(output_dir: str, source_path: str, extension: str = '.dxf') -> str:
+    """Where a folder converter writes the result for source_path"""
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(source_path))[0] + extension)
+
+class FileLock:
+    """Exclusive advisory lock on a file, shared by every process on the host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _unlock(fd: int):
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def _is_current(self, fd: int) -> bool:
+        """Whether fd is still the file at path; eviction removes lock files while holding them"""
+        try:
+            return os.fstat(fd).st_ino == os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _open(self) -> int:
+        return os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def acquire(self, timeout: Optional[float] = None, poll_interval: float = 0.2) -> bool:
+        fd = self._open()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._try_lock(fd):
+                if self._is_current(fd):
+                    break
+                # Removed while we waited on it; lock the file now at path instead
+                self._unlock(fd)
+                fd = self._open()
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                os.close(fd)
+                return False
+            time.sleep(poll_interval)
+        self._fd = fd
+        return True
+
+    async def acquire_async(self, timeout: Optional[float] = None, poll_interval: float = 0.2) -> bool:
+        """acquire() that waits without blocking the event loop"""
+        fd = self._open()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                if self._try_lock(fd):
+                    if self._is_current(fd):
+                        break
+                    self._unlock(fd)
+                    fd = self._open()
+                    continue
+                if deadline is not None and time.monotonic() >= deadline:
+                    os.close(fd)
+                    return False
+                await asyncio.sleep(poll_interval)
+        except asyncio.CancelledError:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        self._unlock(fd)
+
+class ConversionCache:
+    """Content-addressed store of DWG->DXF conversions on local disk
+
+    Entries are keyed by the SHA-256 of the DWG bytes and the converter
+    version. Hits refresh the file's mtime, which is the LRU order used to
+    keep the directory within max_bytes. A per-key file lock makes
+    concurrent conversions of the same drawing single-flight across worker
+    processes.
+    """
+
+    def __init__(self, cache_dir: str = CONVERSION_CACHE_DIR, max_bytes: int = CONVERSION_CACHE_MAX_BYTES,
+                 lock_timeout: int = CONVERSION_LOCK_TIMEOUT):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock_timeout = lock_timeout
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(source_hash: str, converter_version: str) -> str:
+        return hashlib.sha256(f"{source_hash}\x1f{converter_version}".encode('utf-8')).hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.dxf")
+
+    def _lookup(self, path: str) -> bool:
+        try:
+            # Mark as recently used
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def get_or_convert(self, source_path: str, converter_version: str,
+                       convert: Callable[[str], str], source_hash: Optional[str] = None) -> str:
+        """Return a cached DXF for source_path, running convert(source_path) on a miss
+
+        convert returns the path of the DXF it produced; that file is moved
+        into the cache. The returned path is shared and must not be modified.
+        """
+        key = self.make_key(source_hash or file_sha256(source_path), converter_version)
+        path = self.entry_path(key)
+        if self._lookup(path):
+            self.hits += 1
+            logger.info(f"Conversion cache hit for {source_path}")
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock = FileLock(path + '.lock')
+        if not lock.acquire(timeout=self.lock_timeout):
+            # Another worker is stuck on this drawing; don't wait forever, convert privately
+            logger.warning(f"Timed out waiting for conversion lock on {source_path}, converting without cache")
+            return convert(source_path)
+
+        try:
+            # Whoever held the lock may have just stored it
+            if self._lookup(path):
+                self.hits += 1
+                logger.info(f"Conversion cache hit for {source_path} after waiting for another worker")
+                return path
+
+            self.misses += 1
+            started = time.monotonic()
+            dxf_path = convert(source_path)
+
+            # Move into place atomically so readers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            shutil.move(dxf_path, tmp_path)
+            os.replace(tmp_path, path)
+            logger.info(f"Cached conversion of {source_path} ({os.path.getsize(path)} bytes, "
+                        f"{time.monotonic() - started:.1f}s)")
+        finally:
+            lock.release()
+
+        self.evict()
+        return path
+
+    async def get_or_convert_async(self, source_path: str, converter_version: str,
+                                   convert: Callable[[str], Awaitable[str]],
+                                   source_hash: Optional[str] = None) -> str:
+        """get_or_convert for the event loop: convert is a coroutine function, waits never block"""
+        loop = asyncio.get_running_loop()
+        if source_hash is None:
+            source_hash = await loop.run_in_executor(None, file_sha256, source_path)
+        key = self.make_key(source_hash, converter_version)
+        path = self.entry_path(key)
+        if self._lookup(path):
+            self.hits += 1
+            logger.info(f"Conversion cache hit for {source_path}")
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock = FileLock(path + '.lock')
+        if not await lock.acquire_async(timeout=self.lock_timeout):
+            logger.warning(f"Timed out waiting for conversion lock on {source_path}, converting without cache")
+            return await convert(source_path)
+
+        try:
+            if self._lookup(path):
+                self.hits += 1
+                logger.info(f"Conversion cache hit for {source_path} after waiting for another worker")
+                return path
+
+            self.misses += 1
+            started = time.monotonic()
+            dxf_path = await convert(source_path)
+
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            shutil.move(dxf_path, tmp_path)
+            os.replace(tmp_path, path)
+            logger.info(f"Cached conversion of {source_path} ({os.path.getsize(path)} bytes, "
+                        f"{time.monotonic() - started:.1f}s)")
+        finally:
+            lock.release()
+
+        await loop.run_in_executor(None, self.evict)
+        return path
+
+    def pin(self, path: str, pin_path: str) -> str:
+        """Hard-link a cached DXF to pin_path so eviction can't take it from a job still using it
+
+        Falls back to a copy when the cache is on another filesystem. Raises
+        FileNotFoundError if the entry was evicted before it could be pinned.
+        """
+        tmp_path = f"{pin_path}.{os.getpid()}.tmp"
+        try:
+            os.link(path, tmp_path)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, pin_path)
+        return pin_path
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.dxf'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        lock = FileLock(os.path.join(self.cache_dir, '.evict.lock'))
+        # Another process is already evicting
+        if not lock.acquire(timeout=0):
+            return 0
+
+        try:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return 0
+
+            removed = 0
+            grace_cutoff = time.time() - EVICTION_GRACE_SECONDS
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_bytes or mtime > grace_cutoff:
+                    break
+                # Held while converting this key; removing the lock file is only safe while holding it
+                entry_lock = FileLock(path + '.lock')
+                if not entry_lock.acquire(timeout=0):
+                    continue
+                try:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    try:
+                        os.remove(entry_lock.path)
+                    except OSError:
+                        pass  # Windows can't remove an open file; it is reused as is
+                finally:
+                    entry_lock.release()
+                total -= size
+                removed += 1
+
+            if removed:
+                logger.info(f"Evicted {removed} cached conversions, {total} bytes remain")
+            return removed
+        finally:
+            lock.release()
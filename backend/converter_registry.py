@@ -0,0 +1,194 @@
+import os
+import signal
+import shutil
+import asyncio
+import logging
+import subprocess
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import ezdxf
+
+from conversion_cache import conversion_workspace, conversion_workspace_async, converted_path, tool_fingerprint
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Converter processes allowed at once in this process
+CONVERTER_MAX_PROCESSES = int(os.getenv('CONVERTER_MAX_PROCESSES', os.cpu_count() or 2))
+CONVERTER_TIMEOUT = int(os.getenv('CONVERTER_TIMEOUT', 120))  # seconds per converter run
+
+# Where each external DWG converter may be installed, in order of preference
+CONVERTER_CANDIDATES: Dict[str, List[str]] = {
+    'libredwg': ["dwg2dxf"],
+    'oda': [
+        "ODAFileConverter",
+        "/usr/bin/ODAFileConverter",
+        r"C:\Program Files\ODA\ODAFileConverter\ODAFileConverter.exe",
+        r"C:\Program Files (x86)\ODA\ODAFileConverter\ODAFileConverter.exe",
+        r"C:\Program Files\ODA\ODAFileConverter_4.3.2\ODAFileConverter.exe"
+    ],
+    'teigha': [
+        "TeighaFileConverter",
+        r"C:\Program Files\ODA\Teigha File Converter\TeighaFileConverter.exe",
+        r"C:\Program Files (x86)\ODA\Teigha File Converter\TeighaFileConverter.exe"
+    ],
+    'librecad': [
+        "librecad",
+        r"C:\Program Files\LibreCAD\librecad.exe",
+        r"C:\Program Files (x86)\LibreCAD\librecad.exe"
+    ]
+}
+
+# ODA and Teigha convert a whole input folder into an output folder
+FOLDER_CONVERTERS = ('oda', 'teigha')
+
+@dataclass
+class Converter:
+    name: str
+    path: str
+    version: str
+
+    def command(self, dwg_path: str, dxf_path: str, input_dir: Optional[str] = None,
+                output_dir: Optional[str] = None) -> List[str]:
+        if self.name in FOLDER_CONVERTERS:
+            return [self.path, input_dir, output_dir, "ACAD2018", "DXF", "0", "1"]
+        if self.name == 'librecad':
+            return [self.path, "-x", dxf_path, dwg_path]
+        return [self.path, "-o", dxf_path, dwg_path]
+
+def _probe_version(name: str, path: str) -> str:
+    if name == 'libredwg':
+        try:
+            result = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=10)
+            output = (result.stdout or result.stderr).strip()
+            if output:
+                return output.splitlines()[0]
+        except Exception as e:
+            logger.warning(f"Could not get {path} version: {e}")
+    # No usable version flag; the installed binary identifies the release
+    return tool_fingerprint(path) or path
+
+def _kill(process: asyncio.subprocess.Process):
+    """Kill a converter along with any helper processes it started"""
+    if os.name == 'posix':
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    else:
+        process.kill()
+
+class ConverterRegistry:
+    """External DWG converters found on this host, discovered once per process
+
+    Runs them either blocking (inside worker processes) or through
+    asyncio subprocesses bounded by a process-wide semaphore, killing the
+    converter if the awaiting job is cancelled.
+    """
+
+    def __init__(self, candidates: Dict[str, List[str]] = CONVERTER_CANDIDATES,
+                 max_processes: int = CONVERTER_MAX_PROCESSES, timeout: int = CONVERTER_TIMEOUT):
+        self.candidates = candidates
+        self.max_processes = max(1, max_processes)
+        self.timeout = timeout
+        self._converters: Optional[Dict[str, Converter]] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def discover(self) -> Dict[str, Converter]:
+        """Locate the installed converters; later calls return the cached result"""
+        if self._converters is None:
+            converters = {}
+            for name, paths in self.candidates.items():
+                for candidate in paths:
+                    path = shutil.which(candidate)
+                    if path:
+                        converters[name] = Converter(name, path, _probe_version(name, path))
+                        break
+            self._converters = converters
+            logger.info(f"DWG converters available: {', '.join(f'{c.name} ({c.path})' for c in converters.values()) or 'none'}")
+        return self._converters
+
+    def available(self, names: Sequence[str]) -> List[Converter]:
+        converters = self.discover()
+        return [converters[name] for name in names if name in converters]
+
+    def version(self, names: Sequence[str]) -> str:
+        """Fingerprint of the converter chain; part of the conversion cache key"""
+        parts = [f"ezdxf {ezdxf.__version__}"]
+        parts.extend(f"{converter.name} {converter.version}" for converter in self.available(names))
+        return '; '.join(parts)
+
+    def convert_sync(self, names: Sequence[str], dwg_path: str, dxf_path: str) -> bool:
+        """Try the named converters in order with blocking subprocess calls; True once dxf_path exists"""
+        for converter in self.available(names):
+            try:
+                if converter.name in FOLDER_CONVERTERS:
+                    # Run in a folder holding only this drawing; these tools convert everything they find
+                    with conversion_workspace(dwg_path) as (input_dir, output_dir):
+                        result = subprocess.run(converter.command(dwg_path, dxf_path, input_dir, output_dir),
+                                                capture_output=True, text=True, timeout=self.timeout)
+                        output_path = converted_path(output_dir, dwg_path)
+                        if result.returncode == 0 and os.path.exists(output_path):
+                            shutil.move(output_path, dxf_path)
+                else:
+                    result = subprocess.run(converter.command(dwg_path, dxf_path),
+                                            capture_output=True, text=True, timeout=self.timeout)
+
+                if result.returncode == 0 and os.path.exists(dxf_path):
+                    logger.info(f"Successfully converted DWG to DXF using {converter.name}")
+                    return True
+                logger.warning(f"{converter.name} conversion failed: {result.stderr}")
+            except Exception as e:
+                logger.warning(f"{converter.name} conversion failed: {e}")
+        return False
+
+    async def _run(self, args: List[str]) -> subprocess.CompletedProcess:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_processes)
+
+        async with self._semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                # Own process group, so a kill reaches the whole converter tree
+                start_new_session=os.name == 'posix'
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=self.timeout)
+            except BaseException:
+                # Timeout or job cancelled: don't leave the converter running
+                if process.returncode is None:
+                    _kill(process)
+                    await process.wait()
+                raise
+            return subprocess.CompletedProcess(
+                args, process.returncode,
+                stdout.decode(errors='replace'), stderr.decode(errors='replace')
+            )
+
+    async def convert(self, names: Sequence[str], dwg_path: str, dxf_path: str) -> bool:
+        """Async convert_sync: converters run as asyncio subprocesses and are killed on cancellation"""
+        for converter in self.available(names):
+            try:
+                if converter.name in FOLDER_CONVERTERS:
+                    async with conversion_workspace_async(dwg_path) as (input_dir, output_dir):
+                        result = await self._run(converter.command(dwg_path, dxf_path, input_dir, output_dir))
+                        output_path = converted_path(output_dir, dwg_path)
+                        if result.returncode == 0 and os.path.exists(output_path):
+                            # A copy when the workspace is on another filesystem
+                            await asyncio.get_running_loop().run_in_executor(None, shutil.move, output_path, dxf_path)
+                else:
+                    result = await self._run(converter.command(dwg_path, dxf_path))
+
+                if result.returncode == 0 and os.path.exists(dxf_path):
+                    logger.info(f"Successfully converted DWG to DXF using {converter.name}")
+                    return True
+                logger.warning(f"{converter.name} conversion failed: {result.stderr}")
+            except asyncio.TimeoutError:
+                logger.warning(f"{converter.name} conversion timed out after {self.timeout}s")
+            except Exception as e:
+                logger.warning(f"{converter.name} conversion failed: {e}")
+        return False
+
+# One registry per process
+converter_registry = ConverterRegistry()
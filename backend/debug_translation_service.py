@@ -1,12 +1,16 @@
 import asyncio
 import logging
-from typing import List, Dict
+from typing import Callable, Dict, List, Optional
 from text_cleaner import TextCleaner
+import script_detection
 
 # ログ設定
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# 意味のある中国語とみなす最小漢字数
+MIN_CHINESE_CHARS = 2
+
 class DebugTranslationService:
     """デバッグ用翻訳サービス"""
 
@@ -218,38 +222,30 @@ class DebugTranslationService:
             "工艺台车客户自备": "工程台車は客先支給"
         }
 
+    async def start(self):
+        """接続の初期化（モックのため外部接続なし）"""
+        pass
+
+    async def close(self):
+        """接続のクローズ（モックのため外部接続なし）"""
+        pass
+
     def detect_chinese_text(self, text: str) -> bool:
         """中国語テキストを検出"""
         if not text:
             return False
 
-        # Clean text first to remove formatting codes
+        # フォーマットコード除去後、基本漢字が2文字以上あれば意味のある中国語とみなす
         cleaned_text = self.text_cleaner.clean_text(text)
+        chinese_char_count = script_detection.count_han(cleaned_text, script_detection.BASIC_HAN_PATTERN)
+        has_chinese = chinese_char_count >= MIN_CHINESE_CHARS
 
-        # Unicodeの中国語文字範囲をチェック
-        chinese_ranges = [
-            (0x4E00, 0x9FFF),    # CJK統漢字
-            (0x3400, 0x4DBF),    # CJK統漢字拡張A
-            (0x20000, 0x2A6DF),  # CJK統漢字拡張B
-            (0xF900, 0xFAFF),    # 互換漢字
-        ]
-
-        chinese_chars = []
-        for char in cleaned_text:
-            code = ord(char)
-            for start, end in chinese_ranges:
-                if start <= code <= end:
-                    chinese_chars.append(char)
-                    break
-
-        # Check if we have meaningful Chinese content
-        has_chinese = len(chinese_chars) > 0 and self.text_cleaner.is_meaningful_chinese_text(cleaned_text)
-
-        logger.debug(f"Text: '{text}' -> Cleaned: '{cleaned_text}' - Chinese chars: {chinese_chars} - Has Chinese: {has_chinese}")
+        logger.debug(f"Text: '{text}' -> Cleaned: '{cleaned_text}' - Chinese chars: {chinese_char_count} - Has Chinese: {has_chinese}")
         return has_chinese
 
-    async def translate(self, texts: List[str], glossary: Dict[str, str] = None) -> List[Dict]:
-        """翻訳を実行（デバッグ版）"""
+    async def translate(self, texts: List[str], glossary: Dict[str, str] = None,
+                        progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
+        """翻訳を実行（デバッグ版）。progress_callback には (完了件数, 全件数) を通知"""
         logger.info(f"Translating {len(texts)} texts")
         results = []
 
@@ -353,6 +349,9 @@ class DebugTranslationService:
             results.append(result)
             logger.info(f"Translation {i+1}: '{text}' -> '{translated_text}'")
 
+            if progress_callback:
+                progress_callback(i + 1, len(texts))
+
         logger.info(f"Completed translation of {len(texts)} texts")
         return results
 
@@ -360,17 +359,15 @@ class DebugTranslationService:
         """中国語テキストをフィルタリング"""
         logger.info(f"Filtering {len(text_entities)} text entities for Chinese content")
 
-        chinese_texts = []
-        for text in text_entities:
-            if self.detect_chinese_text(text):
-                chinese_texts.append(text)
-                extracted = self.text_cleaner.extract_clean_chinese_content(text)
-                logger.debug(f"Chinese text found: '{text}' -> Extracted: '{extracted}'")
-            else:
-                logger.debug(f"Non-Chinese text skipped: '{text}'")
-
-        logger.info(f"Found {len(chinese_texts)} Chinese texts out of {len(text_entities)} total")
-        return chinese_texts
+        result = script_detection.filter_chinese_texts(
+            text_entities,
+            min_chars=MIN_CHINESE_CHARS,
+            pattern=script_detection.BASIC_HAN_PATTERN,
+            preprocess=self.text_cleaner.clean_text
+        )
+
+        logger.info(f"Found {len(result.texts)} Chinese texts out of {len(text_entities)} total")
+        return result.texts
 
     def create_technical_glossary(self) -> Dict[str, str]:
         """技術用語の専門辞書を作成"""
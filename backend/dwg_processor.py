@@ -1,32 +1,92 @@
 import ezdxf
 import os
 import tempfile
-import subprocess
 from typing import List, Dict, Tuple, Optional
 import logging
-from dataclasses import dataclass
+from conversion_cache import ConversionCache
+from converter_registry import converter_registry
+from dxf_patch_writer import patch_dxf
+from dxf_tag_scanner import is_ascii_dxf, scan_text_entities
+from block_usage import instance_counts
+from text_entity import TextEntity, TextEntityTable
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
-class TextEntity:
-    handle: str
-    text: str
-    entity_type: str
-    layer: str
-    position: Tuple[float, float, float]
-    height: float
-    style: str
-    rotation: float
-    width_factor: float
-    insertion_point: Optional[Tuple[float, float, float]] = None
+# ASCII DXF files at least this big are extracted with the streaming tag scanner
+# instead of a full ezdxf parse; 0 scans every ASCII DXF
+DXF_SCANNER_MIN_SIZE = int(os.getenv('DXF_SCANNER_MIN_SIZE', 52428800))  # 50MB
+
+def _point(value) -> Tuple[float, float, float]:
+    """Convert an ezdxf Vec3 to a plain tuple so entities pickle cheaply across processes"""
+    return tuple(float(coord) for coord in value)
+
+class DocumentSession:
+    """A drawing parsed once per job and shared by the extract and replace stages"""
+
+    def __init__(self, file_path: str, dxf_path: str, pinned: bool = False, source_hash: Optional[str] = None):
+        self.file_path = file_path
+        self.dxf_path = dxf_path
+        # SHA-256 of the upload, when known, so re-conversion doesn't hash it again
+        self.source_hash = source_hash
+        # dxf_path is this session's own link to a conversion cache entry, removed by close()
+        self.pinned = pinned
+        self._doc = None
+        # handle -> ezdxf entity, recorded during extraction
+        self.entities = {}
+        # handle -> (entity type, [(group code, start, end)]) byte ranges of the text values, recorded by the tag scanner
+        self.text_spans = {}
+
+    @property
+    def doc(self):
+        """The ezdxf document, parsed on first use; scanner extraction never needs it"""
+        if self._doc is None:
+            self._doc = ezdxf.readfile(self.dxf_path)
+        return self._doc
+
+    def close(self):
+        if self.pinned:
+            try:
+                os.remove(self.dxf_path)
+            except FileNotFoundError:
+                pass
+            self.pinned = False
+
+    def get_entity(self, handle: str):
+        entity = self.entities.get(handle)
+        if entity is None:
+            entity = self.doc.entitydb.get(handle)
+        return entity
+
+# External converters tried after ezdxf, in order
+DWG_CONVERTERS = ('libredwg', 'oda')
+# How text is extracted and replaced: 'auto' picks the tag scanner for ASCII DXF files of
+# at least DXF_SCANNER_MIN_SIZE bytes, 'scanner' for every ASCII DXF, 'ezdxf' never
+TEXT_BACKENDS = ('auto', 'scanner', 'ezdxf')
 
 class DWGProcessor:
-    def __init__(self):
+    def __init__(self, conversion_cache: Optional[ConversionCache] = None, text_backend: str = 'auto'):
+        if text_backend not in TEXT_BACKENDS:
+            raise ValueError(f"Unknown text backend {text_backend!r}, expected one of {', '.join(TEXT_BACKENDS)}")
         self.supported_formats = ['.dwg', '.dxf']
+        self.conversion_cache = conversion_cache or ConversionCache()
+        self.text_backend = text_backend
+        converter_registry.discover()
+
+    def converter_version(self) -> str:
+        """Fingerprint of the conversion tools on this host; part of the conversion cache key"""
+        return converter_registry.version(DWG_CONVERTERS)
+
+    def convert_dwg_to_dxf(self, dwg_path: str, source_hash: Optional[str] = None) -> str:
+        """Convert DWG file to DXF, reusing an earlier conversion of the same bytes
 
-    def convert_dwg_to_dxf(self, dwg_path: str) -> str:
+        source_hash is the SHA-256 of the file if already known, e.g. computed
+        while the upload was streamed; otherwise the file is hashed.
+        """
+        return self.conversion_cache.get_or_convert(dwg_path, self.converter_version(), self._convert_dwg_to_dxf,
+                                                    source_hash=source_hash)
+
+    def _convert_dwg_to_dxf(self, dwg_path: str) -> str:
         """Convert DWG file to DXF using available converters"""
         try:
             dxf_path = dwg_path.rsplit('.', 1)[0] + '.dxf'
@@ -41,36 +101,9 @@ class DWGProcessor:
             except Exception as ezdxf_error:
                 logger.info(f"ezdxf direct reading failed, trying other methods: {ezdxf_error}")
 
-            # Try using LibreDWG (dwg2dxf) if available
-            if self._check_command_available("dwg2dxf"):
-                result = subprocess.run([
-                    "dwg2dxf", "-o", dxf_path, dwg_path
-                ], capture_output=True, text=True, timeout=120)
-
-                if result.returncode == 0 and os.path.exists(dxf_path):
-                    logger.info("Successfully converted DWG to DXF using LibreDWG")
-                    return dxf_path
-                else:
-                    logger.warning(f"LibreDWG conversion failed: {result.stderr}")
-
-            # Try using ODA File Converter if available
-            oda_converter_paths = [
-                "ODAFileConverter",
-                "/usr/bin/ODAFileConverter",
-                "C:\\Program Files\\ODA\\ODAFileConverter\\ODAFileConverter.exe"
-            ]
-
-            for converter_path in oda_converter_paths:
-                if os.path.exists(converter_path):
-                    output_dir = os.path.dirname(dwg_path)
-                    version = "ACAD2018"
-                    result = subprocess.run([
-                        converter_path, output_dir, output_dir, version, "DXF", "0", "1"
-                    ], capture_output=True, text=True, timeout=60)
-
-                    if result.returncode == 0 and os.path.exists(dxf_path):
-                        logger.info("Successfully converted DWG to DXF using ODA File Converter")
-                        return dxf_path
+            # Try LibreDWG (dwg2dxf), then ODA File Converter, if installed
+            if converter_registry.convert_sync(DWG_CONVERTERS, dwg_path, dxf_path):
+                return dxf_path
 
             # Try using python-dxf package
             try:
@@ -111,94 +144,146 @@ class DWGProcessor:
             logger.error(f"Failed to convert DWG to DXF: {str(e)}")
             raise
 
-    def _check_command_available(self, command: str) -> bool:
-        """Check if a command is available in the system PATH"""
+    def _pin_conversion(self, dwg_path: str, source_hash: Optional[str] = None) -> str:
+        """Convert (or find the cached conversion) and pin it next to the upload for the session's lifetime"""
+        pin_path = dwg_path.rsplit('.', 1)[0] + '_source.dxf'
         try:
-            result = subprocess.run(['which', command], capture_output=True, text=True)
-            return result.returncode == 0
-        except:
-            try:
-                # Fallback for Windows
-                result = subprocess.run(['where', command], capture_output=True, text=True)
-                return result.returncode == 0
-            except:
-                return False
-
-    def extract_text_entities(self, file_path: str) -> List[TextEntity]:
+            return self.conversion_cache.pin(self.convert_dwg_to_dxf(dwg_path, source_hash), pin_path)
+        except FileNotFoundError:
+            # Evicted between the lookup and the link; this lookup misses and converts again
+            return self.conversion_cache.pin(self.convert_dwg_to_dxf(dwg_path, source_hash), pin_path)
+
+    def open_session(self, file_path: str, source_hash: Optional[str] = None) -> DocumentSession:
+        """Convert (if needed) and parse a drawing once for reuse across stages"""
+        # Convert DWG to DXF if necessary
+        if file_path.lower().endswith('.dwg'):
+            session = DocumentSession(file_path, self._pin_conversion(file_path, source_hash), pinned=True,
+                                      source_hash=source_hash)
+        else:
+            session = DocumentSession(file_path, file_path)
+
+        logger.info(f"Opened document session for {file_path}")
+        return session
+
+    def _ensure_source(self, session: DocumentSession):
+        """Re-convert a DWG whose DXF has gone missing since the session opened"""
+        if not session.pinned or os.path.exists(session.dxf_path):
+            return
+        logger.warning(f"Converted DXF of {session.file_path} is gone, converting again")
+        session.dxf_path = self._pin_conversion(session.file_path, session.source_hash)
+        # Byte ranges belong to the old file
+        session.text_spans.clear()
+
+    def text_backend_for(self, dxf_path: str) -> str:
+        """'scanner' or 'ezdxf': which backend reads and patches the text of dxf_path"""
+        if self.text_backend == 'ezdxf':
+            return 'ezdxf'
+        try:
+            min_size = 0 if self.text_backend == 'scanner' else DXF_SCANNER_MIN_SIZE
+            if os.path.getsize(dxf_path) >= min_size and is_ascii_dxf(dxf_path):
+                return 'scanner'
+        except OSError:
+            pass
+        return 'ezdxf'
+
+    def _scan_text_entities(self, session: DocumentSession) -> TextEntityTable:
+        """Extract text with the streaming tag scanner, recording where each text value lives"""
+        text_entities = TextEntityTable()
+        try:
+            for scanned in scan_text_entities(session.dxf_path):
+                if scanned.entity.handle in session.text_spans:
+                    # Translations are keyed by handle, so a repeat would land on the wrong entity
+                    raise ValueError(f"Duplicate handle {scanned.entity.handle} in {session.dxf_path}")
+                session.text_spans[scanned.entity.handle] = (scanned.entity.entity_type, scanned.spans)
+                text_entities.append(scanned.entity)
+        except ValueError:
+            # Partial byte ranges must not be patched later
+            session.text_spans.clear()
+            raise
+        text_entities.compact()
+        return text_entities
+
+    def _add_text_entity(self, session: DocumentSession, text_entities, entity, block: str):
+        entity_type = entity.dxftype()
+        if entity_type == 'MTEXT':
+            text = entity.text
+            height = entity.dxf.char_height
+        elif entity_type == 'DIMENSION':
+            text = entity.dxf.get('text', '')
+            height = 2.5
+        else:
+            text = entity.dxf.get('text', '')
+            height = entity.dxf.get('height', 2.5)
+        if not text:
+            return
+
+        if entity_type == 'DIMENSION':
+            # Dimension text sits at the text midpoint
+            position = _point(entity.dxf.text_midpoint) if entity.dxf.hasattr('text_midpoint') else (0, 0, 0)
+        else:
+            position = _point(entity.dxf.insert)
+        is_text = entity_type in ('TEXT', 'MTEXT')
+        session.entities[entity.dxf.handle] = entity
+        text_entities.append(TextEntity(
+            handle=entity.dxf.handle,
+            text=text,
+            entity_type=entity_type,
+            layer=entity.dxf.layer,
+            position=position,
+            height=height,
+            style=entity.dxf.get('style', 'Standard') if entity_type != 'DIMENSION' else 'Standard',
+            rotation=entity.dxf.get('rotation', 0) if is_text else 0,
+            width_factor=entity.dxf.get('width', 1) if is_text else 1,
+            insertion_point=position,
+            block=block
+        ))
+
+    def extract_text_entities(self, file_path: str, session: Optional[DocumentSession] = None,
+                              source_hash: Optional[str] = None) -> TextEntityTable:
         """Extract text entities from DWG/DXF file"""
         try:
-            # Convert DWG to DXF if necessary
-            if file_path.lower().endswith('.dwg'):
-                dxf_path = self.convert_dwg_to_dxf(file_path)
-            else:
-                dxf_path = file_path
-
-            # Load DXF file
-            doc = ezdxf.readfile(dxf_path)
-            msp = doc.modelspace()
-
-            text_entities = []
-
-            # Extract MTEXT entities
-            for mtext in msp.query('MTEXT'):
-                text_entities.append(TextEntity(
-                    handle=mtext.dxf.handle,
-                    text=mtext.text,
-                    entity_type='MTEXT',
-                    layer=mtext.dxf.layer,
-                    position=mtext.dxf.insert,
-                    height=mtext.dxf.char_height,
-                    style=mtext.dxf.style,
-                    rotation=mtext.dxf.rotation if hasattr(mtext.dxf, 'rotation') else 0,
-                    width_factor=mtext.dxf.width if hasattr(mtext.dxf, 'width') else 1,
-                    insertion_point=mtext.dxf.insert
-                ))
-
-            # Extract TEXT entities
-            for text in msp.query('TEXT'):
-                text_entities.append(TextEntity(
-                    handle=text.dxf.handle,
-                    text=text.dxf.text,
-                    entity_type='TEXT',
-                    layer=text.dxf.layer,
-                    position=text.dxf.insert,
-                    height=text.dxf.height,
-                    style=text.dxf.style,
-                    rotation=text.dxf.rotation if hasattr(text.dxf, 'rotation') else 0,
-                    width_factor=text.dxf.width if hasattr(text.dxf, 'width') else 1,
-                    insertion_point=text.dxf.insert
-                ))
-
-            # Extract DIMENSION text
-            for dim in msp.query('DIMENSION'):
-                if hasattr(dim, 'text') and dim.text:
-                    text_entities.append(TextEntity(
-                        handle=dim.dxf.handle,
-                        text=dim.text,
-                        entity_type='DIMENSION',
-                        layer=dim.dxf.layer,
-                        position=dim.dxf.insert if hasattr(dim.dxf, 'insert') else (0, 0, 0),
-                        height=getattr(dim.dxf, 'height', 2.5),
-                        style=getattr(dim.dxf, 'style', 'Standard'),
-                        rotation=0,
-                        width_factor=1,
-                        insertion_point=dim.dxf.insert if hasattr(dim.dxf, 'insert') else (0, 0, 0)
-                    ))
-
-            # Extract ATTRIB entities (block attributes)
-            for attrib in msp.query('ATTRIB'):
-                text_entities.append(TextEntity(
-                    handle=attrib.dxf.handle,
-                    text=attrib.dxf.text,
-                    entity_type='ATTRIB',
-                    layer=attrib.dxf.layer,
-                    position=attrib.dxf.insert,
-                    height=attrib.dxf.height,
-                    style=attrib.dxf.style,
-                    rotation=0,
-                    width_factor=1,
-                    insertion_point=attrib.dxf.insert
-                ))
+            if session is None:
+                session = self.open_session(file_path, source_hash)
+
+            if self.text_backend_for(session.dxf_path) == 'scanner':
+                try:
+                    text_entities = self._scan_text_entities(session)
+                    logger.info(f"Extracted {len(text_entities)} text entities from {file_path} with the tag scanner")
+                    return text_entities
+                except ValueError as e:
+                    logger.warning(f"Tag scanner failed on {file_path}, falling back to ezdxf: {e}")
+
+            doc = session.doc
+            text_entities = TextEntityTable()
+            # Held back until their instance counts are known
+            definitions: List[TextEntity] = []
+            inserts = {}
+            for block in doc.blocks:
+                if block.block.is_xref:
+                    continue
+                # Layout text is placed once; a definition's text once per insert
+                target = text_entities if block.is_any_layout else definitions
+                counts = inserts.setdefault(block.name, {})
+                for entity in block.query('DIMENSION'):
+                    # A dimension's graphics are an anonymous block it places once
+                    if entity.dxf.hasattr('geometry'):
+                        counts[entity.dxf.geometry] = counts.get(entity.dxf.geometry, 0) + 1
+                for entity in block.query('INSERT'):
+                    # MINSERT: one placement per grid cell
+                    placements = max(1, entity.dxf.column_count) * max(1, entity.dxf.row_count)
+                    counts[entity.dxf.name] = counts.get(entity.dxf.name, 0) + placements
+                    # Attribute values belong to each placement
+                    for attrib in entity.attribs:
+                        self._add_text_entity(session, target, attrib, block.name)
+
+                for entity in block.query('MTEXT TEXT DIMENSION ATTDEF'):
+                    self._add_text_entity(session, target, entity, block.name)
+
+            counts = instance_counts(inserts)
+            for text_entity in definitions:
+                text_entity.instances = counts.get(text_entity.block, 0)
+            text_entities.extend(definitions)
+            text_entities.compact()
 
             logger.info(f"Extracted {len(text_entities)} text entities from {file_path}")
             return text_entities
@@ -207,60 +292,66 @@ class DWGProcessor:
             logger.error(f"Failed to extract text from {file_path}: {str(e)}")
             raise
 
-    def replace_text_entities(self, file_path: str, translations: Dict[str, str]) -> str:
+    def replace_text_entities(self, file_path: str, translations: Dict[str, str],
+                              session: Optional[DocumentSession] = None, source_hash: Optional[str] = None) -> str:
         """Replace text entities in DWG/DXF file with translations"""
         try:
-            # Convert DWG to DXF if necessary
-            if file_path.lower().endswith('.dwg'):
-                dxf_path = self.convert_dwg_to_dxf(file_path)
-            else:
-                dxf_path = file_path
-
-            # Load DXF file
-            doc = ezdxf.readfile(dxf_path)
-            msp = doc.modelspace()
-
-            # Replace MTEXT entities
-            for mtext in msp.query('MTEXT'):
-                if mtext.dxf.handle in translations:
-                    mtext.text = translations[mtext.dxf.handle]
-
-            # Replace TEXT entities
-            for text in msp.query('TEXT'):
-                if text.dxf.handle in translations:
-                    text.dxf.text = translations[text.dxf.handle]
-
-            # Replace DIMENSION text
-            for dim in msp.query('DIMENSION'):
-                if dim.dxf.handle in translations and hasattr(dim, 'text'):
-                    dim.text = translations[dim.dxf.handle]
-
-            # Replace ATTRIB entities
-            for attrib in msp.query('ATTRIB'):
-                if attrib.dxf.handle in translations:
-                    attrib.dxf.text = translations[attrib.dxf.handle]
+            if session is None:
+                session = self.open_session(file_path, source_hash)
 
-            # Save modified file
             output_path = file_path.rsplit('.', 1)[0] + '_translated.dxf'
-            doc.saveas(output_path)
+            self._ensure_source(session)
+            if self.text_backend_for(session.dxf_path) == 'scanner':
+                try:
+                    return self._patch_text_entities(session, translations, output_path)
+                except (ValueError, FileNotFoundError) as e:
+                    logger.warning(f"Patch writer failed on {file_path}, falling back to ezdxf: {e}")
+
+            replaced_count = 0
+            for handle, translated_text in translations.items():
+                entity = session.get_entity(handle)
+                if entity is None:
+                    logger.warning(f"Entity {handle} not found in {file_path}")
+                    continue
+
+                entity_type = entity.dxftype()
+                if entity_type == 'MTEXT':
+                    entity.text = translated_text
+                elif entity_type in ('TEXT', 'ATTRIB', 'ATTDEF', 'DIMENSION'):
+                    entity.dxf.text = translated_text
+                else:
+                    continue
+                replaced_count += 1
 
-            logger.info(f"Saved translated file to {output_path}")
+            # Save modified file
+            session.doc.saveas(output_path)
+
+            logger.info(f"Replaced {replaced_count} text entities, saved translated file to {output_path}")
             return output_path
 
         except Exception as e:
             logger.error(f"Failed to replace text in {file_path}: {str(e)}")
             raise
 
-    def get_file_info(self, file_path: str) -> Dict:
+    def _patch_text_entities(self, session: DocumentSession, translations: Dict[str, str], output_path: str) -> str:
+        """Splice translations into a copy of the original DXF bytes instead of re-serializing the document"""
+        if not session.text_spans:
+            # Session reopened after extraction (e.g. evicted from the worker); rescanning is cheap
+            self._scan_text_entities(session)
+
+        missing = [handle for handle in translations if handle not in session.text_spans]
+        if missing:
+            logger.warning(f"{len(missing)} entities not found in {session.file_path}")
+        replaced_count = patch_dxf(session.dxf_path, output_path, translations, session.text_spans)
+        logger.info(f"Replaced {replaced_count} text entities, saved translated file to {output_path}")
+        return output_path
+
+    def get_file_info(self, file_path: str, session: Optional[DocumentSession] = None) -> Dict:
         """Get basic information about the DWG/DXF file"""
         try:
-            # Convert DWG to DXF if necessary
-            if file_path.lower().endswith('.dwg'):
-                dxf_path = self.convert_dwg_to_dxf(file_path)
-            else:
-                dxf_path = file_path
-
-            doc = ezdxf.readfile(dxf_path)
+            if session is None:
+                session = self.open_session(file_path)
+            doc = session.doc
 
             return {
                 'filename': os.path.basename(file_path),
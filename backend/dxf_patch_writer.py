@@ -0,0 +1,114 @@
+import os
+import logging
+from typing import Dict, Iterator, List, Tuple
+
+from ezdxf.tools.text import escape_dxf_line_endings, split_mtext_string
+
+from dxf_tag_scanner import DXFTagScanner
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# AutoCAD limit for one MTEXT group 3/1 chunk, in characters
+MTEXT_CHUNK_SIZE = 250
+COPY_CHUNK_SIZE = 16777216  # 16MB
+
+# (group code, start, end) of one text value
+Span = Tuple[int, int, int]
+# handle -> (entity type, spans), as recorded by the tag scanner
+TextSpans = Dict[str, Tuple[str, List[Span]]]
+
+def _text_tags(entity_type: str, text: str) -> List[Tuple[int, str]]:
+    """The (group code, value) tags that hold text, laid out the way AutoCAD writes them"""
+    if entity_type == 'MTEXT':
+        # Leading 250-character chunks in group 3, the rest in group 1
+        chunks = split_mtext_string(escape_dxf_line_endings(text), size=MTEXT_CHUNK_SIZE) or ['']
+        return [(3, chunk) for chunk in chunks[:-1]] + [(1, chunks[-1])]
+    # A single-line value can't hold a line break without breaking the file
+    return [(1, ' '.join(text.splitlines()))]
+
+def _encode(value: str, encoding: str) -> bytes:
+    """Encode for the drawing's code page; characters it lacks become \\U+XXXX escapes
+
+    ezdxf's 'dxfreplace' handler writes characters up to U+00FF as \\xNN,
+    which neither AutoCAD nor ezdxf reads back.
+    """
+    try:
+        return value.encode(encoding)
+    except UnicodeEncodeError:
+        pass
+    chars = []
+    for char in value:
+        try:
+            char.encode(encoding)
+            chars.append(char)
+        except UnicodeEncodeError:
+            # Outside the BMP there is no \U+ form
+            chars.append(f"\\U+{ord(char):04X}" if ord(char) <= 0xFFFF else '?')
+    return ''.join(chars).encode(encoding)
+
+class DXFPatchWriter:
+    """Writes a translated copy of an ASCII DXF by splicing new text values into the original bytes
+
+    Everything outside the replaced text tags is copied verbatim, so the
+    cost is a streaming copy of the file plus the new strings; nothing is
+    parsed or re-serialized. Needs the text spans recorded by the tag
+    scanner for the same file.
+    """
+
+    def __init__(self, dxf_path: str):
+        self.dxf_path = dxf_path
+
+    def _edits(self, scanner: DXFTagScanner, translations: Dict[str, str],
+               text_spans: TextSpans) -> Iterator[Tuple[int, int, bytes]]:
+        """(start, end, replacement) byte edits in file order; each covers whole code/value lines"""
+        data = scanner.data
+        newline = '\r\n' if scanner.crlf else '\n'
+        edits = []
+        for handle, text in translations.items():
+            if handle not in text_spans:
+                continue
+            entity_type, spans = text_spans[handle]
+            tags = ''.join(f"{code:>3}{newline}{value}{newline}" for code, value in _text_tags(entity_type, text))
+            replacement = _encode(tags, scanner.encoding)
+
+            # Drop every old text tag; the new tags go where the first one was
+            for index, (_, start, end) in enumerate(spans):
+                line_start = data.rfind(b'\n', 0, data.rfind(b'\n', 0, start)) + 1
+                line_end = data.find(b'\n', end)
+                line_end = scanner.size if line_end == -1 else line_end + 1
+                edits.append((line_start, line_end, replacement if index == 0 else b''))
+        return iter(sorted(edits))
+
+    def write(self, output_path: str, translations: Dict[str, str],
+              text_spans: TextSpans) -> int:
+        """Write the patched drawing to output_path and return how many entities were replaced"""
+        replaced = sum(1 for handle in translations if handle in text_spans)
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            with DXFTagScanner(self.dxf_path) as scanner, open(tmp_path, 'wb') as out:
+                with memoryview(scanner.data) as view:
+                    pos = 0
+                    for start, end, replacement in self._edits(scanner, translations, text_spans):
+                        if start < pos:
+                            raise ValueError(f"Overlapping text spans near byte {start} in {self.dxf_path}")
+                        self._copy(out, view, pos, start)
+                        out.write(replacement)
+                        pos = end
+                    self._copy(out, view, pos, scanner.size)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Patched {replaced} text entities into {output_path}")
+        return replaced
+
+    @staticmethod
+    def _copy(out, view: memoryview, start: int, end: int):
+        for offset in range(start, end, COPY_CHUNK_SIZE):
+            out.write(view[offset:min(offset + COPY_CHUNK_SIZE, end)])
+
+def patch_dxf(dxf_path: str, output_path: str, translations: Dict[str, str],
+              text_spans: TextSpans) -> int:
+    return DXFPatchWriter(dxf_path).write(output_path, translations, text_spans)
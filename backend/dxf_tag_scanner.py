@@ -0,0 +1,291 @@
+import os
+import re
+import mmap
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ezdxf import decode_dxf_unicode
+from ezdxf.tools.codepage import toencoding
+
+from block_usage import instance_counts, is_layout_block
+from text_entity import MODEL_SPACE, PAPER_SPACE, TextEntity
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Text-bearing entity types and the group codes holding their text
+TEXT_CODES = {
+    'TEXT': (1,),
+    'ATTRIB': (1,),
+    'DIMENSION': (1,),
+    'ATTDEF': (1,),  # default value
+    'MTEXT': (3, 1)  # 250-character chunks in group 3, remainder in group 1
+}
+
+# BLOCK flags of definitions that come from external references
+XREF_BLOCK_FLAGS = 4 | 8 | 16
+
+BINARY_DXF_MAGIC = b'AutoCAD Binary DXF'
+# First DXF version written in UTF-8 (AutoCAD 2007)
+UTF8_DXF_VERSION = 'AC1021'
+
+# A group code 0 line followed by the entity type. Code and value lines
+# alternate and an entity type can never be a code line, so a match is
+# always a real entity start.
+_ENTITY_START = re.compile(rb'\n[ \t]*0\r?\n(TEXT|MTEXT|ATTRIB|ATTDEF|DIMENSION|INSERT|BLOCK|ENDBLK|ENDSEC)\r?\n')
+_SECTION_START = re.compile(rb'\nSECTION\r?\n[ \t]*2\r?\n(\w+)\r?\n')
+# Start of any entity (or ENDSEC) named with a letter; same alignment argument as above
+_NEXT_ENTITY = re.compile(rb'\n[ \t]*0\r?\n[A-Z_]')
+_HEADER_VAR = re.compile(rb'\n[ \t]*9\r?\n\$(ACADVER|DWGCODEPAGE)\r?\n[ \t]*\d+\r?\n([^\r\n]*)')
+
+@dataclass
+class ScannedText:
+    """A text entity found by the scanner and where its text lives in the file"""
+    entity: TextEntity
+    # (group code, start, end) byte offsets of each text value, line terminator excluded, in file order
+    spans: List[Tuple[int, int, int]] = field(default_factory=list)
+    # Byte range of the entity's tags, from its "0" line up to the next entity's
+    start: int = 0
+    end: int = 0
+
+def _float(value: Optional[bytes], default: float = 0.0) -> float:
+    try:
+        return float(value) if value is not None else default
+    except ValueError:
+        return default
+
+class DXFTagScanner:
+    """Streams (group code, value) pairs of an ASCII DXF over a memory-mapped file
+
+    Only text entities, INSERTs and block boundaries in the BLOCKS and
+    ENTITIES sections are decoded; the regex jumps over everything else at
+    C speed, so memory stays flat no matter how big the drawing is.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        if self.size == 0:
+            self._file.close()
+            raise ValueError(f"{path} is empty")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self._mm, 'madvise'):
+            self._mm.madvise(mmap.MADV_SEQUENTIAL)
+
+        if self._mm[:len(BINARY_DXF_MAGIC)] == BINARY_DXF_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is a binary DXF; the tag scanner reads ASCII DXF only")
+
+        self.crlf = b'\r\n' in self._mm[:4096]
+        self.dxfversion, self.encoding = self._read_header()
+
+    @property
+    def data(self) -> mmap.mmap:
+        """The mapped file contents"""
+        return self._mm
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> 'DXFTagScanner':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _section_start(self, name: str) -> Optional[int]:
+        """Offset of the newline before a section's first tag, or None if there is no such section"""
+        for match in _SECTION_START.finditer(self._mm):
+            if match.group(1) == name.encode('ascii'):
+                # Keep the newline the entity regex anchors on
+                return match.end() - 1
+        return None
+
+    def _read_header(self) -> Tuple[str, str]:
+        start = self._section_start('HEADER')
+        variables: Dict[str, str] = {}
+        if start is not None:
+            end = self._mm.find(b'\nENDSEC', start)
+            for match in _HEADER_VAR.finditer(self._mm, start, end if end != -1 else self.size):
+                variables.setdefault(match.group(1).decode('ascii'), match.group(2).decode('ascii', 'replace').strip())
+
+        dxfversion = variables.get('ACADVER', 'AC1009')
+        if dxfversion >= UTF8_DXF_VERSION:
+            encoding = 'utf-8'
+        else:
+            encoding = toencoding(variables.get('DWGCODEPAGE', 'ANSI_1252'))
+        return dxfversion, encoding
+
+    def entity_tags(self, pos: int) -> Tuple[List[int], List[bytes], List[bytes], int]:
+        """Tags of the entity whose first tag line starts at pos
+
+        Returns (group codes, raw values, raw lines, end): value i is line
+        2i + 1 of the entity and end is the offset of the next "0" line.
+        """
+        match = _NEXT_ENTITY.search(self._mm, pos - 1)
+        end = match.start() + 1 if match else self.size
+        # Split in C: code lines are the even lines, values the odd ones
+        lines = self._mm[pos:end].split(b'\n')
+        values = lines[1::2]
+        codes = lines[0:2 * len(values):2]
+        if self.crlf:
+            values = [value[:-1] if value.endswith(b'\r') else value for value in values]
+        try:
+            codes = list(map(int, codes))
+        except ValueError:
+            raise ValueError(f"Malformed DXF {self.path} near byte {pos}")
+        if 0 in codes:
+            # The next entity's type starts with a digit (3DFACE, 3DSOLID)
+            index = codes.index(0)
+            del codes[index:], values[index:]
+            end = pos + sum(map(len, lines[:2 * index])) + 2 * index
+        return codes, values, lines, end
+
+    def _decode(self, value: bytes) -> str:
+        text = value.decode(self.encoding, errors='replace')
+        # Pre-2007 files escape characters outside the code page as \U+XXXX
+        if self.encoding != 'utf-8' and '\\U+' in text:
+            text = decode_dxf_unicode(text)
+        return text
+
+    @staticmethod
+    def _values(codes: List[int], raw: List[bytes]) -> Dict[int, bytes]:
+        """group code -> value; only the entity's own tags, first occurrence wins"""
+        # Embedded object (MTEXT columns) or XDATA: nothing of ours follows
+        for marker in (101, 1001):
+            if marker in codes:
+                del codes[codes.index(marker):]
+        return dict(zip(reversed(codes), reversed(raw[:len(codes)])))
+
+    def _build(self, entity_type: str, pos: int, codes: List[int], raw: List[bytes],
+               lines: List[bytes], values: Dict[int, bytes], block: str) -> Optional[ScannedText]:
+        if entity_type == 'MTEXT':
+            text_codes = TEXT_CODES[entity_type]
+            indexes = [index for index, code in enumerate(codes) if code in text_codes]
+        else:
+            indexes = [codes.index(1)] if 1 in codes else []
+        spans = []
+        chunks = []
+        for index in indexes:
+            value = raw[index]
+            line = 2 * index + 1
+            start = pos + sum(map(len, lines[:line])) + line
+            spans.append((codes[index], start, start + len(value)))
+            chunks.append(value)
+        # MTEXT chunks in group 3 come first, group 1 holds the rest
+        text = self._decode(b''.join(chunks))
+        if not text:
+            return None
+
+        handle = values.get(5, b'').strip().decode('ascii', 'replace')
+        if not handle:
+            # R12 files may be written without handles; ezdxf assigns them on load
+            raise ValueError(f"{entity_type} without a handle near byte {pos}")
+
+        # Dimension text sits at the text midpoint (group 11); others at their insert point
+        x, y, z = (11, 21, 31) if entity_type == 'DIMENSION' else (10, 20, 30)
+        position = (_float(values.get(x)), _float(values.get(y)), _float(values.get(z)))
+        is_text = entity_type in ('TEXT', 'MTEXT')
+        entity = TextEntity(
+            handle=handle,
+            text=text,
+            entity_type=entity_type,
+            layer=self._decode(values.get(8, b'0')).strip(),
+            position=position,
+            height=_float(values.get(40), 2.5) if entity_type != 'DIMENSION' else 2.5,
+            style=self._decode(values.get(7, b'Standard')).strip() if entity_type != 'DIMENSION' else 'Standard',
+            rotation=_float(values.get(50)) if is_text else 0,
+            width_factor=_float(values.get(41), 1) if is_text else 1,
+            insertion_point=position,
+            block=block
+        )
+        return ScannedText(entity=entity, spans=spans)
+
+    def _section_entities(self, name: str) -> Iterator[Tuple[str, int, int, List[int], List[bytes], List[bytes], int]]:
+        """(entity type, start, first tag, codes, raw values, raw lines, end) of the entities the regex picks out"""
+        start = self._section_start(name)
+        if start is None:
+            return
+        for match in _ENTITY_START.finditer(self._mm, start):
+            entity_type = match.group(1).decode('ascii')
+            if entity_type == 'ENDSEC':
+                return
+            codes, raw, lines, end = self.entity_tags(match.end())
+            yield entity_type, match.start() + 1, match.end(), codes, raw, lines, end
+
+    def _count_insert(self, inserts: Dict[str, Dict[str, int]], container: str,
+                      entity_type: str, values: Dict[int, bytes]):
+        """Record the block an INSERT places, or the anonymous block holding a DIMENSION's graphics"""
+        name = self._decode(values.get(2, b'')).strip()
+        if not name:
+            return
+        if entity_type == 'INSERT':
+            # MINSERT: one placement per grid cell
+            placements = max(1, int(_float(values.get(70), 1))) * max(1, int(_float(values.get(71), 1)))
+        else:
+            placements = 1
+        counts = inserts.setdefault(container, {})
+        counts[name] = counts.get(name, 0) + placements
+
+    def text_entities(self) -> Iterator[ScannedText]:
+        """Yield the text of every layout and block definition
+
+        Layout text streams in file order. Text in block definitions is held
+        back until every INSERT has been counted and comes last, with its
+        instance count set.
+        """
+        inserts: Dict[str, Dict[str, int]] = {}
+        definitions: List[ScannedText] = []
+
+        block = None  # Definition being read; None inside skipped (xref) blocks
+        for entity_type, start, pos, codes, raw, lines, end in self._section_entities('BLOCKS'):
+            values = self._values(codes, raw)
+            if entity_type == 'BLOCK':
+                flags = int(_float(values.get(70)))
+                block = None if flags & XREF_BLOCK_FLAGS else self._decode(values.get(2, b'')).strip()
+            elif entity_type == 'ENDBLK':
+                block = None
+            elif block is None:
+                continue
+            else:
+                if entity_type in ('INSERT', 'DIMENSION'):
+                    self._count_insert(inserts, block, entity_type, values)
+                if entity_type == 'INSERT':
+                    continue
+                scanned = self._build(entity_type, pos, codes, raw, lines, values, block)
+                if scanned is None:
+                    continue
+                scanned.start, scanned.end = start, end
+                # Content of a non-active paper space layout is stored as a block
+                if is_layout_block(block):
+                    yield scanned
+                else:
+                    definitions.append(scanned)
+
+        for entity_type, start, pos, codes, raw, lines, end in self._section_entities('ENTITIES'):
+            values = self._values(codes, raw)
+            space = PAPER_SPACE if values.get(67, b'0').strip() == b'1' else MODEL_SPACE
+            if entity_type in ('INSERT', 'DIMENSION'):
+                self._count_insert(inserts, space, entity_type, values)
+            if entity_type in TEXT_CODES:
+                scanned = self._build(entity_type, pos, codes, raw, lines, values, space)
+                if scanned is not None:
+                    scanned.start, scanned.end = start, end
+                    yield scanned
+
+        counts = instance_counts(inserts)
+        for scanned in definitions:
+            scanned.entity.instances = counts.get(scanned.entity.block, 0)
+            yield scanned
+
+def is_ascii_dxf(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return not f.read(len(BINARY_DXF_MAGIC)).startswith(BINARY_DXF_MAGIC)
+
+def scan_text_entities(path: str) -> Iterator[ScannedText]:
+    """Stream the text entities of an ASCII DXF without building an ezdxf document"""
+    with DXFTagScanner(path) as scanner:
+        yield from scanner.text_entities()
@@ -1,12 +1,13 @@
 import ezdxf
 import dxfgrabber
 import os
-import subprocess
 import tempfile
 import logging
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 import shutil
+from conversion_cache import ConversionCache
+from converter_registry import converter_registry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,10 +25,15 @@ class TextEntity:
     width_factor: float
     insertion_point: Optional[Tuple[float, float, float]] = None
 
+# External converters this processor may use
+ENHANCED_CONVERTERS = ('oda', 'teigha', 'librecad')
+
 class EnhancedDWGProcessor:
-    def __init__(self):
+    def __init__(self, conversion_cache: Optional[ConversionCache] = None):
         self.supported_formats = ['.dwg', '.dxf']
         self.temp_dir = tempfile.mkdtemp()
+        self.conversion_cache = conversion_cache or ConversionCache()
+        converter_registry.discover()
         logger.info(f"Enhanced DWG Processor initialized with temp dir: {self.temp_dir}")
 
     def __del__(self):
@@ -38,15 +44,23 @@ class EnhancedDWGProcessor:
         except:
             pass
 
+    def converter_version(self) -> str:
+        """Fingerprint of the installed converters; part of the conversion cache key"""
+        return converter_registry.version(ENHANCED_CONVERTERS)
+
     def convert_dwg_to_dxf(self, dwg_path: str) -> str:
+        """Convert DWG to DXF, reusing an earlier conversion of the same bytes"""
+        # If it's already a DXF file, return as is
+        if dwg_path.lower().endswith('.dxf'):
+            return dwg_path
+
+        return self.conversion_cache.get_or_convert(dwg_path, self.converter_version(), self._convert_dwg_to_dxf)
+
+    def _convert_dwg_to_dxf(self, dwg_path: str) -> str:
         """Convert DWG to DXF using multiple methods"""
         try:
             dxf_path = dwg_path.rsplit('.', 1)[0] + '_converted.dxf'
 
-            # If it's already a DXF file, return as is
-            if dwg_path.lower().endswith('.dxf'):
-                return dwg_path
-
             logger.info(f"Converting DWG to DXF: {dwg_path} -> {dxf_path}")
 
             # Method 1: Try using ODA File Converter (if available)
@@ -83,65 +97,11 @@ class EnhancedDWGProcessor:
 
     def _try_oda_converter(self, dwg_path: str, dxf_path: str) -> bool:
         """Try converting using ODA File Converter"""
-        try:
-            oda_paths = [
-                "ODAFileConverter",
-                r"C:\Program Files\ODA\ODAFileConverter\ODAFileConverter.exe",
-                r"C:\Program Files (x86)\ODA\ODAFileConverter\ODAFileConverter.exe",
-                r"C:\Program Files\ODA\ODAFileConverter_4.3.2\ODAFileConverter.exe"
-            ]
-
-            for oda_path in oda_paths:
-                if os.path.exists(oda_path):
-                    try:
-                        output_dir = os.path.dirname(dxf_path)
-                        result = subprocess.run([
-                            oda_path, output_dir, output_dir, "ACAD2018", "DXF", "0", "1"
-                        ], capture_output=True, text=True, timeout=120)
-
-                        if result.returncode == 0:
-                            # Check if converted file exists
-                            converted_dxf = dwg_path.rsplit('.', 1)[0] + '.dxf'
-                            if os.path.exists(converted_dxf):
-                                shutil.move(converted_dxf, dxf_path)
-                                return True
-                    except Exception as e:
-                        logger.warning(f"ODA converter failed: {e}")
-
-            return False
-        except Exception as e:
-            logger.warning(f"ODA converter error: {e}")
-            return False
+        return converter_registry.convert_sync(('oda',), dwg_path, dxf_path)
 
     def _try_teigha_converter(self, dwg_path: str, dxf_path: str) -> bool:
         """Try converting using Teigha Converter"""
-        try:
-            teigha_paths = [
-                "TeighaFileConverter",
-                r"C:\Program Files\ODA\Teigha File Converter\TeighaFileConverter.exe",
-                r"C:\Program Files (x86)\ODA\Teigha File Converter\TeighaFileConverter.exe"
-            ]
-
-            for teigha_path in teigha_paths:
-                if os.path.exists(teigha_path):
-                    try:
-                        output_dir = os.path.dirname(dxf_path)
-                        result = subprocess.run([
-                            teigha_path, output_dir, output_dir, "ACAD2018", "DXF", "0", "1"
-                        ], capture_output=True, text=True, timeout=120)
-
-                        if result.returncode == 0:
-                            converted_dxf = dwg_path.rsplit('.', 1)[0] + '.dxf'
-                            if os.path.exists(converted_dxf):
-                                shutil.move(converted_dxf, dxf_path)
-                                return True
-                    except Exception as e:
-                        logger.warning(f"Teigha converter failed: {e}")
-
-            return False
-        except Exception as e:
-            logger.warning(f"Teigha converter error: {e}")
-            return False
+        return converter_registry.convert_sync(('teigha',), dwg_path, dxf_path)
 
     def _try_autocad_conversion(self, dwg_path: str, dxf_path: str) -> bool:
         """Try converting using AutoCAD COM automation"""
@@ -176,30 +136,7 @@ class EnhancedDWGProcessor:
 
     def _try_librecad_conversion(self, dwg_path: str, dxf_path: str) -> bool:
         """Try converting using LibreCAD command line"""
-        try:
-            librecad_paths = [
-                "librecad",
-                r"C:\Program Files\LibreCAD\librecad.exe",
-                r"C:\Program Files (x86)\LibreCAD\librecad.exe"
-            ]
-
-            for librecad_path in librecad_paths:
-                if os.path.exists(librecad_path):
-                    try:
-                        # LibreCAD command line conversion (if supported)
-                        result = subprocess.run([
-                            librecad_path, "-x", dxf_path, dwg_path
-                        ], capture_output=True, text=True, timeout=120)
-
-                        if result.returncode == 0 and os.path.exists(dxf_path):
-                            return True
-                    except Exception as e:
-                        logger.warning(f"LibreCAD conversion failed: {e}")
-
-            return False
-        except Exception as e:
-            logger.warning(f"LibreCAD converter error: {e}")
-            return False
+        return converter_registry.convert_sync(('librecad',), dwg_path, dxf_path)
 
     def _try_online_conversion(self, dwg_path: str, dxf_path: str) -> bool:
         """Try using online conversion service (basic implementation)"""
@@ -0,0 +1,105 @@
+import re
+from collections import deque
+from typing import Dict, List, Tuple
+
+PLACEHOLDER_PATTERN = re.compile(r'__GLOSSARY_(\d+)__')
+
+class GlossaryMatcher:
+    """Glossary compiled once into an Aho-Corasick automaton
+
+    Matching is leftmost-longest and non-overlapping, so "总平面图" wins over
+    "平面图" when both are glossary terms. Placeholders are numbered by term,
+    not by position, and are only produced for terms that actually occur.
+    """
+
+    def __init__(self, glossary: Dict[str, str]):
+        self.terms = [term for term in glossary if term]
+        self.targets = [glossary[term] for term in self.terms]
+
+        # Trie: child transitions, term index ending at each node, node depth
+        self._goto: List[Dict[str, int]] = [{}]
+        self._term = [-1]
+        self._depth = [0]
+        for index, term in enumerate(self.terms):
+            node = 0
+            for char in term:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto.append({})
+                    self._term.append(-1)
+                    self._depth.append(self._depth[node] + 1)
+                    self._goto[node][char] = child
+                node = child
+            self._term[node] = index
+
+        # Failure links and output links (nearest terminal node on the failure chain)
+        self._fail = [0] * len(self._goto)
+        self._output = [-1] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            self._output[node] = node if self._term[node] != -1 else self._output[self._fail[node]]
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                queue.append(child)
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """Return leftmost-longest non-overlapping matches as (start, end, term_index)"""
+        goto, fail, output, depth, term = self._goto, self._fail, self._output, self._depth, self._term
+
+        # Longest match starting at each position
+        longest: Dict[int, Tuple[int, int]] = {}
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            out = output[node]
+            while out != -1:
+                length = depth[out]
+                start = i - length + 1
+                if length > longest.get(start, (0, -1))[0]:
+                    longest[start] = (length, term[out])
+                out = output[fail[out]]
+
+        matches = []
+        position = -1
+        for start in sorted(longest):
+            if start < position:
+                continue
+            length, index = longest[start]
+            matches.append((start, start + length, index))
+            position = start + length
+        return matches
+
+    def protect(self, text: str) -> Tuple[str, int]:
+        """Replace glossary terms with placeholders; returns the text and the number of hits"""
+        matches = self.find(text)
+        if not matches:
+            return text, 0
+
+        pieces = []
+        position = 0
+        for start, end, index in matches:
+            pieces.append(text[position:start])
+            pieces.append(f"__GLOSSARY_{index}__")
+            position = end
+        pieces.append(text[position:])
+        return ''.join(pieces), len(matches)
+
+    def restore(self, text: str) -> str:
+        """Replace placeholders with the glossary's target terms in a single pass"""
+        if '__GLOSSARY_' not in text:
+            return text
+
+        def substitute(match):
+            index = int(match.group(1))
+            return self.targets[index] if index < len(self.targets) else match.group(0)
+
+        return PLACEHOLDER_PATTERN.sub(substitute, text)
@@ -0,0 +1,60 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_EVENT_QUEUE_SIZE = int(os.getenv('JOB_EVENT_QUEUE_SIZE', 32))
+SSE_KEEPALIVE_SECONDS = int(os.getenv('SSE_KEEPALIVE_SECONDS', 15))
+
+def sse_message(event: Dict, event_type: str = 'status') -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event_type}\ndata: {json.dumps(event, default=str)}\n\n"
+
+class JobEventBroker:
+    """In-process pub/sub of job status snapshots, one topic per job
+
+    Must be used from the event loop thread. Each subscriber gets a bounded
+    queue; a slow client loses its oldest snapshots, never the newest.
+    """
+
+    def __init__(self, queue_size: int = JOB_EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # Last snapshot of each active job, served to pollers without rebuilding it
+        self._latest: Dict[str, Dict] = {}
+
+    def publish(self, job_id: str, event: Dict, final: bool = False):
+        if final:
+            self._latest.pop(job_id, None)
+        else:
+            self._latest[job_id] = event
+
+        for queue in self._subscribers.get(job_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def latest(self, job_id: str) -> Optional[Dict]:
+        return self._latest.get(job_id)
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(job_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[job_id]
+
+    def subscriber_count(self, job_id: Optional[str] = None) -> int:
+        if job_id is not None:
+            return len(self._subscribers.get(job_id, ()))
+        return sum(len(queues) for queues in self._subscribers.values())
@@ -0,0 +1,216 @@
+import io
+import os
+import json
+import time
+import pstats
+import marshal
+import cProfile
+import zipfile
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROFILE_FILENAME = 'profile.zip'
+# Allocation sites listed per memory snapshot
+PROFILE_TOP_ALLOCATIONS = int(os.getenv('PROFILE_TOP_ALLOCATIONS', 25))
+# Functions listed in each text report
+PROFILE_TOP_FUNCTIONS = 60
+
+# cProfile allows one profiler per thread; the event loop runs every job on one thread
+_api_profiler_lock = threading.Lock()
+# tracemalloc is process-wide: on while any profiled job runs
+_tracing_jobs = 0
+_tracing_lock = threading.Lock()
+
+def _start_tracing():
+    global _tracing_jobs
+    with _tracing_lock:
+        if _tracing_jobs == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_jobs += 1
+
+def _stop_tracing():
+    global _tracing_jobs
+    with _tracing_lock:
+        _tracing_jobs -= 1
+        if _tracing_jobs == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+def memory_snapshot(top: int = PROFILE_TOP_ALLOCATIONS) -> Dict:
+    """Traced memory now, its peak since the last reset, and the biggest allocation sites"""
+    if not tracemalloc.is_tracing():
+        return {}
+    current, peak = tracemalloc.get_traced_memory()
+    statistics = tracemalloc.take_snapshot().statistics('lineno')
+    return {
+        'current_bytes': current,
+        'peak_bytes': peak,
+        'top_allocations': [
+            {'location': str(stat.traceback[0]), 'size_bytes': stat.size, 'blocks': stat.count}
+            for stat in statistics[:top]
+        ]
+    }
+
+def profile_call(func: Callable, *args) -> Tuple[Any, Dict]:
+    """Run func under cProfile and tracemalloc in this process; returns (result, profile data)
+
+    Meant for worker processes, which run one call at a time, so the
+    profile and the memory peak belong to this call alone.
+    """
+    profiler = cProfile.Profile()
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        result = func(*args)
+    finally:
+        profiler.disable()
+        seconds = time.perf_counter() - started
+        memory = memory_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+    profiler.create_stats()
+    return result, {
+        'pid': os.getpid(),
+        'seconds': round(seconds, 6),
+        'memory': memory,
+        # What pstats.Stats.dump_stats writes, so it loads as a .prof file
+        'stats': marshal.dumps(profiler.stats)
+    }
+
+class _LoadedStats:
+    """Lets pstats read a stats dict that came back from another process"""
+
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+def _stats_report(profile) -> str:
+    stream = io.StringIO()
+    stats = pstats.Stats(profile, stream=stream)
+    stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    stats.sort_stats('tottime').print_stats(PROFILE_TOP_FUNCTIONS)
+    return stream.getvalue()
+
+class JobProfiler:
+    """Profiling capture for one job, written as a ZIP next to the job's payloads
+
+    The API process runs under cProfile from start() to stop(); worker
+    calls report their own cProfile stats and memory through
+    worker_callback(); stage() records wall time and a tracemalloc
+    snapshot of the API process at the end of each stage. Other jobs
+    sharing the event loop meanwhile show up in the API process profile.
+    """
+
+    enabled = True
+
+    def __init__(self, job_id: str, output_path: str):
+        self.job_id = job_id
+        self.output_path = output_path
+        self.stages: List[Dict] = []
+        self.worker_calls: List[Tuple[str, Dict]] = []
+        self.notes: List[str] = []
+        self._profiler: Optional[cProfile.Profile] = None
+        self._started_at: Optional[datetime] = None
+        self._started: float = 0.0
+        self._elapsed: float = 0.0
+
+    def start(self):
+        self._started_at = datetime.now()
+        self._started = time.perf_counter()
+        _start_tracing()
+        if _api_profiler_lock.acquire(blocking=False):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self.notes.append("Another profiled job held the API process profiler; "
+                              "only stage timings, memory and worker profiles were captured")
+
+    def stop(self):
+        """Stop profiling; must run on the thread that called start()"""
+        if self._profiler is not None:
+            self._profiler.disable()
+            _api_profiler_lock.release()
+        _stop_tracing()
+        self._elapsed = time.perf_counter() - self._started
+
+    @contextmanager
+    def stage(self, name: str):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                'stage': name,
+                'seconds': round(time.perf_counter() - started, 6),
+                'memory': memory_snapshot()
+            })
+
+    def worker_callback(self, stage: str) -> Callable[[Dict], None]:
+        return lambda profile: self.worker_calls.append((stage, profile))
+
+    def write(self) -> str:
+        """Write the summary, .prof files and text reports; slow for big profiles, so run off the event loop"""
+        summary = {
+            'job_id': self.job_id,
+            'started_at': self._started_at.isoformat() if self._started_at else None,
+            'seconds': round(self._elapsed, 6),
+            'api_process': {'pid': os.getpid(), 'profiled': self._profiler is not None},
+            'stages': self.stages,
+            'worker_calls': [
+                {'stage': stage, 'pid': profile['pid'], 'seconds': profile['seconds'], 'memory': profile['memory'],
+                 'profile': f"worker_{index}_{stage}.prof"}
+                for index, (stage, profile) in enumerate(self.worker_calls)
+            ],
+            'notes': self.notes
+        }
+
+        os.makedirs(os.path.dirname(self.output_path) or '.', exist_ok=True)
+        tmp_path = f"{self.output_path}.{os.getpid()}.tmp"
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('summary.json', json.dumps(summary, indent=2))
+            if self._profiler is not None:
+                self._profiler.create_stats()
+                archive.writestr('api_process.prof', marshal.dumps(self._profiler.stats))
+                archive.writestr('api_process.txt', _stats_report(self._profiler))
+            for index, (stage, profile) in enumerate(self.worker_calls):
+                archive.writestr(f"worker_{index}_{stage}.prof", profile['stats'])
+                archive.writestr(f"worker_{index}_{stage}.txt", _stats_report(_LoadedStats(marshal.loads(profile['stats']))))
+        os.replace(tmp_path, self.output_path)
+        logger.info(f"Wrote profile of job {self.job_id} to {self.output_path}")
+        return self.output_path
+
+class _NoProfiler:
+    """Stand-in for jobs that weren't asked to be profiled; every hook is a no-op"""
+
+    enabled = False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def stage(self, name: str):
+        return nullcontext()
+
+    def worker_callback(self, stage: str) -> None:
+        return None
+
+    def write(self) -> None:
+        return None
+
+NO_PROFILER = _NoProfiler()
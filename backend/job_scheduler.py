@@ -0,0 +1,58 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from worker_pool import WORKER_POOL_SIZE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Jobs allowed in the parse stages (extract/replace) at once; more would only queue inside the worker pool
+SCHEDULER_MAX_PARSING = int(os.getenv('SCHEDULER_MAX_PARSING', WORKER_POOL_SIZE))
+# Jobs allowed to call the translation provider at once
+SCHEDULER_MAX_TRANSLATING = int(os.getenv('SCHEDULER_MAX_TRANSLATING', 2))
+
+class StageScheduler:
+    """Bounds how many jobs may be in each pipeline stage at the same time
+
+    Shared by single uploads and batch children, so a 400-file batch waits
+    for slots instead of flooding the worker pool and the provider.
+    """
+
+    def __init__(self, max_parsing: int = SCHEDULER_MAX_PARSING,
+                 max_translating: int = SCHEDULER_MAX_TRANSLATING):
+        self.limits = {'parse': max(1, max_parsing), 'translate': max(1, max_translating)}
+        self._semaphores = {stage: asyncio.Semaphore(limit) for stage, limit in self.limits.items()}
+        self._waiting = {stage: 0 for stage in self.limits}
+        self._active = {stage: 0 for stage in self.limits}
+
+    @asynccontextmanager
+    async def slot(self, stage: str):
+        """Hold one slot of a stage for the duration of the block"""
+        semaphore = self._semaphores[stage]
+        self._waiting[stage] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting[stage] -= 1
+
+        self._active[stage] += 1
+        try:
+            yield
+        finally:
+            self._active[stage] -= 1
+            semaphore.release()
+
+    def parse_slot(self):
+        return self.slot('parse')
+
+    def translate_slot(self):
+        return self.slot('translate')
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            stage: {'limit': limit, 'active': self._active[stage], 'waiting': self._waiting[stage]}
+            for stage, limit in self.limits.items()
+        }
@@ -0,0 +1,282 @@
+import os
+import json
+import pickle
+import shutil
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from conversion_cache import FileLock
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = os.getenv('JOB_DB_PATH', 'jobs.db')
+JOB_DATA_DIR = os.getenv('JOB_DATA_DIR', 'job_data')
+JOB_CACHE_SIZE = int(os.getenv('JOB_CACHE_SIZE', 256))
+JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', 86400))  # 24 hours
+
+FINISHED_STATUSES = ('completed', 'failed')
+
+class TranslationJob:
+    def __init__(self, job_id: str, filename: str, file_path: str):
+        self.job_id = job_id
+        self.filename = filename
+        self.file_path = file_path
+        self.status = "uploaded"
+        self.progress = 0
+        self.error_message = None
+        self.created_at = datetime.now()
+        self.completed_at = None
+        self.translated_file_path = None
+        self.file_size = 0
+        self.file_hash = None
+        self.extracted_count = 0
+        self.translations_count = 0
+        # Batch this job belongs to, if it was submitted as part of one
+        self.parent_id = None
+        # Earlier job for a previous revision of this drawing, whose translations are reused
+        self.based_on_job_id = None
+        # Small per-job figures reported by the API (ratios, counters)
+        self.stats = {}
+
+_COLUMNS = [
+    'job_id', 'filename', 'file_path', 'status', 'progress', 'error_message',
+    'created_at', 'completed_at', 'translated_file_path', 'file_size', 'file_hash',
+    'extracted_count', 'translations_count', 'stats', 'parent_id', 'based_on_job_id'
+]
+
+class JobStore:
+    """SQLite-backed job records with an in-memory cache of hot jobs
+
+    Bulky per-job payloads (extracted entities, translation maps) are kept
+    as files under data_dir instead of on the job record. Only one server
+    process may run jobs against a store; claim() enforces it.
+    """
+
+    def __init__(self, db_path: str = JOB_DB_PATH, data_dir: str = JOB_DATA_DIR,
+                 cache_size: int = JOB_CACHE_SIZE, ttl_seconds: int = JOB_TTL_SECONDS):
+        self.db_path = db_path
+        self.data_dir = data_dir
+        self.cache_size = cache_size
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._cache: "OrderedDict[str, TranslationJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._owner_lock = FileLock(db_path + '.lock')
+
+        os.makedirs(data_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL,
+                error_message TEXT,
+                created_at TEXT NOT NULL,
+                completed_at TEXT,
+                translated_file_path TEXT,
+                file_size INTEGER,
+                file_hash TEXT,
+                extracted_count INTEGER,
+                translations_count INTEGER,
+                stats TEXT,
+                parent_id TEXT,
+                based_on_job_id TEXT
+            )
+        """)
+        # Databases created by earlier versions lack the newer columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column in ('parent_id', 'based_on_job_id'):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_parent_id ON jobs (parent_id)")
+        self._conn.commit()
+
+    def _cache_put(self, job: TranslationJob):
+        self._cache[job.job_id] = job
+        self._cache.move_to_end(job.job_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _to_row(self, job: TranslationJob) -> tuple:
+        return (
+            job.job_id, job.filename, job.file_path, job.status, job.progress, job.error_message,
+            job.created_at.isoformat(), job.completed_at.isoformat() if job.completed_at else None,
+            job.translated_file_path, job.file_size, job.file_hash,
+            job.extracted_count, job.translations_count, json.dumps(job.stats), job.parent_id,
+            job.based_on_job_id
+        )
+
+    def _from_row(self, row: tuple) -> TranslationJob:
+        values = dict(zip(_COLUMNS, row))
+        job = TranslationJob(values['job_id'], values['filename'], values['file_path'])
+        job.status = values['status']
+        job.progress = values['progress']
+        job.error_message = values['error_message']
+        job.created_at = datetime.fromisoformat(values['created_at'])
+        job.completed_at = datetime.fromisoformat(values['completed_at']) if values['completed_at'] else None
+        job.translated_file_path = values['translated_file_path']
+        job.file_size = values['file_size'] or 0
+        job.file_hash = values['file_hash']
+        job.extracted_count = values['extracted_count'] or 0
+        job.translations_count = values['translations_count'] or 0
+        job.stats = json.loads(values['stats']) if values['stats'] else {}
+        job.parent_id = values['parent_id']
+        job.based_on_job_id = values['based_on_job_id']
+        return job
+
+    def save(self, job: TranslationJob):
+        """Insert or update a job record"""
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                self._to_row(job)
+            )
+            self._conn.commit()
+            self._cache_put(job)
+
+    def save_many(self, jobs: List[TranslationJob]):
+        """Insert or update several job records in one transaction"""
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                [self._to_row(job) for job in jobs]
+            )
+            self._conn.commit()
+            for job in jobs:
+                self._cache_put(job)
+
+    def update(self, job: TranslationJob, **fields):
+        """Set fields on a job and persist it"""
+        for name, value in fields.items():
+            setattr(job, name, value)
+        self.save(job)
+
+    def get(self, job_id: str) -> Optional[TranslationJob]:
+        with self._lock:
+            job = self._cache.get(job_id)
+            if job is not None:
+                self._cache.move_to_end(job_id)
+                return job
+
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            job = self._from_row(row)
+            self._cache_put(job)
+            return job
+
+    def list_jobs(self, limit: Optional[int] = None, top_level_only: bool = False) -> List[TranslationJob]:
+        """Return jobs, newest first; top_level_only leaves out the children of batches"""
+        query = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        if top_level_only:
+            query += " WHERE parent_id IS NULL"
+        query += " ORDER BY created_at DESC"
+        params: tuple = ()
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (limit,)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            # Prefer live cached objects so in-progress jobs show current state
+            return [self._cache.get(row[0]) or self._from_row(row) for row in rows]
+
+    def list_children(self, parent_id: str) -> List[TranslationJob]:
+        """Return the child jobs of a batch in submission order"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE parent_id = ? ORDER BY created_at, filename",
+                (parent_id,)
+            ).fetchall()
+            return [self._cache.get(row[0]) or self._from_row(row) for row in rows]
+
+    def _payload_path(self, job_id: str, name: str) -> str:
+        return os.path.join(self.data_dir, job_id, f"{name}.pkl")
+
+    def save_payload(self, job_id: str, name: str, data: Any):
+        """Offload a bulky per-job payload to disk"""
+        path = self._payload_path(job_id, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load_payload(self, job_id: str, name: str, default: Any = None) -> Any:
+        path = self._payload_path(job_id, name)
+        if not os.path.exists(path):
+            return default
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def artifact_path(self, job_id: str, filename: str) -> str:
+        """Where a file belonging to a job is kept; purged along with its payloads"""
+        return os.path.join(self.data_dir, job_id, filename)
+
+    def claim(self):
+        """Take the store for this process; raises if another server process holds it
+
+        Running jobs live in the memory of the process that started them, so
+        a second process would see them as interrupted.
+        """
+        if not self._owner_lock.acquire(timeout=0):
+            raise RuntimeError(f"Job store {self.db_path} is in use by another server process; "
+                               f"run a single worker per job store")
+
+    def fail_interrupted(self) -> int:
+        """Mark jobs left unfinished by a previous process as failed; call after claim()"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error_message = ?, completed_at = ? "
+                "WHERE status NOT IN (?, ?)",
+                ("Interrupted by server restart", datetime.now().isoformat(), *FINISHED_STATUSES)
+            )
+            self._conn.commit()
+            self._cache.clear()
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        """Delete finished jobs older than the TTL along with their payloads and files"""
+        cutoff = (datetime.now() - self.ttl).isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status IN (?, ?) AND completed_at < ?",
+                (*FINISHED_STATUSES, cutoff)
+            ).fetchall()
+            expired = [self._from_row(row) for row in rows]
+
+            self._conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(job.job_id,) for job in expired])
+            self._conn.commit()
+            for job in expired:
+                self._cache.pop(job.job_id, None)
+
+        for job in expired:
+            shutil.rmtree(os.path.join(self.data_dir, job.job_id), ignore_errors=True)
+            for path in {job.file_path, job.translated_file_path}:
+                if path and os.path.exists(path):
+                    try:
+                        # Batches keep their uploads in a directory of their own
+                        if os.path.isdir(path):
+                            shutil.rmtree(path)
+                        else:
+                            os.remove(path)
+                    except OSError as e:
+                        logger.warning(f"Could not remove {path}: {e}")
+
+        if expired:
+            logger.info(f"Purged {len(expired)} expired jobs")
+        return len(expired)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        self._owner_lock.release()
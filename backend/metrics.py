@@ -0,0 +1,212 @@
+import math
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds in seconds, from a cache hit to a 200MB drawing
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Texts per provider request; DeepL takes up to 50, Google up to 100
+BATCH_SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+class Metric:
+    """A named metric family; each distinct set of label values is one series
+
+    With a callback the values are read when the metric is rendered, which
+    suits state other objects already track (queue depths, cache hits):
+    the hot path pays nothing.
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        # A series without labels exists, at zero, before the first event
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """(sample name, label names, label values, value) of every series"""
+        values = self.callback() if self.callback is not None else self._snapshot()
+        for key, value in sorted(values.items()):
+            yield self.name, self.labelnames, key, value
+
+    def _snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, labelnames, labelvalues, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    """Counts observations into fixed buckets; observe() is a bisect and two additions"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the block, whether or not it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        labelnames = self.labelnames + ('le',)
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labelnames, key + (_format_value(float(bound)),), cumulative
+            yield f"{self.name}_sum", self.labelnames, key, total
+            yield f"{self.name}_count", self.labelnames, key, cumulative
+
+class MetricsRegistry:
+    """The metrics of this process, rendered together for GET /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                callback: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+# Pipeline metrics recorded by the app, the upload handler and the translation service.
+# Throughput is a ratio of two rates, e.g. extraction entities/s is
+# rate(dwg_translator_extracted_entities_total) / rate(dwg_translator_stage_duration_seconds_sum{stage="extract"})
+STAGE_SECONDS = registry.histogram(
+    'dwg_translator_stage_duration_seconds',
+    "Wall time of each pipeline stage (upload, convert, extract, filter, translate, replace), excluding queueing",
+    ('stage',)
+)
+UPLOAD_BYTES = registry.counter('dwg_translator_upload_bytes_total', "Bytes of drawings and archives received")
+EXTRACTED_ENTITIES = registry.counter('dwg_translator_extracted_entities_total', "Text entities extracted from drawings")
+FILTERED_STRINGS = registry.counter(
+    'dwg_translator_filtered_strings_total', "Unique strings cleaned and checked for Chinese text"
+)
+TRANSLATED_STRINGS = registry.counter('dwg_translator_translated_strings_total', "Unique strings sent for translation")
+REPLACED_ENTITIES = registry.counter('dwg_translator_replaced_entities_total', "Text entities written back translated")
+JOBS_FINISHED = registry.counter('dwg_translator_jobs_finished_total', "Jobs and batches that finished", ('status',))
+PROVIDER_SECONDS = registry.histogram(
+    'dwg_translator_provider_request_duration_seconds', "Latency of translation provider requests",
+    ('provider', 'outcome')
+)
+PROVIDER_BATCH_SIZE = registry.histogram(
+    'dwg_translator_provider_batch_size', "Texts per translation provider request", ('provider',),
+    buckets=BATCH_SIZE_BUCKETS
+)
+PROVIDER_THROTTLES = registry.counter(
+    'dwg_translator_provider_throttled_total', "Provider requests answered with 429 or a similar slow-down",
+    ('provider',)
+)
+PROVIDER_CIRCUIT_OPENED = registry.counter(
+    'dwg_translator_provider_circuit_opened_total', "Times a provider was skipped for a cool-down after failing",
+    ('provider',)
+)
+HEDGED_REQUESTS = registry.counter(
+    'dwg_translator_hedged_requests_total', "Batches also sent to a second provider after the first was slow",
+    ('primary', 'winner')
+)
+
+@contextmanager
+def provider_request(provider: str, batch_size: int):
+    """Record one provider request: its batch size, and its latency labelled ok or error"""
+    PROVIDER_BATCH_SIZE.observe(batch_size, provider=provider)
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        PROVIDER_SECONDS.observe(time.perf_counter() - started, provider=provider, outcome=outcome)
@@ -1,12 +1,15 @@
 import asyncio
 import random
-from typing import List, Dict
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
+import script_detection
 
 class MockTranslationService:
     """Mock translation service for testing without API keys"""
 
-    def __init__(self):
+    def __init__(self, delay: float = 0.1):
+        # Simulated per-text latency in seconds; 0 measures the service's own overhead
+        self.delay = delay
         self.mock_translations = {
             # Common CAD terms
             "图层": "レイヤー",
@@ -62,18 +65,18 @@ class MockTranslationService:
 
     def detect_chinese_text(self, text: str) -> bool:
         """Simple Chinese text detection"""
-        chinese_chars = [char for char in text if '\u4e00' <= char <= '\u9fff']
-        return len(chinese_chars) > 0
+        return script_detection.contains_han(text, script_detection.BASIC_HAN_PATTERN)
 
-    async def translate(self, texts: List[str], glossary: Dict[str, str] = None) -> List[Dict]:
+    async def translate(self, texts: List[str], glossary: Dict[str, str] = None,
+                        progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
         """Mock translation - returns predefined translations"""
         results = []
 
-        for text in texts:
+        for i, text in enumerate(texts):
             translated_text = self.mock_translations.get(text, f"[翻訳: {text}]")
 
             # Simulate processing delay
-            await asyncio.sleep(0.1)
+            await asyncio.sleep(self.delay)
 
             results.append({
                 "source_text": text,
@@ -83,11 +86,14 @@ class MockTranslationService:
                 "confidence": 0.95
             })
 
+            if progress_callback:
+                progress_callback(i + 1, len(texts))
+
         return results
 
     def filter_chinese_texts(self, text_entities: List[str]) -> List[str]:
         """Filter and return only texts containing Chinese characters"""
-        return [text for text in text_entities if self.detect_chinese_text(text)]
+        return script_detection.filter_chinese_texts(text_entities, pattern=script_detection.BASIC_HAN_PATTERN).texts
 
     def create_technical_glossary(self) -> Dict[str, str]:
         """Create a technical glossary for CAD/AEC terms"""
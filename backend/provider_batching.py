@@ -0,0 +1,259 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from metrics import PROVIDER_THROTTLES
+from provider_health import CircuitBreaker, LatencyWindow
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Batches a provider call may have in flight at once
+MAX_CONCURRENT_BATCHES = int(os.getenv('TRANSLATION_MAX_CONCURRENT_BATCHES', 4))
+# Latency a batch should come back within; slower batches shrink the next ones
+TARGET_BATCH_SECONDS = float(os.getenv('TRANSLATION_TARGET_BATCH_SECONDS', 5))
+# Attempts per batch after the provider asked to slow down, before the call fails
+MAX_THROTTLE_RETRIES = int(os.getenv('TRANSLATION_MAX_THROTTLE_RETRIES', 5))
+RETRY_BASE_DELAY = 1.0  # seconds, doubled on every retry without Retry-After
+RETRY_MAX_DELAY = 60.0
+# Smallest request budget the controller backs off to
+MIN_BATCH_BYTES = 4096
+
+async def gather_in_order(coros) -> List:
+    """Run coroutines concurrently, keep input order, and cancel the rest on the first failure"""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+class ProviderThrottled(Exception):
+    """The provider asked us to slow down (429 and similar); the batch can be sent again"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class ProviderResponseError(Exception):
+    """The provider answered a batch with a different number of translations than texts sent"""
+
+def check_batch_response(provider: str, batch: List[str], results: List):
+    """Raise ProviderResponseError unless results has one item per text of batch"""
+    if len(results) != len(batch):
+        raise ProviderResponseError(f"{provider} returned {len(results)} translations for {len(batch)} texts")
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+@dataclass
+class ProviderLimits:
+    """Per-request and per-second limits of one provider; a rate of 0 means unlimited"""
+    max_texts: int
+    max_request_bytes: int
+    requests_per_second: float
+    chars_per_second: float
+
+    @classmethod
+    def from_env(cls, provider: str, max_texts: int, max_request_bytes: int,
+                 requests_per_second: float, chars_per_second: float) -> 'ProviderLimits':
+        prefix = provider.upper()
+        return cls(
+            max_texts=int(os.getenv(f'{prefix}_MAX_BATCH_TEXTS', max_texts)),
+            max_request_bytes=int(os.getenv(f'{prefix}_MAX_BATCH_BYTES', max_request_bytes)),
+            requests_per_second=float(os.getenv(f'{prefix}_REQUESTS_PER_SECOND', requests_per_second)),
+            chars_per_second=float(os.getenv(f'{prefix}_CHARS_PER_SECOND', chars_per_second))
+        )
+
+class TokenBucket:
+    """Allows rate units per second with bursts up to capacity; waiters are served in order
+
+    A request larger than the capacity is let through once the bucket is
+    full and leaves it in debt, so it still pays for every unit it used.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        """Hand out nothing for the next seconds, e.g. after a Retry-After"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self, amount: float = 1):
+        if self.rate <= 0 and self._blocked_until <= time.monotonic():
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                if self.rate <= 0:
+                    return
+                self._refill(now)
+                needed = min(amount, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((needed - self._tokens) / self.rate)
+
+class AdaptiveBudget:
+    """Request size budget in bytes, adjusted by additive increase / multiplicative decrease
+
+    Grows a step after every batch that came back within the target
+    latency, shrinks by a quarter after a slow one and by half when the
+    provider throttles.
+    """
+
+    def __init__(self, max_bytes: int, target_seconds: float = TARGET_BATCH_SECONDS,
+                 min_bytes: int = MIN_BATCH_BYTES):
+        self.max_bytes = max_bytes
+        self.min_bytes = min(min_bytes, max_bytes)
+        self.target_seconds = target_seconds
+        self.step = max(1, max_bytes // 16)
+        self.value = max(self.min_bytes, max_bytes // 4)
+
+    def on_success(self, seconds: float):
+        if seconds <= self.target_seconds:
+            self.value = min(self.max_bytes, self.value + self.step)
+        else:
+            self.value = max(self.min_bytes, int(self.value * 0.75))
+
+    def on_throttled(self):
+        self.value = max(self.min_bytes, self.value // 2)
+
+def pack_batch(sizes: List[int], start: int, max_texts: int, max_bytes: int) -> int:
+    """End index of the batch starting at start: as many texts as fit both limits, at least one"""
+    end = start + 1
+    total = sizes[start]
+    limit = min(len(sizes), start + max_texts)
+    while end < limit and total + sizes[end] <= max_bytes:
+        total += sizes[end]
+        end += 1
+    return end
+
+class ProviderBatcher:
+    """Packs texts into provider requests by size and sends them within the provider's quotas
+
+    Batches are packed as they are sent, so a budget cut after a slow or
+    throttled batch applies to the very next request. Shared by every job
+    using the provider, since the quotas belong to the API key. Also keeps
+    the provider's circuit breaker and recent latencies, fed by send().
+    """
+
+    def __init__(self, provider: str, limits: ProviderLimits, request_bytes: Callable[[str], int],
+                 max_concurrent: int = MAX_CONCURRENT_BATCHES):
+        self.provider = provider
+        self.limits = limits
+        self.request_bytes = request_bytes
+        self.budget = AdaptiveBudget(limits.max_request_bytes)
+        self.request_bucket = TokenBucket(limits.requests_per_second)
+        self.char_bucket = TokenBucket(limits.chars_per_second)
+        self.max_concurrent = max(1, max_concurrent)
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self.breaker = CircuitBreaker(provider)
+        self.latency = LatencyWindow()
+
+    async def run(self, texts: List[str], post_batch: Callable[[List[str]], Awaitable[List]],
+                  send: Optional[Callable[[List[str]], Awaitable[List]]] = None) -> List:
+        """Send every text once through post_batch; results in input order
+
+        send replaces send(batch, post_batch) for each packed batch, e.g. to
+        hedge it with another provider.
+        """
+        if send is None:
+            send = lambda batch: self.send(batch, post_batch)
+        sizes = [self.request_bytes(text) for text in texts]
+        results: List = [None] * len(texts)
+        cursor = 0
+
+        def next_span() -> Optional[Tuple[int, int]]:
+            nonlocal cursor
+            if cursor >= len(texts):
+                return None
+            start = cursor
+            cursor = pack_batch(sizes, start, self.limits.max_texts, self.budget.value)
+            if cursor - start == 1 and sizes[start] > self.limits.max_request_bytes:
+                logger.warning(f"{self.provider}: a {sizes[start]}-byte text exceeds the request limit, sending it alone")
+            return start, cursor
+
+        async def sender():
+            while (span := next_span()) is not None:
+                start, end = span
+                batch_results = await send(texts[start:end])
+                # A custom send may bypass the check in send(); a short list would shift every later index
+                check_batch_response(self.provider, texts[start:end], batch_results)
+                results[start:end] = batch_results
+
+        await gather_in_order(sender() for _ in range(min(self.max_concurrent, len(texts))))
+        return results
+
+    async def send(self, batch: List[str], post_batch: Callable[[List[str]], Awaitable[List]],
+                   on_post: Optional[Callable[[], None]] = None) -> List:
+        """Send one batch within the quotas, retrying it while the provider throttles
+
+        on_post is called each time the batch holds its slot and permits and
+        is about to be posted, i.e. after any queueing.
+        """
+        try:
+            results, seconds = await self._send(batch, post_batch, on_post)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        self.latency.record(seconds)
+        return results
+
+    async def _send(self, batch: List[str], post_batch: Callable[[List[str]], Awaitable[List]],
+                    on_post: Optional[Callable[[], None]] = None) -> Tuple[List, float]:
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            async with self._slots:
+                await self.request_bucket.acquire(1)
+                await self.char_bucket.acquire(sum(map(len, batch)))
+                if on_post:
+                    on_post()
+                started = time.perf_counter()
+                try:
+                    results = await post_batch(batch)
+                    check_batch_response(self.provider, batch, results)
+                except ProviderThrottled as e:
+                    self.budget.on_throttled()
+                    PROVIDER_THROTTLES.inc(provider=self.provider)
+                    if attempt == MAX_THROTTLE_RETRIES:
+                        raise
+                    delay = e.retry_after
+                    if delay is None:
+                        delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.0)
+                    # Every sender of this provider backs off, not only this one
+                    self.request_bucket.pause(delay)
+                    logger.warning(f"{self.provider} throttled, retrying {len(batch)} texts in {delay:.1f}s "
+                                   f"(budget now {self.budget.value} bytes)")
+                    continue
+            seconds = time.perf_counter() - started
+            self.budget.on_success(seconds)
+            return results, seconds
@@ -0,0 +1,78 @@
+import os
+import math
+import time
+import logging
+from collections import deque
+from typing import Optional
+
+from metrics import PROVIDER_CIRCUIT_OPENED
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Failed provider calls in a row that open the circuit
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('TRANSLATION_CIRCUIT_FAILURES', 5))
+# Seconds an open circuit skips the provider before letting calls through again
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv('TRANSLATION_CIRCUIT_COOLDOWN', 30))
+# Recent batch latencies kept per provider, and how many are needed before a percentile is trusted
+LATENCY_WINDOW_SIZE = int(os.getenv('TRANSLATION_LATENCY_WINDOW', 200))
+LATENCY_MIN_SAMPLES = int(os.getenv('TRANSLATION_LATENCY_MIN_SAMPLES', 20))
+
+class CircuitBreaker:
+    """Skips a provider for a cool-down period after it failed several times in a row
+
+    Closed, calls go through. After failure_threshold consecutive failures
+    it opens and available() is False until the cool-down has passed; then
+    calls go through again (half-open) and the next failure reopens it,
+    the next success closes it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 cooldown: float = CIRCUIT_COOLDOWN_SECONDS):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self._open_until = 0.0
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return 'closed'
+        return 'open' if time.monotonic() < self._open_until else 'half_open'
+
+    def available(self) -> bool:
+        return self.state != 'open'
+
+    def record_success(self):
+        if self.failures >= self.failure_threshold:
+            logger.info(f"{self.name} recovered, circuit closed")
+        self.failures = 0
+
+    def record_failure(self):
+        was_open = self.state == 'open'
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self._open_until = time.monotonic() + self.cooldown
+            if not was_open:
+                PROVIDER_CIRCUIT_OPENED.inc(provider=self.name)
+                logger.warning(f"{self.name} failed {self.failures} times in a row, "
+                               f"skipping it for {self.cooldown:.0f}s")
+
+class LatencyWindow:
+    """Latencies of a provider's most recent successful requests"""
+
+    def __init__(self, size: int = LATENCY_WINDOW_SIZE, min_samples: int = LATENCY_MIN_SAMPLES):
+        self.min_samples = max(1, min_samples)
+        self._samples = deque(maxlen=max(self.min_samples, size))
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Nearest-rank percentile, or None until min_samples requests have been seen"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(1, math.ceil(percent / 100 * len(ordered)))
+        return ordered[rank - 1]
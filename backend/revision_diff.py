@@ -0,0 +1,43 @@
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from text_entity import handles_and_texts
+
+# handle -> (hash of the source text, translation written for it or None)
+TextTable = Dict[str, Tuple[str, Optional[str]]]
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def build_text_table(entities: Iterable, handle_to_translation: Dict[str, str]) -> TextTable:
+    """What a finished job wrote for each entity, for later revisions of the drawing to diff against"""
+    return {handle: (text_hash(text), handle_to_translation.get(handle)) for handle, text in handles_and_texts(entities)}
+
+def table_from_translations(entities: Iterable, text_to_translation: Dict[str, str]) -> TextTable:
+    """Rebuild a text table from a job's extracted entities and translation map (jobs saved without one)"""
+    return {handle: (text_hash(text), text_to_translation.get(text)) for handle, text in handles_and_texts(entities)}
+
+class RevisionDiff:
+    """Entities of a revised drawing split against the text table of an earlier revision"""
+
+    def __init__(self, reused: Dict[str, str], pending: List):
+        # handle -> translation carried over from the earlier job
+        self.reused = reused
+        # New entities, edited ones and ones that had no translation
+        self.pending = pending
+
+    def reused_texts(self, entities: Iterable) -> Dict[str, str]:
+        """Source text -> reused translation, in the shape of a job's translation map"""
+        return {text: self.reused[handle] for handle, text in handles_and_texts(entities) if handle in self.reused}
+
+def diff_revision(entities: Iterable, base_table: TextTable) -> RevisionDiff:
+    """Reuse the earlier translation of every entity whose handle and text are unchanged"""
+    reused = {}
+    pending = []
+    for entity in entities:
+        base = base_table.get(entity.handle)
+        if base is not None and base[1] is not None and base[0] == text_hash(entity.text):
+            reused[entity.handle] = base[1]
+        else:
+            pending.append(entity)
+    return RevisionDiff(reused, pending)
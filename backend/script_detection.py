@@ -0,0 +1,73 @@
+import re
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+
+# Han ideographs: CJK Unified (+ Extensions A-E) and Compatibility Ideographs
+HAN_PATTERN = re.compile(
+    '[\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff'
+    '\U00020000-\U0002a6df\U0002a700-\U0002b73f\U0002b740-\U0002b81f\U0002b820-\U0002ceaf]'
+)
+# Basic CJK Unified Ideographs block only
+BASIC_HAN_PATTERN = re.compile('[\u4e00-\u9fff]')
+
+_threshold_patterns: Dict[Tuple[str, int], Pattern] = {}
+
+def _threshold_pattern(pattern: Pattern, min_chars: int) -> Pattern:
+    """Regex that matches once min_chars characters of the class have been seen"""
+    key = (pattern.pattern, min_chars)
+    compiled = _threshold_patterns.get(key)
+    if compiled is None:
+        char_class = pattern.pattern
+        others = '[^' + char_class[1:]
+        compiled = re.compile(char_class + ('(?:' + others + '*' + char_class + ')') * (min_chars - 1))
+        _threshold_patterns[key] = compiled
+    return compiled
+
+class ScriptFilterResult:
+    """Texts kept by filter_chinese_texts; Han counts are computed on first access"""
+
+    def __init__(self, texts: List[str], total_count: int, pattern: Pattern = HAN_PATTERN,
+                 preprocess: Optional[Callable[[str], str]] = None):
+        self.texts = texts
+        self.total_count = total_count
+        self._pattern = pattern
+        self._preprocess = preprocess
+        self._cjk_counts: Optional[List[int]] = None
+
+    @property
+    def cjk_counts(self) -> List[int]:
+        """Han character count per kept text"""
+        if self._cjk_counts is None:
+            findall = self._pattern.findall
+            preprocess = self._preprocess
+            self._cjk_counts = [len(findall(preprocess(text) if preprocess else text)) for text in self.texts]
+        return self._cjk_counts
+
+    @property
+    def cjk_chars(self) -> int:
+        return sum(self.cjk_counts)
+
+def contains_han(text: str, pattern: Pattern = HAN_PATTERN) -> bool:
+    """True if text has at least one Han character"""
+    return bool(text) and not text.isascii() and pattern.search(text) is not None
+
+def count_han(text: str, pattern: Pattern = HAN_PATTERN) -> int:
+    if not text or text.isascii():
+        return 0
+    return len(pattern.findall(text))
+
+def filter_chinese_texts(texts: List[str], min_chars: int = 1, pattern: Pattern = HAN_PATTERN,
+                         preprocess: Optional[Callable[[str], str]] = None) -> ScriptFilterResult:
+    """Classify a whole list of texts in one call
+
+    Keeps texts with at least min_chars characters matching pattern, checked
+    after preprocess if one is given. Each check stops at the min_chars-th
+    match; isascii() is a C-level scan that skips the regex for plain ASCII.
+    """
+    search = _threshold_pattern(pattern, min_chars).search if min_chars > 1 else pattern.search
+
+    if preprocess is None:
+        kept = [text for text in texts if text and not text.isascii() and search(text)]
+    else:
+        kept = [text for text in texts if text and not text.isascii() and search(preprocess(text))]
+
+    return ScriptFilterResult(kept, len(texts), pattern, preprocess)
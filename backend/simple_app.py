@@ -9,6 +9,7 @@ import asyncio
 from datetime import datetime
 from simple_dwg_processor import SimpleDWGProcessor
 from mock_translation_service import MockTranslationService
+from upload_handler import save_upload_stream, UploadValidationError
 
 app = FastAPI(title="AutoCAD DWG Translator API (Test Version)", version="1.0.0")
 
@@ -40,6 +41,8 @@ class TranslationJob:
         self.created_at = datetime.now()
         self.completed_at = None
         self.translated_file_path = None
+        self.file_size = 0
+        self.file_hash = None
         self.extracted_texts = []
         self.translations = {}
 
@@ -117,11 +120,12 @@ async def upload_file(file: UploadFile = File(...), background_tasks: Background
     file_path = os.path.join(UPLOAD_DIR, f"{job_id}_{file.filename}")
 
     try:
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        upload = await save_upload_stream(file, file_path)
 
-        jobs[job_id] = TranslationJob(job_id, file.filename, file_path)
+        job = TranslationJob(job_id, file.filename, file_path)
+        job.file_size = upload.size
+        job.file_hash = upload.sha256
+        jobs[job_id] = job
 
         # Start background processing
         if background_tasks:
@@ -130,9 +134,13 @@ async def upload_file(file: UploadFile = File(...), background_tasks: Background
         return {
             "job_id": job_id,
             "filename": file.filename,
+            "file_size": upload.size,
+            "sha256": upload.sha256,
             "message": "File uploaded successfully",
             "status": "processing_started"
         }
+    except UploadValidationError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
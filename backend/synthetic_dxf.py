@@ -0,0 +1,276 @@
+import io
+import os
+import random
+import argparse
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List
+
+import ezdxf
+import ezdxf.lldxf.encoding  # noqa: F401 - registers the 'dxfreplace' codec error handler
+from ezdxf.tools.codepage import toencoding
+from ezdxf.tools.text import split_mtext_string
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Code page name -> (DXF version, $DWGCODEPAGE); UTF-8 needs R2007 or later
+CODEPAGES = {
+    'gbk': ('R2000', 'ANSI_936'),
+    'utf8': ('R2018', 'ANSI_1252')
+}
+ENTITY_TYPES = ('text', 'mtext', 'attrib', 'dimension')
+DEFAULT_MIX = 'text=0.4,mtext=0.3,attrib=0.2,dimension=0.1'
+WRITE_CHUNK_SIZE = 10000  # entities per write
+
+# Drawing vocabulary the generated strings are built from
+CAD_WORDS = [
+    "图层", "属性", "标注", "多行文字", "插入点", "旋转", "比例", "线型", "颜色", "线宽",
+    "平面图", "立面图", "剖面图", "详图", "总平面图", "结构图", "施工图", "混凝土", "钢筋",
+    "钢结构", "基础", "柱", "梁", "板", "墙", "门", "窗", "楼梯", "屋面", "防水", "保温",
+    "给排水", "暖通", "电气", "消防", "卫生间", "厨房", "走廊", "设备间", "标高", "轴线",
+    "说明", "材料", "做法", "厚度", "强度等级", "施工缝", "预埋件", "检修口", "通风"
+]
+ASCII_WORDS = ["A", "B", "C", "GL", "FL", "EL", "TYP", "REF", "MIN", "MAX", "DN", "UP"]
+
+# MTEXT inline formatting wrapped around a word: font, height, colour, underline, width
+MTEXT_FORMATS = [
+    "{{\\fSimSun|b0|i0|c134|p2;{}}}",
+    "{{\\H1.5x;{}}}",
+    "{{\\C1;{}}}",
+    "\\L{}\\l",
+    "{{\\W0.8;{}}}"
+]
+
+@dataclass
+class SyntheticDrawingSpec:
+    """Parameters of a generated drawing; the same spec and seed always give the same file"""
+    entities: int = 1000
+    # Entity type -> share of the layout text entities
+    mix: Dict[str, float] = field(default_factory=lambda: parse_mix(DEFAULT_MIX))
+    # Share of entities repeating a string already used elsewhere in the drawing
+    duplicate_ratio: float = 0.5
+    # Share of strings with no Chinese at all (tags, grid labels)
+    ascii_ratio: float = 0.1
+    # Chance of each MTEXT word carrying inline formatting; also controls \P paragraph breaks
+    mtext_format_density: float = 0.3
+    # Depth of nested block definitions placed by the ATTRIB inserts
+    block_depth: int = 2
+    layers: int = 20
+    codepage: str = 'utf8'
+    seed: int = 0
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """'text=0.5,mtext=0.5' -> normalized entity type shares"""
+    shares = {}
+    for part in mix.split(','):
+        name, _, share = part.partition('=')
+        name = name.strip().lower()
+        if name not in ENTITY_TYPES:
+            raise ValueError(f"Unknown entity type {name!r}; expected one of {', '.join(ENTITY_TYPES)}")
+        shares[name] = float(share)
+    total = sum(shares.values())
+    if total <= 0:
+        raise ValueError(f"Entity mix {mix!r} has no positive share")
+    return {name: share / total for name, share in shares.items()}
+
+class _TextSource:
+    """Draws entity strings with the requested share of repeats"""
+
+    def __init__(self, spec: SyntheticDrawingSpec, rng: random.Random):
+        self.spec = spec
+        self.rng = rng
+        self.used: List[str] = []
+
+    def _new_text(self) -> str:
+        rng = self.rng
+        serial = len(self.used)
+        if rng.random() < self.spec.ascii_ratio:
+            return f"{rng.choice(ASCII_WORDS)}-{serial}"
+        words = ''.join(rng.choice(CAD_WORDS) for _ in range(rng.randint(1, 4)))
+        return f"{words} {serial}" if rng.random() < 0.5 else f"{words}{rng.choice(ASCII_WORDS)}{serial}"
+
+    def draw(self) -> str:
+        if self.used and self.rng.random() < self.spec.duplicate_ratio:
+            return self.rng.choice(self.used)
+        text = self._new_text()
+        self.used.append(text)
+        return text
+
+    def mtext(self) -> str:
+        """A paragraph of several strings with inline formatting at the requested density"""
+        rng = self.rng
+        density = self.spec.mtext_format_density
+        parts = []
+        for _ in range(rng.randint(1, 3)):
+            text = self.draw()
+            if rng.random() < density:
+                text = rng.choice(MTEXT_FORMATS).format(text)
+            parts.append(text)
+        separators = ['\\P' if rng.random() < density else ' ' for _ in parts[1:]]
+        text = parts[0]
+        for separator, part in zip(separators, parts[1:]):
+            text += separator + part
+        return text
+
+def _skeleton(spec: SyntheticDrawingSpec, rng: random.Random):
+    """ezdxf document with layers and block definitions but no layout entities, and the dimension geometry block name"""
+    dxfversion, codepage = CODEPAGES[spec.codepage]
+    doc = ezdxf.new(dxfversion)
+    # ezdxf writes $DWGCODEPAGE from the document encoding
+    doc.encoding = toencoding(codepage)
+    for index in range(spec.layers):
+        doc.layers.add(f"LAYER_{index}", color=index % 255 + 1)
+
+    # SYM_0 holds text only; each SYM_k adds an insert of SYM_k-1, and the top one carries the ATTDEF
+    for depth in range(max(1, spec.block_depth)):
+        block = doc.blocks.new(f"SYM_{depth}")
+        block.add_text(f"{rng.choice(CAD_WORDS)}{depth}", dxfattribs={'height': 2.5, 'insert': (0, 0)})
+        if depth > 0:
+            block.add_blockref(f"SYM_{depth - 1}", (0, 5))
+    block.add_attdef('NAME', (0, -5), text=rng.choice(CAD_WORDS), dxfattribs={'height': 2.5})
+
+    # Geometry shared by the streamed dimensions; a DIMENSION without one is dropped by ezdxf's audit
+    geometry = doc.blocks.new_anonymous_block('D')
+    geometry.add_line((0, 0), (0, 5))
+    geometry.add_line((40, 0), (40, 5))
+    geometry.add_line((0, 5), (40, 5))
+    geometry.add_mtext("40", dxfattribs={'insert': (20, 6), 'char_height': 2.5})
+    return doc, geometry.name
+
+class _EntityWriter:
+    """Writes layout entities as raw DXF tags, the way ezdxf lays them out"""
+
+    def __init__(self, owner: str, first_handle: int, block_name: str, dimension_block: str):
+        self.owner = owner
+        self.next_handle = first_handle
+        self.block_name = block_name
+        self.dimension_block = dimension_block
+
+    def _handle(self) -> str:
+        handle = format(self.next_handle, 'X')
+        self.next_handle += 1
+        return handle
+
+    def _header(self, entity_type: str, owner: str, layer: str) -> str:
+        return f"  0\n{entity_type}\n  5\n{self._handle()}\n330\n{owner}\n100\nAcDbEntity\n  8\n{layer}\n"
+
+    def text(self, text: str, layer: str, x: float, y: float) -> str:
+        return (self._header('TEXT', self.owner, layer) +
+                f"100\nAcDbText\n 10\n{x}\n 20\n{y}\n 30\n0.0\n 40\n2.5\n  1\n{text}\n100\nAcDbText\n")
+
+    def mtext(self, text: str, layer: str, x: float, y: float) -> str:
+        chunks = split_mtext_string(text, size=250) or ['']
+        tags = ''.join(f"  3\n{chunk}\n" for chunk in chunks[:-1]) + f"  1\n{chunks[-1]}\n"
+        return (self._header('MTEXT', self.owner, layer) +
+                f"100\nAcDbMText\n 10\n{x}\n 20\n{y}\n 30\n0.0\n 40\n2.5\n 41\n80.0\n 71\n1\n{tags}")
+
+    def attrib(self, text: str, layer: str, x: float, y: float) -> str:
+        insert_handle = format(self.next_handle, 'X')
+        insert = (self._header('INSERT', self.owner, layer) +
+                  f"100\nAcDbBlockReference\n 66\n1\n  2\n{self.block_name}\n 10\n{x}\n 20\n{y}\n 30\n0.0\n")
+        attrib = (self._header('ATTRIB', insert_handle, layer) +
+                  f"100\nAcDbText\n 10\n{x}\n 20\n{y - 5}\n 30\n0.0\n 40\n2.5\n  1\n{text}\n"
+                  f"100\nAcDbAttribute\n  2\nNAME\n 70\n0\n")
+        return insert + attrib + self._header('SEQEND', insert_handle, layer)
+
+    def dimension(self, text: str, layer: str, x: float, y: float) -> str:
+        # Text override on a linear dimension drawn by the shared geometry block
+        return (self._header('DIMENSION', self.owner, layer) +
+                f"100\nAcDbDimension\n  2\n{self.dimension_block}\n  3\nStandard\n 10\n{x}\n 20\n{y + 5}\n 30\n0.0\n"
+                f" 11\n{x + 20}\n 21\n{y + 5}\n 31\n0.0\n 70\n32\n 71\n5\n  1\n{text}\n"
+                f"100\nAcDbAlignedDimension\n 13\n{x}\n 23\n{y}\n 33\n0.0\n 14\n{x + 40}\n 24\n{y}\n 34\n0.0\n"
+                f" 50\n0.0\n100\nAcDbRotatedDimension\n")
+
+# Handles an entity of each type uses (INSERT + ATTRIB + SEQEND)
+HANDLES_PER_ENTITY = {'text': 1, 'mtext': 1, 'attrib': 3, 'dimension': 1}
+
+def _entities(spec: SyntheticDrawingSpec, rng: random.Random, writer: _EntityWriter,
+              counts: Dict[str, int]) -> Iterator[str]:
+    texts = _TextSource(spec, rng)
+    names = list(spec.mix)
+    weights = [spec.mix[name] for name in names]
+    layers = [f"LAYER_{index}" for index in range(spec.layers)] or ['0']
+    for index in range(spec.entities):
+        entity_type = rng.choices(names, weights)[0]
+        counts[entity_type] = counts.get(entity_type, 0) + 1
+        text = texts.mtext() if entity_type == 'mtext' else texts.draw()
+        x, y = float(index % 1000 * 100), float(index // 1000 * 20)
+        yield getattr(writer, entity_type)(text, rng.choice(layers), x, y)
+    counts['unique_texts'] = len(texts.used)
+
+def generate_dxf(output_path: str, spec: SyntheticDrawingSpec) -> Dict:
+    """Write a synthetic drawing to output_path and return what went into it"""
+    rng = random.Random(spec.seed)
+    doc, dimension_block = _skeleton(spec, rng)
+
+    # Reserve handles for the streamed entities so $HANDSEED stays past all of them
+    first_handle = int(doc.entitydb.handles.next(), 16)
+    doc.entitydb.handles.reset(format(first_handle + spec.entities * max(HANDLES_PER_ENTITY.values()) + 1, 'X'))
+
+    stream = io.StringIO()
+    doc.write(stream)
+    skeleton = stream.getvalue()
+    section = skeleton.index('\nENTITIES\n')
+    split = skeleton.index('  0\nENDSEC\n', section)
+
+    writer = _EntityWriter(doc.modelspace().layout_key, first_handle,
+                           f"SYM_{max(1, spec.block_depth) - 1}", dimension_block)
+    encoding = doc.output_encoding
+    counts: Dict[str, int] = {}
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as out:
+            out.write(skeleton[:split].encode(encoding, errors='dxfreplace'))
+            chunk = []
+            for entity in _entities(spec, rng, writer, counts):
+                chunk.append(entity)
+                if len(chunk) >= WRITE_CHUNK_SIZE:
+                    out.write(''.join(chunk).encode(encoding, errors='dxfreplace'))
+                    chunk = []
+            out.write(''.join(chunk).encode(encoding, errors='dxfreplace'))
+            out.write(skeleton[split:].encode(encoding, errors='dxfreplace'))
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    info = {
+        'path': output_path,
+        'bytes': os.path.getsize(output_path),
+        'dxfversion': doc.dxfversion,
+        'encoding': encoding,
+        'layout_entities': spec.entities,
+        # One TEXT per nested definition, the top one's ATTDEF and the dimension geometry's MTEXT
+        'block_definition_texts': max(1, spec.block_depth) + 2,
+        'entity_types': {name: counts.get(name, 0) for name in ENTITY_TYPES},
+        'unique_texts': counts.get('unique_texts', 0)
+    }
+    logger.info(f"Generated {output_path}: {spec.entities} entities, {info['bytes']} bytes")
+    return info
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic DXF drawing full of Chinese text")
+    parser.add_argument('output', help="DXF file to write")
+    parser.add_argument('-n', '--entities', type=int, default=1000, help="layout text entities")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="entity type shares, e.g. text=0.5,mtext=0.5")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.5)
+    parser.add_argument('--ascii-ratio', type=float, default=0.1)
+    parser.add_argument('--mtext-format-density', type=float, default=0.3)
+    parser.add_argument('--block-depth', type=int, default=2)
+    parser.add_argument('--layers', type=int, default=20)
+    parser.add_argument('--codepage', choices=sorted(CODEPAGES), default='utf8')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    spec = SyntheticDrawingSpec(
+        entities=args.entities, mix=parse_mix(args.mix), duplicate_ratio=args.duplicate_ratio,
+        ascii_ratio=args.ascii_ratio, mtext_format_density=args.mtext_format_density,
+        block_depth=args.block_depth, layers=args.layers, codepage=args.codepage, seed=args.seed
+    )
+    info = generate_dxf(args.output, spec)
+    print(f"{info['path']}: {info['bytes']} bytes, {info['entity_types']}, {info['unique_texts']} unique strings")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import os
+import threading
+import time
+
+import conversion_cache
+from conversion_cache import ConversionCache, FileLock
+
+def test_waiter_on_a_removed_lock_file_locks_its_replacement(tmp_path):
+    path = str(tmp_path / 'key.lock')
+    holder = FileLock(path)
+    holder.acquire()
+    waiter = FileLock(path)
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(waiter.acquire(timeout=5, poll_interval=0.01)))
+    thread.start()
+    time.sleep(0.1)
+
+    # Eviction removes the lock file while holding it
+    os.remove(path)
+    holder.release()
+    thread.join()
+
+    assert acquired == [True]
+    assert not FileLock(path).acquire(timeout=0)
+    waiter.release()
+
+def test_evict_skips_entries_being_converted(tmp_path):
+    cache = ConversionCache(str(tmp_path), max_bytes=0)
+    path = cache.entry_path('ab' * 32)
+    os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write('0\nEOF\n')
+    os.utime(path, (0, 0))
+
+    lock = FileLock(path + '.lock')
+    lock.acquire()
+    assert cache.evict() == 0 and os.path.exists(path)
+    lock.release()
+
+    assert cache.evict() == 1
+    assert not os.path.exists(path) and not os.path.exists(path + '.lock')
+
+def _fail_if_hashed(path):
+    raise AssertionError(f"{path} was hashed although its hash was given")
+
+def test_known_source_hash_skips_hashing(tmp_path, monkeypatch):
+    source = tmp_path / 'drawing.dwg'
+    source.write_bytes(b'dwg bytes')
+    monkeypatch.setattr(conversion_cache, 'file_sha256', _fail_if_hashed)
+
+    def convert(path):
+        output = str(tmp_path / 'drawing.dxf')
+        with open(output, 'w') as f:
+            f.write('0\nEOF\n')
+        return output
+
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    path = cache.get_or_convert(str(source), 'v1', convert, source_hash='f' * 64)
+    assert cache.get_or_convert(str(source), 'v1', convert, source_hash='f' * 64) == path
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,37 @@
+import ezdxf
+import pytest
+
+from dwg_processor import DWGProcessor
+from dxf_tag_scanner import scan_text_entities
+
+def write_r12_without_handles(path, texts):
+    """R12 DXF as written by tools that leave out group code 5"""
+    lines = ["0", "SECTION", "2", "HEADER", "9", "$ACADVER", "1", "AC1009", "0", "ENDSEC",
+             "0", "SECTION", "2", "ENTITIES"]
+    for index, text in enumerate(texts):
+        lines += ["0", "TEXT", "8", "0", "10", f"{index}.0", "20", "0.0", "30", "0.0", "40", "2.5", "1", text]
+    lines += ["0", "ENDSEC", "0", "EOF"]
+    path.write_text("\n".join(lines) + "\n")
+
+def test_scanner_rejects_entities_without_handles(tmp_path):
+    path = tmp_path / "nohandle.dxf"
+    write_r12_without_handles(path, ["First note", "Second note"])
+    with pytest.raises(ValueError):
+        list(scan_text_entities(str(path)))
+
+def test_entities_without_handles_fall_back_to_ezdxf(tmp_path):
+    path = tmp_path / "nohandle.dxf"
+    texts = ["First note", "Second note", "Third note"]
+    write_r12_without_handles(path, texts)
+
+    processor = DWGProcessor(text_backend='scanner')
+    session = processor.open_session(str(path))
+    entities = processor.extract_text_entities(str(path), session=session)
+    handles = [entity.handle for entity in entities]
+    assert sorted(entity.text for entity in entities) == sorted(texts)
+    assert len(set(handles)) == len(texts) and all(handles)
+
+    translations = {entity.handle: entity.text.upper() for entity in entities}
+    output_path = processor.replace_text_entities(str(path), translations, session=session)
+    translated = [entity.dxf.text for entity in ezdxf.readfile(output_path).modelspace().query('TEXT')]
+    assert sorted(translated) == sorted(text.upper() for text in texts)
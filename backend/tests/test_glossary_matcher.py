@@ -0,0 +1,25 @@
+from glossary_matcher import GlossaryMatcher
+
+GLOSSARY = {"平面图": "plan", "总平面图": "site plan", "钢筋": "rebar", "钢筋混凝土": "reinforced concrete", "": "empty"}
+
+def test_matches_are_leftmost_longest_and_non_overlapping():
+    matcher = GlossaryMatcher(GLOSSARY)
+    text = "总平面图和钢筋混凝土平面图"
+    found = [(text[start:end], matcher.terms[index]) for start, end, index in matcher.find(text)]
+    assert found == [("总平面图", "总平面图"), ("钢筋混凝土", "钢筋混凝土"), ("平面图", "平面图")]
+
+def test_match_after_a_failed_longer_prefix():
+    matcher = GlossaryMatcher({"钢筋混凝土": "reinforced concrete", "筋": "bar"})
+    assert [(start, end) for start, end, _ in matcher.find("钢筋混")] == [(1, 2)]
+
+def test_protect_and_restore_round_trip():
+    matcher = GlossaryMatcher(GLOSSARY)
+    protected, hits = matcher.protect("总平面图 钢筋 说明")
+    assert hits == 2
+    assert "总平面图" not in protected and "钢筋" not in protected
+    assert matcher.restore(protected) == "site plan rebar 说明"
+
+def test_text_without_terms_is_returned_unchanged():
+    matcher = GlossaryMatcher(GLOSSARY)
+    assert matcher.protect("说明") == ("说明", 0)
+    assert matcher.restore("__GLOSSARY_99__ kept") == "__GLOSSARY_99__ kept"
@@ -0,0 +1,26 @@
+import pytest
+
+from job_store import JobStore, TranslationJob
+
+def make_store(tmp_path):
+    return JobStore(db_path=str(tmp_path / 'jobs.db'), data_dir=str(tmp_path / 'job_data'))
+
+def test_second_process_cannot_claim_the_store(tmp_path):
+    owner = make_store(tmp_path)
+    owner.claim()
+    job = TranslationJob('running', 'a.dxf', 'a.dxf')
+    job.status = 'translating'
+    owner.save(job)
+
+    sibling = make_store(tmp_path)
+    with pytest.raises(RuntimeError):
+        sibling.claim()
+    sibling.close()
+    assert owner.get('running').status == 'translating'
+
+    owner.close()
+    restarted = make_store(tmp_path)
+    restarted.claim()
+    assert restarted.fail_interrupted() == 1
+    assert restarted.get('running').status == 'failed'
+    restarted.close()
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from provider_batching import (
+    AdaptiveBudget, ProviderBatcher, ProviderLimits, ProviderResponseError, ProviderThrottled, pack_batch,
+    parse_retry_after
+)
+
+def batcher(max_texts=3, max_request_bytes=10, max_concurrent=2):
+    limits = ProviderLimits(max_texts=max_texts, max_request_bytes=max_request_bytes,
+                            requests_per_second=0, chars_per_second=0)
+    return ProviderBatcher('test', limits, lambda text: len(text.encode('utf-8')), max_concurrent=max_concurrent)
+
+def test_pack_batch_respects_both_limits():
+    sizes = [4, 4, 4, 20, 1, 1, 1, 1]
+    assert pack_batch(sizes, 0, max_texts=5, max_bytes=10) == 2
+    # An oversized text still goes, alone
+    assert pack_batch(sizes, 3, max_texts=5, max_bytes=10) == 4
+    assert pack_batch(sizes, 4, max_texts=3, max_bytes=10) == 7
+    assert pack_batch(sizes, 7, max_texts=3, max_bytes=10) == 8
+
+def test_run_sends_every_text_once_and_keeps_order():
+    texts = [f"t{index}" for index in range(20)]
+    sent = []
+
+    async def post_batch(batch):
+        sent.append(list(batch))
+        # Later batches may finish first
+        await asyncio.sleep(0.001 * (len(sent) % 3))
+        return [text.upper() for text in batch]
+
+    provider = batcher()
+    assert asyncio.run(provider.run(texts, post_batch)) == [text.upper() for text in texts]
+    assert sorted(text for batch in sent for text in batch) == sorted(texts)
+    assert all(len(batch) <= 3 for batch in sent)
+    assert provider.breaker.failures == 0
+
+def test_short_response_fails_the_batch_and_counts_against_the_breaker():
+    async def post_batch(batch):
+        return batch[:-1]
+
+    provider = batcher()
+    with pytest.raises(ProviderResponseError):
+        asyncio.run(provider.run(["a", "b"], post_batch))
+    assert provider.breaker.failures == 1
+
+def test_throttled_batch_is_retried_with_a_smaller_budget():
+    calls = []
+
+    async def post_batch(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise ProviderThrottled("slow down", retry_after=0)
+        return batch
+
+    provider = batcher(max_request_bytes=100000)
+    before = provider.budget.value
+    assert asyncio.run(provider.run(["a", "b"], post_batch)) == ["a", "b"]
+    assert len(calls) == 2
+    assert provider.budget.value == before // 2 + provider.budget.step
+    assert provider.breaker.failures == 0
+
+def test_adaptive_budget_grows_on_fast_batches_and_halves_on_throttling():
+    budget = AdaptiveBudget(160000, target_seconds=1)
+    start = budget.value
+    budget.on_success(0.5)
+    assert budget.value == start + budget.step
+    budget.on_throttled()
+    assert budget.value == (start + budget.step) // 2
+    budget.on_success(2)
+    assert budget.value == int((start + budget.step) // 2 * 0.75)
+
+def test_parse_retry_after():
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after("Thu, 01 Jan 1970 00:00:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,39 @@
+import provider_health
+from provider_health import CircuitBreaker, LatencyWindow
+
+def test_circuit_opens_after_consecutive_failures_and_closes_on_success(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(provider_health.time, 'monotonic', lambda: now[0])
+    breaker = CircuitBreaker('test', failure_threshold=3, cooldown=30)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.available()
+
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.available()
+
+    now[0] += 31
+    assert breaker.state == 'half_open' and breaker.available()
+    # A failed trial call reopens it for another cool-down
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    now[0] += 31
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+def test_latency_percentile_needs_min_samples():
+    window = LatencyWindow(size=10, min_samples=4)
+    for seconds in (0.3, 0.1, 0.2):
+        window.record(seconds)
+    assert window.percentile(95) is None
+    window.record(0.4)
+    assert window.percentile(50) == 0.2
+    assert window.percentile(95) == 0.4
+    # Only the most recent samples count
+    for _ in range(10):
+        window.record(1.0)
+    assert window.percentile(50) == 1.0
@@ -0,0 +1,56 @@
+import ezdxf
+import pytest
+from ezdxf import decode_dxf_unicode
+
+from dwg_processor import DWGProcessor
+from synthetic_dxf import CODEPAGES, SyntheticDrawingSpec, generate_dxf
+
+def extract(path, text_backend):
+    processor = DWGProcessor(text_backend=text_backend)
+    session = processor.open_session(str(path))
+    assert processor.text_backend_for(session.dxf_path) == text_backend
+    return processor, session, processor.extract_text_entities(str(path), session=session)
+
+def by_handle(entities):
+    return {entity.handle: entity.to_entity() if hasattr(entity, 'to_entity') else entity for entity in entities}
+
+@pytest.mark.parametrize('codepage', sorted(CODEPAGES))
+def test_scanner_matches_ezdxf_on_synthetic_drawing(tmp_path, codepage):
+    path = tmp_path / "synthetic.dxf"
+    info = generate_dxf(str(path), SyntheticDrawingSpec(entities=300, codepage=codepage, seed=7))
+
+    _, _, scanned = extract(path, 'scanner')
+    _, _, loaded = extract(path, 'ezdxf')
+    scanned, loaded = by_handle(scanned), by_handle(loaded)
+
+    assert len(scanned) >= info['layout_entities']
+    assert scanned.keys() == loaded.keys()
+    for handle, expected in loaded.items():
+        entity = scanned[handle]
+        assert (entity.text, entity.entity_type, entity.layer, entity.style, entity.block, entity.instances) == \
+            (expected.text, expected.entity_type, expected.layer, expected.style, expected.block, expected.instances), handle
+        assert entity.position == pytest.approx(expected.position), handle
+        assert entity.height == pytest.approx(expected.height), handle
+
+@pytest.mark.parametrize('codepage', sorted(CODEPAGES))
+def test_patched_drawing_reads_back_in_ezdxf(tmp_path, codepage):
+    path = tmp_path / "synthetic.dxf"
+    generate_dxf(str(path), SyntheticDrawingSpec(entities=300, codepage=codepage, seed=11))
+
+    processor, session, entities = extract(path, 'scanner')
+    # Longer than the source, with characters the drawing's code page may have to escape
+    translations = {entity.handle: f"EN {entity.text[:4]} Ø±° #{index}" for index, entity in enumerate(entities)
+                    if index % 2 == 0}
+    output_path = processor.replace_text_entities(str(path), translations, session=session)
+
+    doc = ezdxf.readfile(output_path)
+    auditor = doc.audit()
+    assert not auditor.has_errors, [str(error.message) for error in auditor.errors]
+
+    _, _, patched = extract(output_path, 'ezdxf')
+    patched = by_handle(patched)
+    assert patched.keys() == by_handle(entities).keys()
+    for entity in entities:
+        expected = translations.get(entity.handle, entity.text)
+        # ezdxf leaves the \U+XXXX escapes of characters outside the code page as read
+        assert decode_dxf_unicode(patched[entity.handle].text) == expected, entity.handle
@@ -0,0 +1,74 @@
+import pytest
+
+from text_cleaner import TextCleaner
+
+# Output of the original format_patterns cascade on drawing text, which clean_text must keep
+GOLDEN_CORPUS = [
+    ("备 注", "备 注"),
+    ("图号、型号或标准号", "图号 型号或标准号"),
+    ("总   页,第   页", "总 页 第 页"),
+    ("质 量 kg", "质 量 kg"),
+    ("M10 螺栓", "螺栓"),
+    ("楼梯 A1 详图", "楼梯 详图"),
+    ("a1 b2", ""),
+    ("1:100", "1 100"),
+    ("A-001", "A 001"),
+    ("5 kg", "5kg"),
+    ("10 min", "10min"),
+    ("3 . 5mm", "3.5mm"),
+    ("1 . 2 m", "1.2 m"),
+    ("钢筋保护层厚度 25 mm", "钢筋保护层厚度 25mm"),
+    ("5x10", "5x10"),
+    ("M10x50", "M10x50"),
+    ("C30混凝土", "C30混凝土"),
+    ("混凝土强度等级：C30", "混凝土强度等级"),
+    ("2-Φ16", "2 Φ16"),
+    ("Φ8@150", "Φ8@150"),
+    ("混凝土；钢筋", "混凝土 钢筋"),
+    ("（注）·说明", "注 ・说明"),
+    ("（一）总则", "一 总则"),
+    ("【注意】", "注意"),
+    ("i0;混凝土", "混凝土"),
+    ("{\\fSimSun|b0|i0|c134|p2;混凝土}", "混凝土"),
+    ("{\\fSimHei|b1|i0|c134|p49;\\C7;建筑施工图}", "建筑施工图"),
+    ("\\fArial|b0|i0|c0|p34;平面图 1:100", "平面图 1 100"),
+    ("{\\fSimSun|b0|i0|c134|p2;技术要求}\\P1.材料", "技术要求1.材料"),
+    ("设计\\P校对\\P审核", "设计校对审核"),
+    ("\\pi-3,5;1、基础", "1 基础"),
+    ("\\L下划线\\l", "下划线"),
+    ("\\O上划线\\o", "上划线"),
+    ("{\\L结构设计说明}", "结构设计说明"),
+    ("{\\C1;红色}", "红色"),
+    ("\\C256;图例", "图例"),
+    ("\\W0.8;宽", "宽"),
+    ("\\W1.2;\\A1;标高", "标高"),
+    ("\\A1;{\\C3;钢筋混凝土}", "钢筋混凝土"),
+    ("{\\W0.8;\\C1;说明：}\\P未注明尺寸均以mm计", "说明 未注明尺寸均以mm计"),
+]
+
+# Where the cascade mangled text: it deleted every h/o/q/t/l/p letter and left
+# height values behind, and did not know escapes or special characters
+CORRECTED = [
+    ("Total", "Total"),
+    ("HRB400钢筋 Φ12@200", "HRB400钢筋 Φ12@200"),
+    ("\\pxqc;技术要求\\P1.材料", "技术要求1.材料"),
+    ("{\\fSimSun|b0|i0|c134|p2;\\H3.5;混凝土}\\P技术要求", "混凝土技术要求"),
+    ("\\A1;{\\H0.7x;\\S1^2;}", ""),
+    ("C30\\P混凝土", "C30混凝土"),
+    ("\\{注\\}", "{注}"),
+    ("\\U+4E2D文", "中文"),
+    ("%%c100", "Ø100"),
+    ("45%%d", "45°"),
+    ("标高\\~3.000", "标高 3.000"),
+]
+
+@pytest.mark.parametrize("text, expected", GOLDEN_CORPUS + CORRECTED)
+def test_clean_text(text, expected):
+    assert TextCleaner().clean_text(text) == expected
+
+def test_plain_text_is_returned_unchanged():
+    text = "钢筋混凝土结构"
+    assert TextCleaner().strip_format_codes(text) is text
+
+def test_empty_text():
+    assert TextCleaner().clean_text("") == ""
@@ -0,0 +1,25 @@
+from text_dedup import combine_dedup, dedup_entities
+from text_entity import TextEntity, TextEntityTable
+
+def entity(handle, text):
+    return TextEntity(handle, text, 'TEXT', '0', (0.0, 0.0, 0.0), 2.5, 'Standard', 0.0, 1.0)
+
+ENTITIES = [entity('A1', "平面图"), entity('A2', "GL"), entity('A3', "平面图"), entity('A4', "钢筋"), entity('A5', "平面图")]
+
+def test_groups_handles_by_text_in_first_occurrence_order():
+    dedup = dedup_entities(ENTITIES)
+    assert dedup.unique_texts == ["平面图", "GL", "钢筋"]
+    assert dedup.handles_by_text["平面图"] == ['A1', 'A3', 'A5']
+    assert (dedup.total_count, dedup.unique_count) == (5, 3)
+
+def test_table_and_entities_dedup_alike():
+    assert dedup_entities(TextEntityTable(ENTITIES)).handles_by_text == dedup_entities(ENTITIES).handles_by_text
+
+def test_fan_out_reaches_every_handle_of_selected_texts():
+    dedup = dedup_entities(ENTITIES).select(["平面图", "钢筋", "missing"])
+    assert dedup.unique_texts == ["平面图", "钢筋"]
+    assert dedup.fan_out({"平面图": "Plan", "钢筋": "Rebar"}) == {'A1': "Plan", 'A3': "Plan", 'A5': "Plan", 'A4': "Rebar"}
+
+def test_combine_prefixes_handles_with_the_document_key():
+    combined = combine_dedup({'a': dedup_entities(ENTITIES[:2]), 'b': dedup_entities([entity('A1', "平面图")])})
+    assert combined.handles_by_text == {"平面图": ['a:A1', 'b:A1'], "GL": ['a:A2']}
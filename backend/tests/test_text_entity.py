@@ -0,0 +1,37 @@
+import pickle
+
+import pytest
+
+from text_entity import TextEntity, TextEntityTable, handles_and_texts
+
+ENTITIES = [
+    TextEntity('1F', "平面图", 'TEXT', 'A-ANNO', (1.0, 2.0, 0.0), 2.5, 'Standard', 0.0, 1.0, (1.0, 2.0, 0.0)),
+    TextEntity('2A0', "钢筋\\P混凝土", 'MTEXT', 'A-ANNO', (3.5, -4.0, 1.0), 3.0, 'Chinese', 90.0, 0.8, None),
+    # Handles that don't survive a round trip through int(): leading zero, lower case
+    TextEntity('0A', "GL", 'ATTRIB', 'S-GRID', (0.0, 0.0, 0.0), 5.0, 'Standard', 0.0, 1.0, (9.0, 9.0, 0.0),
+               block='SYM_1', instances=3),
+    TextEntity('ff', "平面图", 'TEXT', 'A-ANNO', (7.0, 8.0, 0.0), 2.5, 'Standard', 0.0, 1.0, (7.0, 8.0, 0.0))
+]
+
+def test_rows_read_back_as_the_entities_added():
+    table = TextEntityTable(ENTITIES)
+    assert len(table) == len(ENTITIES)
+    assert [row.to_entity() for row in table] == ENTITIES
+    assert table[-1].handle == 'ff'
+    with pytest.raises(IndexError):
+        table[len(ENTITIES)]
+
+def test_repeated_strings_are_pooled():
+    table = TextEntityTable(ENTITIES)
+    assert len(table.text_pool) == 3
+    assert table.text_ids[0] == table.text_ids[3]
+
+def test_pickle_round_trip_after_compact():
+    table = TextEntityTable(ENTITIES)
+    table.compact()
+    restored = pickle.loads(pickle.dumps(table))
+    assert [row.to_entity() for row in restored] == ENTITIES
+    assert list(handles_and_texts(restored)) == [(entity.handle, entity.text) for entity in ENTITIES]
+    # A restored table keeps accepting rows
+    restored.append(ENTITIES[0])
+    assert restored[len(ENTITIES)].text == "平面图"
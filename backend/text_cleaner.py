@@ -1,93 +1,80 @@
 import re
 import logging
+from script_detection import BASIC_HAN_PATTERN, count_han
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class TextCleaner:
-    def __init__(self):
-        # DXF/MTEXT format codes to remove
-        self.format_patterns = [
-            # MTEXT formatting codes - handle both single and double backslash
-            r'\\?pi-?\d+,-?\d+;',     # Paragraph indentation (with optional backslash)
-            r'\\?pi-?\d+;',           # Paragraph indentation simplified (with optional backslash)
-            r'\\?P',                  # Paragraph break (with optional backslash)
-            r'\\?p\d+;',              # Paragraph formatting (with optional backslash)
-            r'\\?l\d+;',              # Line spacing (with optional backslash)
-            r'\\?f[^;]+;',            # Font specification (with optional backslash)
-            r'\\?[HOQTL]+;?',         # Justification codes (with optional backslash)
-            r'\\?[cC]\d+;',           # Color specification (with optional backslash)
-            r'\\?[hH]\d+\.?\d*;',    # Text height (with optional backslash)
-            r'\\?[wW]\d+\.?\d*;',    # Width factor (with optional backslash)
-            r'\\?[aA]\d+;',           # Alignment angle (with optional backslash)
-            r'\\?[qQ]\d+;',           # Oblique angle (with optional backslash)
-            r'\\?[Ss](?:.*?);',      # Stacking text (with optional backslash)
-            r'\\?[{}]',               # Braces (with optional backslash)
-            r'\{.*?\}',              # Content in braces
-            r'\\?[A-Za-z]\d*;',      # Other format codes (with optional backslash)
-            r'\{\\?[^}]+\}',         # Format codes in braces (with optional backslash)
-
-            # Additional patterns for broken/incomplete format codes - be more conservative
-            # Only remove patterns that are clearly format codes, not technical data
-            r'[a-zA-Z]\d+;',         # Incomplete format codes without backslash (like "i0;") but only if standalone
-            r'[a-zA-Z]+;',           # Single letter format codes
-            r'[a-zA-Z]+\d*[,:]\d*;', # Format codes with commas or colons
-            # Remove numbers with semicolon only if they appear to be format codes
-            r'(?<!\d)\d+;(?!\d)',    # Numbers with semicolon, not surrounded by other numbers
-            # Remove isolated letter+number combinations that are likely format codes
-            r'\b[a-zA-Z]\d+\b(?!\s*(?:X|kg|mm|℃|min|m))',  # Isolated letter+number but not in technical contexts
-            # Be very careful with numbers mixed with letters - only remove obvious format codes
-            r'\s+[a-zA-Z]\d+\s+(?!\d)',       # Space surrounded letter+number with no digits adjacent
-        ]
-
-        # Special characters to clean
-        self.special_chars = [
-            (r'[\x00-\x1f\x7f-\x9f]', ''),  # Control characters
-            (r'\s+', ' '),                   # Multiple spaces to single space
-            (r'^\s+|\s+$', ''),             # Leading/trailing spaces
-            # Chinese punctuation and symbols to normalize
-            (r'[，,、。；：！？""''（）【】《》〈〉…—]+', ' '),  # Chinese punctuation to space
-            (r'[:：]', ' '),               # Colon variants to space
-            (r'[;；]', ' '),               # Semicolon variants to space
-            (r'[-—]', ' '),               # Dash variants to space
-            (r'[（）\(\)]', ' '),          # Parentheses variants to space
-            (r'[、]', '/'),                # Enumeration comma to slash
-            (r'[・·]', '・'),              # Middle dot (keep as is)
-        ]
-
-        # Compile regex patterns
-        self.format_regex = [re.compile(pattern, re.IGNORECASE) for pattern in self.format_patterns]
-        self.special_regex = [(re.compile(pattern), replacement) for pattern, replacement in self.special_chars]
+# One scan over MTEXT: each match is a format code, a brace or a bare code
+# left behind by a broken export; everything between matches is kept as is
+_MTEXT_TOKEN = re.compile(r"""
+    \\(?P<escaped>[\\{}])                      # \\ \{ \} stand for the character itself
+  | \\U\+(?P<unicode>[0-9A-Fa-f]{4})           # \U+XXXX Unicode character
+  | \\M\+[0-9A-Fa-f]{5}                        # \M+NXXXX multibyte character (dropped)
+  | (?P<nbsp>\\~)                              # non-breaking space
+  | \\[ACFHQTWacfhqtwpSs][^;\\{}]*;            # codes with an argument up to ';': fonts, heights, colors, stacks...
+  | \\[A-Za-z]                                 # paragraph break, under/overline toggles, unknown codes
+  | [{}]                                       # formatting groups
+  | %%(?P<special>[cdpCDP%])                   # %%c diameter, %%d degree, %%p plus-minus, %%%
+  | [A-Za-z]+\d*(?:[,:]\d*)?;                  # bare codes missing their backslash, e.g. "i0;" or "pxqc;"
+  | (?<!\d)\d+;(?!\d)                          # a bare number terminated like a code
+  | \b[A-Za-z]\d+(?![\w\\{}])(?!\s*(?:[Xx]|[Kk][Gg]|[Mm][Mm]|℃|[Mm][Ii][Nn]|[Mm]))  # isolated letter+number codes, not units
+""", re.VERBOSE)
+# Only strings containing one of these can hold a token
+_TOKEN_CHARS = re.compile(r'[\\{};%]|[A-Za-z]\d')
+
+_SPECIAL_CODES = {'c': 'Ø', 'd': '°', 'p': '±', '%': '%'}
+
+def _replace_token(match) -> str:
+    group = match.lastgroup
+    if group is None:
+        return ''
+    if group == 'escaped':
+        return match.group('escaped')
+    if group == 'unicode':
+        return chr(int(match.group('unicode'), 16))
+    if group == 'nbsp':
+        return ' '
+    return _SPECIAL_CODES[match.group('special').lower()]
+
+# Special character normalization as a single translation table: control
+# characters dropped, punctuation to spaces, middle dots unified
+_SPECIAL_CHAR_TABLE = {
+    **{code: None for code in (*range(0x00, 0x20), *range(0x7f, 0xa0))},
+    **{ord(char): ' ' for char in '，,、。；：！？"（）【】《》〈〉…—:;-()'},
+    ord('·'): '・',
+}
+_UNIT_SPACING = re.compile(r'(?<=\d)\s+(?=kg|mm|℃|min)')
+_DECIMAL_SPACING = re.compile(r'(\d+)\s*\.\s*(\d+)')
+
+def _join_decimal(match) -> str:
+    return match.group(1) + '.' + match.group(2)
 
+class TextCleaner:
     def clean_text(self, text: str) -> str:
         """Clean text by removing formatting codes and normalizing"""
         if not text:
             return text
 
-        original_text = text
-        cleaned_text = text
-
-        # Remove DXF formatting codes first
-        for pattern in self.format_regex:
-            cleaned_text = pattern.sub('', cleaned_text)
-
-        # Clean special characters
-        for pattern, replacement in self.special_regex:
-            cleaned_text = pattern.sub(replacement, cleaned_text)
+        cleaned_text = self.strip_format_codes(text)
 
-        # Remove extra whitespace
-        cleaned_text = ' '.join(cleaned_text.split())
-
-        # Post-processing: fix common formatting issues and restore technical data
-        # The main issue is that numbers are being stripped by format code regexes
-        # Let's try to reconstruct some common technical patterns
+        # Clean special characters and extra whitespace
+        cleaned_text = ' '.join(cleaned_text.translate(_SPECIAL_CHAR_TABLE).split())
 
         # Fix common number-unit separations
-        cleaned_text = re.sub(r'(\d+)\s+(kg|mm|℃|min)', r'\1\2', cleaned_text)
-        cleaned_text = re.sub(r'(\d+)\s*\.\s*(\d+)', r'\1.\2', cleaned_text)
+        if ' ' in cleaned_text:
+            cleaned_text = _UNIT_SPACING.sub('', cleaned_text)
+        if '.' in cleaned_text:
+            cleaned_text = _DECIMAL_SPACING.sub(_join_decimal, cleaned_text)
+
+        logger.debug("Text cleaning: '%s' -> '%s'", text, cleaned_text)
+        return cleaned_text
 
-        logger.debug(f"Text cleaning: '{original_text}' -> '{cleaned_text}'")
-        return cleaned_text.strip()
+    def strip_format_codes(self, text: str) -> str:
+        """Remove DXF/MTEXT format codes and braces in one left-to-right scan"""
+        if not _TOKEN_CHARS.search(text):
+            return text
+        return _MTEXT_TOKEN.sub(_replace_token, text)
 
     def clean_chinese_text(self, text: str) -> str:
         """Clean Chinese text specifically, preserving meaningful content"""
@@ -131,7 +118,7 @@ class TextCleaner:
         cleaned = self.extract_clean_chinese_content(text)
 
         # Must have at least 2 Chinese characters to be meaningful
-        chinese_char_count = len(re.findall(r'[\u4e00-\u9fff]', cleaned))
+        chinese_char_count = count_han(cleaned, BASIC_HAN_PATTERN)
         return chinese_char_count >= 2
 
     def split_text_by_language(self, text: str) -> dict:
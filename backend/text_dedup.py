@@ -0,0 +1,81 @@
+from typing import Dict, Iterable, List
+
+from text_entity import handles_and_texts
+
+class DedupResult:
+    """Unique source strings and the entity handles that share each one"""
+
+    def __init__(self, handles_by_text: Dict[str, List[str]]):
+        # Insertion-ordered: unique texts keep the order of their first occurrence
+        self.handles_by_text = handles_by_text
+
+    @property
+    def unique_texts(self) -> List[str]:
+        return list(self.handles_by_text)
+
+    @property
+    def unique_count(self) -> int:
+        return len(self.handles_by_text)
+
+    @property
+    def total_count(self) -> int:
+        return sum(len(handles) for handles in self.handles_by_text.values())
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Entities per unique string (1.0 means nothing repeated)"""
+        if not self.handles_by_text:
+            return 1.0
+        return self.total_count / self.unique_count
+
+    def select(self, texts: Iterable[str]) -> 'DedupResult':
+        """Restrict to the given texts, e.g. those that passed the Chinese filter"""
+        return DedupResult({text: self.handles_by_text[text] for text in texts if text in self.handles_by_text})
+
+    def fan_out(self, text_to_translation: Dict[str, str]) -> Dict[str, str]:
+        """Map each translated unique string back to every handle that uses it"""
+        handle_to_translation = {}
+        for text, translated_text in text_to_translation.items():
+            for handle in self.handles_by_text.get(text, ()):
+                handle_to_translation[handle] = translated_text
+        return handle_to_translation
+
+    def stats(self) -> Dict:
+        total_count = self.total_count
+        total_chars = sum(len(text) * len(handles) for text, handles in self.handles_by_text.items())
+        unique_chars = sum(len(text) for text in self.handles_by_text)
+        return {
+            'source_texts': total_count,
+            'unique_texts': self.unique_count,
+            'dedup_ratio': round(self.dedup_ratio, 2),
+            'source_chars': total_chars,
+            'unique_chars': unique_chars
+        }
+
+def dedup_entities(entities: Iterable) -> DedupResult:
+    """Group text entities by their source string"""
+    handles_by_text: Dict[str, List[str]] = {}
+    for handle, text in handles_and_texts(entities):
+        handles = handles_by_text.get(text)
+        if handles is None:
+            handles_by_text[text] = [handle]
+        else:
+            handles.append(handle)
+    return DedupResult(handles_by_text)
+
+def combine_dedup(results: Dict[str, DedupResult]) -> DedupResult:
+    """Merge per-document results so strings repeated across documents are translated once
+
+    Handles are prefixed with their document key, since handles are only
+    unique within one drawing.
+    """
+    handles_by_text: Dict[str, List[str]] = {}
+    for key, result in results.items():
+        for text, handles in result.handles_by_text.items():
+            prefixed = [f"{key}:{handle}" for handle in handles]
+            existing = handles_by_text.get(text)
+            if existing is None:
+                handles_by_text[text] = prefixed
+            else:
+                existing.extend(prefixed)
+    return DedupResult(handles_by_text)
@@ -0,0 +1,233 @@
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+MODEL_SPACE = '*Model_Space'
+PAPER_SPACE = '*Paper_Space'
+
+@dataclass
+class TextEntity:
+    handle: str
+    text: str
+    entity_type: str
+    layer: str
+    position: Tuple[float, float, float]
+    height: float
+    style: str
+    rotation: float
+    width_factor: float
+    insertion_point: Optional[Tuple[float, float, float]] = None
+    # Block record holding the entity: a layout (*Model_Space, *Paper_Space...) or a block definition
+    block: str = MODEL_SPACE
+    # Placements of the text in the drawing; a block definition's text appears once per insert
+    instances: int = 1
+
+class StringPool:
+    """Stores each distinct string once; rows refer to it by index"""
+
+    def __init__(self, strings: Iterable[str] = ()):
+        self.strings: List[str] = []
+        # string -> index; only needed while adding, so built on demand
+        self._ids: Optional[Dict[str, int]] = {}
+        for string in strings:
+            self.add(string)
+
+    def add(self, string: str) -> int:
+        if self._ids is None:
+            self._ids = {string: string_id for string_id, string in enumerate(self.strings)}
+        string_id = self._ids.get(string)
+        if string_id is None:
+            string_id = self._ids[string] = len(self.strings)
+            self.strings.append(string)
+        return string_id
+
+    def compact(self):
+        """Drop the lookup dict once no more strings will be added"""
+        self._ids = None
+
+    def __getitem__(self, string_id: int) -> str:
+        return self.strings[string_id]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def __getstate__(self):
+        return self.strings
+
+    def __setstate__(self, strings: List[str]):
+        self.strings = strings
+        self._ids = None
+
+class TextEntityRow:
+    """Read-only TextEntity view of one row of a TextEntityTable"""
+
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table: 'TextEntityTable', row: int):
+        self._table = table
+        self._row = row
+
+    @property
+    def handle(self) -> str:
+        return self._table.handle(self._row)
+
+    @property
+    def text(self) -> str:
+        return self._table.text_pool[self._table.text_ids[self._row]]
+
+    @property
+    def entity_type(self) -> str:
+        return self._table.names[self._table.type_ids[self._row]]
+
+    @property
+    def layer(self) -> str:
+        return self._table.names[self._table.layer_ids[self._row]]
+
+    @property
+    def style(self) -> str:
+        return self._table.names[self._table.style_ids[self._row]]
+
+    @property
+    def block(self) -> str:
+        return self._table.names[self._table.block_ids[self._row]]
+
+    @property
+    def position(self) -> Tuple[float, float, float]:
+        return self._table.position(self._row)
+
+    @property
+    def insertion_point(self) -> Optional[Tuple[float, float, float]]:
+        return self._table.insertion_point(self._row)
+
+    @property
+    def height(self) -> float:
+        return self._table.heights[self._row]
+
+    @property
+    def rotation(self) -> float:
+        return self._table.rotations[self._row]
+
+    @property
+    def width_factor(self) -> float:
+        return self._table.width_factors[self._row]
+
+    @property
+    def instances(self) -> int:
+        return self._table.instances[self._row]
+
+    def to_entity(self) -> TextEntity:
+        return TextEntity(
+            handle=self.handle, text=self.text, entity_type=self.entity_type, layer=self.layer,
+            position=self.position, height=self.height, style=self.style, rotation=self.rotation,
+            width_factor=self.width_factor, insertion_point=self.insertion_point,
+            block=self.block, instances=self.instances
+        )
+
+    def __repr__(self) -> str:
+        return repr(self.to_entity())
+
+class TextEntityTable:
+    """The text entities of a drawing stored column by column
+
+    Numbers live in typed arrays, handles as integers, and text, layer,
+    style and block names in string pools, so a row costs under a hundred
+    bytes instead of a dataclass with its own tuples, floats and strings.
+    Pickles as a handful of byte buffers and lists, which keeps process
+    pool transfers and job payloads cheap. Rows read back as
+    TextEntityRow views.
+    """
+
+    def __init__(self, entities: Iterable = ()):
+        self.text_pool = StringPool()
+        # Entity types, layers, styles and block names repeat heavily; one pool serves them all
+        self.names = StringPool()
+        self.handles = array('Q')
+        # Handles that don't round-trip through a 64-bit integer (leading zeros, lower case)
+        self.odd_handles: Dict[int, str] = {}
+        self.text_ids = array('I')
+        self.type_ids = array('I')
+        self.layer_ids = array('I')
+        self.style_ids = array('I')
+        self.block_ids = array('I')
+        self.coords = array('d')  # x, y, z per row
+        self.heights = array('d')
+        self.rotations = array('d')
+        self.width_factors = array('d')
+        self.instances = array('I')
+        # Rows whose insertion point isn't their position (the backends always set both alike)
+        self.insertion_points: Dict[int, Optional[Tuple[float, float, float]]] = {}
+        self.extend(entities)
+
+    def append(self, entity):
+        row = len(self.handles)
+        try:
+            handle_value = int(entity.handle, 16)
+            if format(handle_value, 'X') != entity.handle or handle_value >> 64:
+                raise ValueError(entity.handle)
+        except ValueError:
+            handle_value = 0
+            self.odd_handles[row] = entity.handle
+        self.handles.append(handle_value)
+
+        self.text_ids.append(self.text_pool.add(entity.text))
+        self.type_ids.append(self.names.add(entity.entity_type))
+        self.layer_ids.append(self.names.add(entity.layer))
+        self.style_ids.append(self.names.add(entity.style))
+        self.block_ids.append(self.names.add(entity.block))
+        position = tuple(float(coord) for coord in entity.position)
+        self.coords.extend(position)
+        self.heights.append(entity.height)
+        self.rotations.append(entity.rotation)
+        self.width_factors.append(entity.width_factor)
+        self.instances.append(entity.instances)
+        if entity.insertion_point is None or tuple(entity.insertion_point) != position:
+            self.insertion_points[row] = entity.insertion_point
+
+    def extend(self, entities: Iterable):
+        for entity in entities:
+            self.append(entity)
+
+    def compact(self):
+        """Release what is only needed while rows are being added"""
+        self.text_pool.compact()
+        self.names.compact()
+
+    def handle(self, row: int) -> str:
+        odd = self.odd_handles.get(row)
+        return odd if odd is not None else format(self.handles[row], 'X')
+
+    def position(self, row: int) -> Tuple[float, float, float]:
+        return tuple(self.coords[3 * row:3 * row + 3])
+
+    def insertion_point(self, row: int) -> Optional[Tuple[float, float, float]]:
+        if row in self.insertion_points:
+            return self.insertion_points[row]
+        return self.position(row)
+
+    def iter_handles(self) -> Iterator[str]:
+        odd_handles = self.odd_handles
+        for row, handle_value in enumerate(self.handles):
+            yield odd_handles[row] if row in odd_handles else format(handle_value, 'X')
+
+    def iter_texts(self) -> Iterator[str]:
+        strings = self.text_pool.strings
+        return (strings[text_id] for text_id in self.text_ids)
+
+    def __len__(self) -> int:
+        return len(self.handles)
+
+    def __getitem__(self, row: int) -> TextEntityRow:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("text entity row out of range")
+        return TextEntityRow(self, row)
+
+    def __iter__(self) -> Iterator[TextEntityRow]:
+        return (TextEntityRow(self, row) for row in range(len(self)))
+
+def handles_and_texts(entities: Iterable) -> Iterator[Tuple[str, str]]:
+    """(handle, text) of each entity, straight from the columns when given a table"""
+    if isinstance(entities, TextEntityTable):
+        return zip(entities.iter_handles(), entities.iter_texts())
+    return ((entity.handle, entity.text) for entity in entities)
@@ -0,0 +1,143 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRANSLATION_CACHE_PATH = os.getenv('TRANSLATION_CACHE_PATH', 'translation_cache.db')
+TRANSLATION_CACHE_MEMORY_SIZE = int(os.getenv('TRANSLATION_CACHE_MEMORY_SIZE', 50000))
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+def normalize_source_text(text: str) -> str:
+    """Normalize text for cache lookups: NFC form, trimmed, single spaces"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+def glossary_version(glossary: Optional[Dict[str, str]]) -> str:
+    """Stable fingerprint of a glossary so edits invalidate cached translations"""
+    if not glossary:
+        return ''
+    digest = hashlib.sha256()
+    for source_term, target_term in sorted(glossary.items()):
+        digest.update(source_term.encode('utf-8') + b'\x1f' + target_term.encode('utf-8') + b'\x1e')
+    return digest.hexdigest()[:16]
+
+class TranslationCache:
+    """Translation memory on local disk (SQLite) behind an in-process LRU"""
+
+    def __init__(self, db_path: str = TRANSLATION_CACHE_PATH, memory_size: int = TRANSLATION_CACHE_MEMORY_SIZE):
+        self.db_path = db_path
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                cache_key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                source_lang TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                glossary_version TEXT NOT NULL,
+                source_text TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(provider: str, source_lang: str, target_lang: str, glossary_ver: str, text: str) -> str:
+        raw = '\x1f'.join((provider, source_lang, target_lang, glossary_ver, normalize_source_text(text)))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, translated_text: str):
+        self._memory[key] = translated_text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, provider: str, source_lang: str, target_lang: str, glossary_ver: str,
+                 texts: Iterable[str]) -> Dict[str, str]:
+        """Return cached translations for the texts that have one"""
+        keys = {text: self.make_key(provider, source_lang, target_lang, glossary_ver, text) for text in set(texts)}
+        found: Dict[str, str] = {}
+
+        with self._lock:
+            missing: List[str] = []
+            for text, key in keys.items():
+                translated_text = self._memory.get(key)
+                if translated_text is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[text] = translated_text
+            self.memory_hits += len(found)
+
+            from_disk: Dict[str, str] = {}
+            for i in range(0, len(missing), _SQL_BATCH):
+                batch = missing[i:i + _SQL_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT cache_key, translated_text FROM translations WHERE cache_key IN ({', '.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                from_disk.update(rows)
+
+            for text, key in keys.items():
+                if key in from_disk:
+                    found[text] = from_disk[key]
+                    self._remember(key, from_disk[key])
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, provider: str, source_lang: str, target_lang: str, glossary_ver: str,
+                 translations: Dict[str, str]):
+        """Store source -> translated pairs"""
+        now = datetime.now().isoformat()
+        rows = []
+        with self._lock:
+            for text, translated_text in translations.items():
+                key = self.make_key(provider, source_lang, target_lang, glossary_ver, text)
+                self._remember(key, translated_text)
+                rows.append((key, provider, source_lang, target_lang, glossary_ver,
+                             normalize_source_text(text), translated_text, now))
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        return {
+            'hits': self.hits,
+            'memory_hits': self.memory_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'memory_entries': len(self._memory),
+            'stored_entries': stored
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
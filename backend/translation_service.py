@@ -1,18 +1,60 @@
 import os
 import requests
 import json
+import time
 import logging
-from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote_plus
+from typing import Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import asyncio
 import aiohttp
 from dotenv import load_dotenv
+from translation_cache import TranslationCache, glossary_version
+from glossary_matcher import GlossaryMatcher
+from metrics import provider_request, HEDGED_REQUESTS
+from provider_batching import (
+    ProviderBatcher, ProviderLimits, ProviderThrottled, check_batch_response, parse_retry_after
+)
+import script_detection
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+HTTP_CONNECTION_LIMIT = int(os.getenv('TRANSLATION_HTTP_CONNECTIONS', 10))
+HTTP_KEEPALIVE_TIMEOUT = int(os.getenv('TRANSLATION_HTTP_KEEPALIVE', 60))  # seconds
+HTTP_REQUEST_TIMEOUT = int(os.getenv('TRANSLATION_HTTP_TIMEOUT', 60))  # seconds
+
+# Defaults for the per-request and per-second limits, overridable as e.g. DEEPL_MAX_BATCH_BYTES.
+# DeepL takes 50 texts and 128KiB per request; Google v2 takes 128 texts and 204,800 bytes,
+# with a default quota of 6M characters per minute.
+PROVIDER_LIMITS = {
+    'deepl': ProviderLimits.from_env('deepl', max_texts=50, max_request_bytes=120 * 1024,
+                                     requests_per_second=10, chars_per_second=0),
+    'google': ProviderLimits.from_env('google', max_texts=100, max_request_bytes=180 * 1024,
+                                      requests_per_second=10, chars_per_second=100000)
+}
+# Bytes a text adds to the request body: DeepL takes form-encoded text fields,
+# Google a JSON list (aiohttp escapes non-ASCII as \uXXXX)
+REQUEST_BYTES = {
+    'deepl': lambda text: len('&text=') + len(quote_plus(text)),
+    'google': lambda text: len(json.dumps(text)) + 1
+}
+# Responses that mean "slow down" rather than "this request is wrong"
+THROTTLE_STATUSES = {'deepl': (429, 503), 'google': (429, 503)}
+# Providers in order of preference
+PROVIDERS = ('deepl', 'google')
+
+# Send a batch to the next provider too if the first hasn't answered within
+# this percentile of its recent latencies, and take whichever answers first
+HEDGE_REQUESTS = os.getenv('TRANSLATION_HEDGE_REQUESTS', 'true').lower() in ('1', 'true', 'yes')
+HEDGE_PERCENTILE = float(os.getenv('TRANSLATION_HEDGE_PERCENTILE', 95))
+HEDGE_MIN_DELAY = float(os.getenv('TRANSLATION_HEDGE_MIN_DELAY', 0.25))  # seconds
+
+# Called with (texts done, texts total) as translation batches complete
+ProgressCallback = Callable[[int, int], None]
+
 @dataclass
 class TranslationResult:
     source_text: str
@@ -21,181 +63,353 @@ class TranslationResult:
     target_lang: str
     confidence: float = 0.0
     alternative_translations: List[str] = None
+    provider: Optional[str] = None
+
+# Called with the results of each provider batch as it completes
+BatchCallback = Callable[[List[TranslationResult]], None]
 
 class TranslationService:
-    def __init__(self):
+    def __init__(self, cache: Optional[TranslationCache] = None):
         self.deepl_api_key = os.getenv('DEEPL_API_KEY')
         self.google_api_key = os.getenv('GOOGLE_TRANSLATE_API_KEY')
         self.source_lang = 'ZH'  # Chinese
         self.target_lang = 'JA'  # Japanese
+        self.cache = cache if cache is not None else TranslationCache()
+        # One long-lived HTTP session per provider, opened by start()
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        # Packs requests within each provider's limits; shared by all jobs, as the quotas are per key
+        self._batchers = {
+            provider: ProviderBatcher(provider, limits, REQUEST_BYTES[provider])
+            for provider, limits in PROVIDER_LIMITS.items()
+        }
+        # Compiled glossary automaton, keyed by glossary version
+        self._glossary_matchers: Dict[str, GlossaryMatcher] = {}
+
+    async def start(self):
+        """Open pooled keep-alive HTTP sessions for the configured providers"""
+        for provider, api_key in (('deepl', self.deepl_api_key), ('google', self.google_api_key)):
+            if api_key:
+                self._get_session(provider)
+
+    async def close(self):
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+    def _get_session(self, provider: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(provider)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=HTTP_CONNECTION_LIMIT, keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT)
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=HTTP_REQUEST_TIMEOUT)
+            )
+            self._sessions[provider] = session
+        return session
+
+    async def _translate_cached(self, provider: str, texts: List[str], request, glossary_ver: str,
+                                progress_callback: Optional[ProgressCallback] = None,
+                                known: Optional[Dict[str, str]] = None) -> List[TranslationResult]:
+        """Serve texts from the translation cache and request only the misses from the provider
+
+        known holds translations already obtained for some of the texts, e.g.
+        by a provider that failed partway; it is filled in as batches complete.
+        """
+        if known is None:
+            known = {}
+        known.update(self.cache.get_many(provider, self.source_lang, self.target_lang, glossary_ver,
+                                         [text for text in texts if text not in known]))
+
+        # Each uncached string is requested once even if it repeats in texts
+        unique_texts = dict.fromkeys(texts)
+        pending = [text for text in unique_texts if text not in known]
+
+        done = len(unique_texts) - len(pending)
+        if progress_callback:
+            progress_callback(done, len(unique_texts))
+
+        def on_batch(results: List[TranslationResult]):
+            """Cache each batch as it arrives, so a later failed batch doesn't cost the finished ones"""
+            nonlocal done
+            # Hedged batches may have been answered by another provider; cache them under that one
+            fresh_by_provider: Dict[str, Dict[str, str]] = {}
+            for result in results:
+                fresh_by_provider.setdefault(result.provider or provider, {})[result.source_text] = result.translated_text
+            for source, fresh in fresh_by_provider.items():
+                self.cache.put_many(source, self.source_lang, self.target_lang, glossary_ver, fresh)
+                known.update(fresh)
+            done += len(results)
+            if progress_callback:
+                progress_callback(done, len(unique_texts))
+
+        if pending:
+            await request(pending, on_batch)
+
+        return [
+            TranslationResult(
+                source_text=text,
+                translated_text=known[text],
+                source_lang=self.source_lang,
+                target_lang=self.target_lang,
+                confidence=1.0
+            )
+            for text in texts
+        ]
 
-    async def translate_deepl(self, texts: List[str]) -> List[TranslationResult]:
+    async def translate_deepl(self, texts: List[str], glossary_ver: str = '',
+                              progress_callback: Optional[ProgressCallback] = None,
+                              known: Optional[Dict[str, str]] = None) -> List[TranslationResult]:
+        """Translate text using DeepL API, served from the translation cache where possible"""
+        return await self._translate_cached('deepl', texts, self._request_deepl, glossary_ver, progress_callback, known)
+
+    async def translate_google(self, texts: List[str], glossary_ver: str = '',
+                               progress_callback: Optional[ProgressCallback] = None,
+                               known: Optional[Dict[str, str]] = None) -> List[TranslationResult]:
+        """Translate text using Google Cloud Translation API, served from the translation cache where possible"""
+        return await self._translate_cached('google', texts, self._request_google, glossary_ver, progress_callback, known)
+
+    def get_cache_stats(self) -> Dict:
+        return self.cache.stats()
+
+    async def _request_deepl(self, texts: List[str], on_batch: Optional[BatchCallback] = None) -> List[TranslationResult]:
         """Translate text using DeepL API"""
         if not self.deepl_api_key:
             raise ValueError("DeepL API key not configured")
 
+        send = None
+        if HEDGE_REQUESTS and self.google_api_key:
+            send = lambda batch: self._send_hedged('deepl', 'google', batch, on_batch)
+        return await self._batchers['deepl'].run(texts, lambda batch: self._post_deepl_batch(batch, on_batch), send)
+
+    async def _post_deepl_batch(self, batch: List[str], on_batch: Optional[BatchCallback] = None) -> List[TranslationResult]:
         url = "https://api-free.deepl.com/v2/translate"
         headers = {"Authorization": f"DeepL-Auth-Key {self.deepl_api_key}"}
+        data = {
+            "text": batch,
+            "source_lang": self.source_lang,
+            "target_lang": self.target_lang
+        }
 
-        results = []
-
-        # DeepL supports batch translation up to 50 texts
-        batch_size = 50
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-
-            data = {
-                "text": batch,
-                "source_lang": self.source_lang,
-                "target_lang": self.target_lang
-            }
-
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(url, headers=headers, data=data) as response:
-                        if response.status == 200:
-                            translations = await response.json()
-                            for trans in translations['translations']:
-                                results.append(TranslationResult(
-                                    source_text=trans.get('text', ''),
-                                    translated_text=trans.get('detected_source_language', ''),
-                                    source_lang=self.source_lang,
-                                    target_lang=self.target_lang,
-                                    confidence=1.0
-                                ))
-                        else:
-                            error_text = await response.text()
-                            logger.error(f"DeepL API error: {response.status} - {error_text}")
-                            raise Exception(f"DeepL API error: {response.status}")
-
-            except Exception as e:
-                logger.error(f"DeepL translation failed: {str(e)}")
-                raise
-
-        return results
-
-    async def translate_google(self, texts: List[str]) -> List[TranslationResult]:
+        session = self._get_session('deepl')
+        try:
+            with provider_request('deepl', len(batch)):
+                async with session.post(url, headers=headers, data=data) as response:
+                    if response.status == 200:
+                        translations = (await response.json())['translations']
+                        # zip() would pair the remaining texts with the wrong translations
+                        check_batch_response('deepl', batch, translations)
+                        results = [
+                            TranslationResult(
+                                source_text=source_text,
+                                translated_text=trans.get('text', ''),
+                                source_lang=self.source_lang,
+                                target_lang=self.target_lang,
+                                confidence=1.0,
+                                provider='deepl'
+                            )
+                            for source_text, trans in zip(batch, translations)
+                        ]
+                        if on_batch:
+                            on_batch(results)
+                        return results
+                    else:
+                        error_text = await response.text()
+                        if response.status in THROTTLE_STATUSES['deepl']:
+                            raise ProviderThrottled(f"DeepL API throttled: {response.status}",
+                                                    parse_retry_after(response.headers.get('Retry-After')))
+                        logger.error(f"DeepL API error: {response.status} - {error_text}")
+                        raise Exception(f"DeepL API error: {response.status}")
+
+        except ProviderThrottled:
+            raise
+        except Exception as e:
+            logger.error(f"DeepL translation failed: {str(e)}")
+            raise
+
+    async def _request_google(self, texts: List[str], on_batch: Optional[BatchCallback] = None) -> List[TranslationResult]:
         """Translate text using Google Cloud Translation API"""
         if not self.google_api_key:
             raise ValueError("Google Translate API key not configured")
 
+        return await self._batchers['google'].run(texts, lambda batch: self._post_google_batch(batch, on_batch))
+
+    async def _post_google_batch(self, batch: List[str], on_batch: Optional[BatchCallback] = None) -> List[TranslationResult]:
         url = f"https://translation.googleapis.com/language/translate/v2?key={self.google_api_key}"
         headers = {"Content-Type": "application/json"}
+        data = {
+            "q": batch,
+            "source": self.source_lang.lower(),
+            "target": self.target_lang.lower(),
+            "format": "text"
+        }
 
-        results = []
-
-        # Google Translate supports batch translation
-        batch_size = 100  # API limit
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
+        session = self._get_session('google')
+        try:
+            with provider_request('google', len(batch)):
+                async with session.post(url, headers=headers, json=data) as response:
+                    if response.status == 200:
+                        translations = (await response.json())['data']['translations']
+                        check_batch_response('google', batch, translations)
+                        results = [
+                            TranslationResult(
+                                source_text=source_text,
+                                translated_text=trans['translatedText'],
+                                source_lang=self.source_lang,
+                                target_lang=self.target_lang,
+                                confidence=1.0,
+                                provider='google'
+                            )
+                            for source_text, trans in zip(batch, translations)
+                        ]
+                        if on_batch:
+                            on_batch(results)
+                        return results
+                    else:
+                        error_text = await response.text()
+                        # Google reports exceeded rate quotas as 403 rateLimitExceeded
+                        if response.status in THROTTLE_STATUSES['google'] or 'RateLimitExceeded' in error_text:
+                            raise ProviderThrottled(f"Google Translate API throttled: {response.status}",
+                                                    parse_retry_after(response.headers.get('Retry-After')))
+                        logger.error(f"Google Translate API error: {response.status} - {error_text}")
+                        raise Exception(f"Google Translate API error: {response.status}")
+
+        except ProviderThrottled:
+            raise
+        except Exception as e:
+            logger.error(f"Google translation failed: {str(e)}")
+            raise
+
+    def _post_batch(self, provider: str, batch: List[str], on_post: Optional[Callable[[], None]] = None):
+        post = self._post_deepl_batch if provider == 'deepl' else self._post_google_batch
+        return self._batchers[provider].send(batch, post, on_post)
+
+    async def _send_hedged(self, primary: str, secondary: str, batch: List[str],
+                           on_batch: Optional[BatchCallback] = None) -> List[TranslationResult]:
+        """Send a batch to primary; past its latency percentile, also to secondary, and take the first answer
+
+        Only hedges once primary has enough latency samples and secondary's
+        circuit is closed. The latency window times the post alone, so the
+        deadline starts once the batch has its slot and permits, not while it
+        queues for them. The losing request is cancelled.
+        """
+        posting = asyncio.Event()
+        posted_at = None
+
+        def on_post():
+            nonlocal posted_at
+            if posted_at is None:
+                posted_at = time.perf_counter()
+                posting.set()
+
+        first = asyncio.ensure_future(self._post_batch(primary, batch, on_post))
+        delay = self._batchers[primary].latency.percentile(HEDGE_PERCENTILE)
+        tasks = {first: primary}
+        posting_wait = asyncio.ensure_future(posting.wait())
+        try:
+            if delay is not None and self._batchers[secondary].breaker.available():
+                await asyncio.wait({first, posting_wait}, return_when=asyncio.FIRST_COMPLETED)
+                done = {first} if first.done() else None
+                if not done:
+                    done, _ = await asyncio.wait({first}, timeout=max(delay, HEDGE_MIN_DELAY))
+                if not done:
+                    logger.info(f"{primary} batch of {len(batch)} texts slower than {delay:.2f}s, hedging with {secondary}")
+                    tasks[asyncio.ensure_future(self._post_batch(secondary, batch))] = secondary
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if len(tasks) > 1:
+                        HEDGED_REQUESTS.inc(primary=primary, winner=tasks[task])
+                        if task is not first:
+                            # Cancelling the slow request must not drop it from the latencies
+                            # the next hedge delay is taken from; it took at least this long
+                            self._batchers[primary].latency.record(time.perf_counter() - posted_at)
+                    if on_batch:
+                        on_batch(task.result())
+                    return task.result()
+            raise error
+        finally:
+            posting_wait.cancel()
+            for task in tasks:
+                task.cancel()
+
+    def _get_glossary_matcher(self, glossary: Dict[str, str], glossary_ver: str) -> GlossaryMatcher:
+        """Compile a glossary once and reuse it while its version is unchanged"""
+        matcher = self._glossary_matchers.get(glossary_ver)
+        if matcher is None:
+            matcher = GlossaryMatcher(glossary)
+            self._glossary_matchers = {glossary_ver: matcher}
+            logger.info(f"Compiled glossary {glossary_ver} with {len(matcher.terms)} terms")
+        return matcher
+
+    async def translate_with_glossary(self, texts: List[str], glossary: Dict[str, str],
+                                      progress_callback: Optional[ProgressCallback] = None) -> List[TranslationResult]:
+        """Translate text with custom glossary terms"""
+        glossary_ver = glossary_version(glossary)
+        matcher = self._get_glossary_matcher(glossary, glossary_ver)
 
-            data = {
-                "q": batch,
-                "source": self.source_lang.lower(),
-                "target": self.target_lang.lower(),
-                "format": "text"
-            }
+        # Pre-process texts: glossary terms become placeholders, only where they occur
+        processed_texts = [matcher.protect(text)[0] for text in texts]
 
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(url, headers=headers, json=data) as response:
-                        if response.status == 200:
-                            translations = await response.json()
-                            for trans in translations['data']['translations']:
-                                results.append(TranslationResult(
-                                    source_text=trans.get('originalText', ''),
-                                    translated_text=trans['translatedText'],
-                                    source_lang=self.source_lang,
-                                    target_lang=self.target_lang,
-                                    confidence=1.0
-                                ))
-                        else:
-                            error_text = await response.text()
-                            logger.error(f"Google Translate API error: {response.status} - {error_text}")
-                            raise Exception(f"Google Translate API error: {response.status}")
+        # Translate the processed texts; placeholders only mean something for this
+        # glossary, so cached translations are keyed by its version
+        translated_results = await self.translate(processed_texts, glossary_ver=glossary_ver,
+                                                  progress_callback=progress_callback)
 
-            except Exception as e:
-                logger.error(f"Google translation failed: {str(e)}")
-                raise
+        # Post-process to replace placeholders with the glossary's target terms
+        for source_text, result in zip(texts, translated_results):
+            result.source_text = source_text
+            result.translated_text = matcher.restore(result.translated_text)
 
-        return results
+        return translated_results
 
-    async def translate_with_glossary(self, texts: List[str], glossary: Dict[str, str]) -> List[TranslationResult]:
-        """Translate text with custom glossary terms"""
-        # Pre-process texts with glossary replacements
-        processed_texts = []
-        temp_replacements = {}
-
-        for i, text in enumerate(texts):
-            processed_text = text
-            # Replace glossary terms with temporary placeholders
-            for source_term, target_term in glossary.items():
-                placeholder = f"__GLOSSARY_{i}_{len(temp_replacements)}__"
-                processed_text = processed_text.replace(source_term, placeholder)
-                temp_replacements[placeholder] = target_term
-            processed_texts.append(processed_text)
-
-        # Translate the processed texts
-        translated_results = await self.translate(processed_texts)
-
-        # Post-process to replace placeholders with actual translations
-        final_results = []
-        for result in translated_results:
-            final_text = result.translated_text
-            # Replace placeholders with glossary terms
-            for placeholder, target_term in temp_replacements.items():
-                final_text = final_text.replace(placeholder, target_term)
-
-            result.translated_text = final_text
-            final_results.append(result)
-
-        return final_results
-
-    async def translate(self, texts: List[str], glossary: Optional[Dict[str, str]] = None) -> List[TranslationResult]:
+    async def translate(self, texts: List[str], glossary: Optional[Dict[str, str]] = None,
+                        glossary_ver: str = '',
+                        progress_callback: Optional[ProgressCallback] = None) -> List[TranslationResult]:
         """Main translation method with fallback between services"""
         if glossary:
-            return await self.translate_with_glossary(texts, glossary)
-
-        # Try DeepL first if available
-        if self.deepl_api_key:
-            try:
-                return await self.translate_deepl(texts)
-            except Exception as e:
-                logger.warning(f"DeepL translation failed, trying Google: {str(e)}")
-
-        # Fallback to Google Translate
-        if self.google_api_key:
+            return await self.translate_with_glossary(texts, glossary, progress_callback)
+
+        translate_with = {'deepl': self.translate_deepl, 'google': self.translate_google}
+        configured = [provider for provider, api_key in zip(PROVIDERS, (self.deepl_api_key, self.google_api_key))
+                      if api_key]
+        if not configured:
+            raise ValueError("No translation service available")
+
+        # Providers whose circuit is open are skipped until their cool-down ends,
+        # unless that would leave none to try
+        providers = [provider for provider in configured if self._batchers[provider].breaker.available()]
+        if len(providers) < len(configured):
+            skipped = [provider for provider in configured if provider not in providers]
+            if providers:
+                logger.warning(f"Skipping {', '.join(skipped)} after repeated failures")
+            else:
+                logger.warning(f"Every provider is cooling down after failures, trying {', '.join(skipped)} anyway")
+                providers = configured
+
+        # Batches a failing provider completed are kept, so the next one only gets the rest
+        known: Dict[str, str] = {}
+        for index, provider in enumerate(providers):
             try:
-                return await self.translate_google(texts)
+                return await translate_with[provider](texts, glossary_ver, progress_callback, known)
             except Exception as e:
-                logger.error(f"Google translation failed: {str(e)}")
-                raise
-
-        raise ValueError("No translation service available")
+                if index == len(providers) - 1:
+                    logger.error(f"{provider} translation failed: {str(e)}")
+                    raise
+                logger.warning(f"{provider} translation failed, trying {providers[index + 1]}: {str(e)}")
 
     def detect_chinese_text(self, text: str) -> bool:
         """Detect if text contains Chinese characters"""
-        # Check for Chinese characters (Unicode ranges)
-        chinese_ranges = [
-            (0x4E00, 0x9FFF),    # Common Chinese
-            (0x3400, 0x4DBF),    # Extension A
-            (0x20000, 0x2A6DF),  # Extension B
-            (0x2A700, 0x2B73F), # Extension C
-            (0x2B740, 0x2B81F), # Extension D
-            (0x2B820, 0x2CEAF), # Extension E
-            (0xF900, 0xFAFF),    # Compatibility
-        ]
-
-        for char in text:
-            code = ord(char)
-            for start, end in chinese_ranges:
-                if start <= code <= end:
-                    return True
-        return False
+        return script_detection.contains_han(text)
 
     def filter_chinese_texts(self, text_entities: List[str]) -> List[str]:
         """Filter and return only texts containing Chinese characters"""
-        return [text for text in text_entities if self.detect_chinese_text(text)]
+        return script_detection.filter_chinese_texts(text_entities).texts
 
     def create_technical_glossary(self) -> Dict[str, str]:
         """Create a basic technical glossary for CAD/AEC terms"""
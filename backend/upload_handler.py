@@ -0,0 +1,214 @@
+import os
+import re
+import time
+import shutil
+import hashlib
+import logging
+import zipfile
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+import aiofiles
+from fastapi import UploadFile
+
+from metrics import STAGE_SECONDS, UPLOAD_BYTES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_FILE_SIZE', 104857600))  # 100MB in bytes
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 1048576))  # 1MB in bytes
+MAX_BATCH_FILES = int(os.getenv('MAX_BATCH_FILES', 500))
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 2147483648))  # 2GB in bytes, archive or all files together
+
+CAD_FORMATS = ('dwg', 'dxf')
+
+# DWG files start with the AutoCAD version string (e.g. AC1015, AC1032)
+DWG_MAGIC = re.compile(rb'^AC[0-9.]{4}')
+# Binary DXF sentinel
+DXF_BINARY_MAGIC = b'AutoCAD Binary DXF\r\n\x1a\x00'
+# ASCII DXF starts with a group code line: 0 (SECTION) or 999 (comment)
+DXF_ASCII_MAGIC = re.compile(rb'^(?:\xef\xbb\xbf)?\s*(?:0|999)[ \t]*\r?\n')
+# ZIP local file header
+ZIP_MAGIC = b'PK\x03\x04'
+
+class UploadValidationError(ValueError):
+    """Raised when an upload is rejected before it is fully written to disk"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+@dataclass
+class UploadResult:
+    file_path: str
+    size: int
+    sha256: str
+    file_format: str
+
+def sniff_cad_format(head: bytes) -> Optional[str]:
+    """Detect DWG/DXF from the first bytes of a file"""
+    if DWG_MAGIC.match(head):
+        return 'dwg'
+    if head.startswith(DXF_BINARY_MAGIC) or DXF_ASCII_MAGIC.match(head):
+        return 'dxf'
+    return None
+
+def sniff_upload_format(head: bytes) -> Optional[str]:
+    """Detect DWG/DXF or a ZIP archive from the first bytes of a file"""
+    if head.startswith(ZIP_MAGIC):
+        return 'zip'
+    return sniff_cad_format(head)
+
+def _check_format(file_format: Optional[str], expected_format: str, allowed_formats: Sequence[str]):
+    if file_format is None or file_format not in allowed_formats:
+        raise UploadValidationError(f"File content is not a valid {' or '.join(f.upper() for f in allowed_formats)} file")
+    if file_format != expected_format:
+        raise UploadValidationError(
+            f"File content is {file_format.upper()} but the extension is .{expected_format}"
+        )
+
+async def save_upload_stream(file: UploadFile, file_path: str,
+                             max_size: int = MAX_UPLOAD_SIZE,
+                             chunk_size: int = UPLOAD_CHUNK_SIZE,
+                             allowed_formats: Sequence[str] = CAD_FORMATS) -> UploadResult:
+    """Stream an upload to disk in fixed-size chunks while hashing and validating it"""
+    # Multipart parsing already knows the size for spooled uploads
+    if getattr(file, 'size', None) and file.size > max_size:
+        raise UploadValidationError(f"File exceeds maximum size of {max_size} bytes", status_code=413)
+
+    started = time.perf_counter()
+    expected_format = file.filename.rsplit('.', 1)[-1].lower()
+    sha256 = hashlib.sha256()
+    size = 0
+    file_format = None
+
+    try:
+        async with aiofiles.open(file_path, 'wb') as buffer:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+
+                if file_format is None:
+                    file_format = sniff_upload_format(chunk)
+                    _check_format(file_format, expected_format, allowed_formats)
+
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadValidationError(f"File exceeds maximum size of {max_size} bytes", status_code=413)
+
+                sha256.update(chunk)
+                await buffer.write(chunk)
+
+        if size == 0:
+            raise UploadValidationError("Uploaded file is empty")
+
+    except Exception:
+        # Never leave partial uploads behind
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    UPLOAD_BYTES.inc(size)
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage='upload')
+    logger.info(f"Stored upload {file_path} ({size} bytes, sha256={sha256.hexdigest()})")
+    return UploadResult(
+        file_path=file_path,
+        size=size,
+        sha256=sha256.hexdigest(),
+        file_format=file_format
+    )
+
+def _is_cad_member(info: zipfile.ZipInfo) -> bool:
+    name = info.filename
+    basename = os.path.basename(name)
+    # Skip folders and macOS resource forks
+    if info.is_dir() or name.startswith('__MACOSX/') or basename.startswith('.'):
+        return False
+    return basename.rsplit('.', 1)[-1].lower() in CAD_FORMATS
+
+def _safe_member_name(name: str) -> str:
+    """Archive path with absolute and parent-directory components dropped"""
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.', '..')]
+    return '/'.join(parts)
+
+def extract_cad_archive(zip_path: str, dest_dir: str,
+                        max_files: int = MAX_BATCH_FILES,
+                        max_member_size: int = MAX_UPLOAD_SIZE,
+                        max_total_size: int = MAX_BATCH_SIZE,
+                        chunk_size: int = UPLOAD_CHUNK_SIZE) -> List[Tuple[str, UploadResult]]:
+    """Stream the DWG/DXF members of a ZIP archive to dest_dir
+
+    Blocking; run it in a thread. Member paths are only used as display
+    names, files are written as <index>_<basename> so archive paths can never
+    escape dest_dir. Sizes are enforced on the bytes actually inflated, not on
+    the sizes the archive claims. Returns (sanitized member name, upload
+    result) pairs.
+    """
+    extracted: List[Tuple[str, UploadResult]] = []
+    total_size = 0
+
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            members = [info for info in archive.infolist() if _is_cad_member(info)]
+            if not members:
+                raise UploadValidationError("Archive contains no DWG or DXF files")
+            if len(members) > max_files:
+                raise UploadValidationError(f"Archive contains {len(members)} drawings, the limit is {max_files}")
+
+            os.makedirs(dest_dir, exist_ok=True)
+            for index, info in enumerate(members):
+                basename = os.path.basename(info.filename)
+                expected_format = basename.rsplit('.', 1)[-1].lower()
+                file_path = os.path.join(dest_dir, f"{index:04d}_{basename}")
+                sha256 = hashlib.sha256()
+                size = 0
+                file_format = None
+
+                with archive.open(info) as source, open(file_path, 'wb') as target:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+
+                        if file_format is None:
+                            file_format = sniff_cad_format(chunk)
+                            try:
+                                _check_format(file_format, expected_format, CAD_FORMATS)
+                            except UploadValidationError as e:
+                                raise UploadValidationError(f"{info.filename}: {e}")
+
+                        size += len(chunk)
+                        total_size += len(chunk)
+                        if size > max_member_size:
+                            raise UploadValidationError(
+                                f"{info.filename} exceeds maximum size of {max_member_size} bytes", status_code=413
+                            )
+                        if total_size > max_total_size:
+                            raise UploadValidationError(
+                                f"Archive contents exceed maximum size of {max_total_size} bytes", status_code=413
+                            )
+
+                        sha256.update(chunk)
+                        target.write(chunk)
+
+                if size == 0:
+                    raise UploadValidationError(f"{info.filename} is empty")
+
+                extracted.append((_safe_member_name(info.filename), UploadResult(
+                    file_path=file_path,
+                    size=size,
+                    sha256=sha256.hexdigest(),
+                    file_format=file_format
+                )))
+
+    except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+        # RuntimeError: encrypted member, NotImplementedError: unsupported compression
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        raise UploadValidationError(f"Invalid ZIP archive: {e}")
+    except Exception:
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Extracted {len(extracted)} drawings ({total_size} bytes) from {zip_path}")
+    return extracted
@@ -0,0 +1,197 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+from job_profiler import profile_call
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WORKER_POOL_SIZE = int(os.getenv('WORKER_POOL_SIZE', os.cpu_count() or 2))
+# Parsed documents each worker may keep open between the extract and replace stages
+MAX_SESSIONS_PER_WORKER = int(os.getenv('MAX_SESSIONS_PER_WORKER', 4))
+
+# Per-process state, created by the pool initializer
+_processor = None
+_sessions: "OrderedDict[str, Any]" = OrderedDict()
+
+def _init_worker(processor_factory: Callable[[], Any]):
+    """Import ezdxf and build the processor once in each worker process"""
+    global _processor
+    import ezdxf  # noqa: F401 - pay the import cost at startup, not on the first job
+    _processor = processor_factory()
+
+def _get_session(session_id: str, file_path: str, options: Dict[str, Any]):
+    session = _sessions.get(session_id)
+    if session is None:
+        session = _processor.open_session(file_path, **options)
+        _sessions[session_id] = session
+        while len(_sessions) > MAX_SESSIONS_PER_WORKER:
+            evicted_id, evicted = _sessions.popitem(last=False)
+            evicted.close()
+            logger.warning(f"Evicted document session {evicted_id} from worker {os.getpid()}")
+    return session
+
+def _call_processor(method_name: str, args: tuple, options: Dict[str, Any], session_id: Optional[str] = None) -> Any:
+    method = getattr(_processor, method_name)
+    if session_id is None:
+        return method(*args, **options)
+    # Processor methods take the file path first and the keyword options open_session takes,
+    # which is enough to reopen a lost session
+    return method(*args, session=_get_session(session_id, args[0], options), **options)
+
+def _call_profiled(method_name: str, args: tuple, options: Dict[str, Any], session_id: Optional[str] = None) -> tuple:
+    return profile_call(_call_processor, method_name, args, options, session_id)
+
+def _close_session(session_id: str) -> bool:
+    session = _sessions.pop(session_id, None)
+    if session is None:
+        return False
+    session.close()
+    return True
+
+def _ping() -> int:
+    return os.getpid()
+
+class WorkerPool:
+    """Process pool that runs CPU-heavy DWG/DXF processing off the event loop
+
+    Each worker is its own single-process executor so that calls sharing a
+    session_id are routed to the process holding that parsed document.
+    """
+
+    def __init__(self, processor_factory: Callable[[], Any], max_workers: int = WORKER_POOL_SIZE):
+        self.processor_factory = processor_factory
+        self.max_workers = max(1, max_workers)
+        self._workers: List[ProcessPoolExecutor] = []
+        self._in_flight: List[int] = []
+        self._session_workers: Dict[str, int] = {}
+
+    def start(self):
+        """Create the pool and prefork every worker"""
+        if self._workers:
+            return
+
+        self._workers = [self._new_executor() for _ in range(self.max_workers)]
+        self._in_flight = [0] * self.max_workers
+
+        futures = [worker.submit(_ping) for worker in self._workers]
+        wait(futures)
+        pids = [future.result() for future in futures]
+        logger.info(f"Worker pool started with {len(pids)} processes: {pids}")
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1,
+            initializer=_init_worker,
+            initargs=(self.processor_factory,)
+        )
+
+    def _replace_worker(self, index: int, broken: ProcessPoolExecutor):
+        """Start a new process in the slot of one that died; the sessions it held died with it"""
+        if self._workers[index] is not broken:
+            return  # another call already replaced it
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._workers[index] = self._new_executor()
+        lost = [session_id for session_id, worker_index in self._session_workers.items() if worker_index == index]
+        for session_id in lost:
+            del self._session_workers[session_id]
+        logger.error(f"Worker {index} died, started a replacement; {len(lost)} open sessions were lost")
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.shutdown(wait=True, cancel_futures=True)
+        if self._workers:
+            logger.info("Worker pool shut down")
+        self._workers = []
+        self._in_flight = []
+        self._session_workers.clear()
+
+    def _pick_worker(self, session_id: Optional[str]) -> int:
+        if session_id is not None and session_id in self._session_workers:
+            return self._session_workers[session_id]
+
+        # Open sessions hold a parsed document even while idle, so count them as load
+        load = list(self._in_flight)
+        for worker_index in self._session_workers.values():
+            load[worker_index] += 1
+        index = min(range(len(self._workers)), key=lambda i: load[i])
+        if session_id is not None:
+            self._session_workers[session_id] = index
+        return index
+
+    async def _submit(self, index: int, func: Callable, *args) -> Any:
+        executor = self._workers[index]
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            # The worker died while idle, before this call reached it
+            self._replace_worker(index, executor)
+            executor = self._workers[index]
+            future = executor.submit(func, *args)
+        self._in_flight[index] += 1
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            self._replace_worker(index, executor)
+            raise
+        finally:
+            self._in_flight[index] -= 1
+
+    async def _submit_retrying(self, session_id: Optional[str], func: Callable, *args) -> Any:
+        """Submit to the session's (or the least loaded) worker; once more on a fresh one if that worker dies
+
+        A call that kills its worker twice fails, so only the job that
+        crashes it is lost. A lost session is reopened from the file path.
+        A worker found dead at submit time is replaced without using the retry.
+        """
+        for attempt in range(2):
+            index = self._pick_worker(session_id)
+            try:
+                return await self._submit(index, func, *args)
+            except BrokenProcessPool:
+                if attempt:
+                    raise
+                logger.warning(f"Worker {index} died during {args[0] if args else func.__name__}, retrying once")
+
+    async def run(self, method_name: str, *args, session_id: Optional[str] = None,
+                  on_profile: Optional[Callable[[Dict], None]] = None, **options) -> Any:
+        """Run a processor method in a worker process without blocking the event loop
+
+        options are passed to the method as keyword arguments, and to
+        open_session when the call opens the session. With a session_id the drawing is parsed once in one worker and reused
+        by every later call for the same session. With on_profile the call
+        runs under cProfile and tracemalloc in the worker, and on_profile
+        receives the profile data.
+        """
+        if not self._workers:
+            # start() forks and waits for every worker; it must not run on the event loop
+            raise RuntimeError("Worker pool is not started")
+
+        if on_profile is None:
+            return await self._submit_retrying(session_id, _call_processor, method_name, args, options, session_id)
+        result, profile = await self._submit_retrying(session_id, _call_profiled, method_name, args, options, session_id)
+        on_profile(profile)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """Workers running a call, calls in flight (running or queued) and open sessions"""
+        return {
+            'workers': len(self._workers),
+            'busy': sum(1 for in_flight in self._in_flight if in_flight),
+            'in_flight': sum(self._in_flight),
+            'sessions': len(self._session_workers)
+        }
+
+    async def close_session(self, session_id: str):
+        """Release the parsed document held for a session"""
+        index = self._session_workers.pop(session_id, None)
+        if index is not None and self._workers:
+            try:
+                await self._submit(index, _close_session, session_id)
+            except BrokenProcessPool:
+                pass  # the session died with its worker
@@ -38,7 +38,7 @@ const App = () => {
         const data = await response.json();
         setJobId(data.job_id);
         setStatus('processing');
-        pollJobStatus(data.job_id);
+        watchJobStatus(data.job_id);
       } else {
         const errorData = await response.json();
         setError(errorData.detail || 'Upload failed');
@@ -50,20 +50,47 @@ const App = () => {
     }
   };
 
+  // Apply a job status update; returns true once the job has finished
+  const handleJobUpdate = (job) => {
+    setProgress(job.progress);
+
+    if (job.status === 'completed') {
+      setStatus('completed');
+      return true;
+    } else if (job.status === 'failed') {
+      setError(job.error_message || 'Processing failed');
+      setStatus('idle');
+      return true;
+    }
+    return false;
+  };
+
+  // Follow progress over Server-Sent Events, falling back to polling
+  const watchJobStatus = (id) => {
+    if (!window.EventSource) {
+      pollJobStatus(id);
+      return;
+    }
+
+    const source = new EventSource(`${apiUrl}/jobs/${id}/events`);
+    source.addEventListener('status', (e) => {
+      if (handleJobUpdate(JSON.parse(e.data))) {
+        source.close();
+      }
+    });
+    source.onerror = () => {
+      source.close();
+      pollJobStatus(id);
+    };
+  };
+
   const pollJobStatus = async (id) => {
     const interval = setInterval(async () => {
       try {
         const response = await fetch(`${apiUrl}/jobs/${id}`);
         if (response.ok) {
           const job = await response.json();
-          setProgress(job.progress);
-
-          if (job.status === 'completed') {
-            setStatus('completed');
-            clearInterval(interval);
-          } else if (job.status === 'failed') {
-            setError(job.error_message || 'Processing failed');
-            setStatus('idle');
+          if (handleJobUpdate(job)) {
             clearInterval(interval);
           }
         }